@@ -0,0 +1,257 @@
+"""
+Cross-backtest analytics from materialized summary tables
+
+backtest_summaries holds one row per completed backtest (ticker, strategy
+and metrics, no joins needed) and backtest_aggregates holds running sums
+per (ticker, strategy_name, period), where period is the calendar year the
+backtest starts in. Both are refreshed for one backtest at a time when it
+completes, is extended or is deleted, so the leaderboard and aggregate
+endpoints read small pre-aggregated tables instead of scanning backtests.
+Aggregate rows are rebuilt under a per-group lock, so jobs finishing in
+the same group at once do not race on the unique (ticker, strategy_name,
+period) row.
+
+rebuild() recreates both tables from scratch (manage.py refresh-analytics).
+"""
+import hashlib
+import numpy as np
+from sqlalchemy import select, insert, delete, func, cast, extract, and_, asc, desc, text, Integer
+from models import Stock, Backtest, BacktestSummary, BacktestAggregate
+from curve_store import history_arrays
+
+SUMMARY_FIELDS = ('backtest_id', 'stock_id', 'ticker', 'strategy', 'strategy_name', 'period',
+                  'start_date', 'end_date', 'initial_capital', 'final_value', 'total_return',
+                  'max_drawdown', 'sharpe_ratio', 'num_trades', 'completed_at')
+
+AGGREGATE_FIELDS = ('ticker', 'strategy', 'strategy_name', 'period', 'num_backtests', 'return_sum',
+                    'return_sq_sum', 'sharpe_sum', 'drawdown_sum', 'best_return', 'worst_return',
+                    'best_sharpe', 'worst_drawdown', 'num_trades_sum')
+
+GROUP_FIELDS = ('ticker', 'strategy', 'strategy_name', 'period')
+LEADERBOARD_SORT_FIELDS = ('sharpe_ratio', 'total_return', 'max_drawdown', 'final_value', 'num_trades')
+AGGREGATE_SORT_FIELDS = ('num_backtests', 'mean_return', 'mean_sharpe', 'mean_max_drawdown',
+                         'best_return', 'worst_return')
+
+
+def _summary_query():
+    """Summary rows for completed backtests, in SUMMARY_FIELDS order"""
+    return select(
+        Backtest.id, Backtest.stock_id, Stock.ticker, Backtest.strategy, Backtest.strategy_name,
+        cast(extract('year', Backtest.start_date), Integer), Backtest.start_date, Backtest.end_date,
+        Backtest.initial_capital, Backtest.final_value, Backtest.total_return, Backtest.max_drawdown,
+        Backtest.sharpe_ratio, Backtest.num_trades, Backtest.completed_at
+    ).join(Stock, Stock.id == Backtest.stock_id).where(Backtest.status == 'completed')
+
+
+def _aggregate_query():
+    """Aggregate rows computed from backtest_summaries, in AGGREGATE_FIELDS order"""
+    s = BacktestSummary
+    return select(
+        s.ticker, s.strategy, s.strategy_name, s.period,
+        func.count(),
+        func.sum(s.total_return),
+        func.sum(s.total_return * s.total_return),
+        func.sum(s.sharpe_ratio),
+        func.sum(s.max_drawdown),
+        func.max(s.total_return),
+        func.min(s.total_return),
+        func.max(s.sharpe_ratio),
+        func.min(s.max_drawdown),
+        func.sum(s.num_trades)
+    ).group_by(s.ticker, s.strategy, s.strategy_name, s.period)
+
+
+def _group_filter(model, key):
+    ticker, strategy_name, period = key
+    return and_(model.ticker == ticker, model.strategy_name == strategy_name, model.period == period)
+
+
+def _summary_key(db, backtest_id):
+    row = db.execute(
+        select(BacktestSummary.ticker, BacktestSummary.strategy_name, BacktestSummary.period)
+        .where(BacktestSummary.backtest_id == backtest_id)
+    ).first()
+    return tuple(row) if row else None
+
+
+def _lock_group(db, key):
+    """
+    Serialize rebuilds of one aggregate row until the transaction ends
+
+    PostgreSQL takes a transaction-scoped advisory lock on a hash of the
+    group, so a second rebuild waits and then sees the first one's rows;
+    SQLite already serializes writers on the database file.
+    """
+    if db.get_bind().dialect.name != 'postgresql':
+        return
+    digest = hashlib.sha256(repr(tuple(key)).encode()).digest()
+    db.execute(text('SELECT pg_advisory_xact_lock(:lock_id)'),
+               {'lock_id': int.from_bytes(digest[:8], 'big', signed=True)})
+
+
+def _recompute_group(db, key):
+    """Replace one aggregate row from the summaries currently in its group"""
+    _lock_group(db, key)
+    db.execute(delete(BacktestAggregate).where(_group_filter(BacktestAggregate, key)))
+    db.execute(insert(BacktestAggregate).from_select(
+        AGGREGATE_FIELDS, _aggregate_query().where(_group_filter(BacktestSummary, key))
+    ))
+
+
+def refresh_backtest(db, backtest_id):
+    """
+    Bring one backtest's summary and its aggregate group up to date
+
+    Commits the summary row on its own first, so a failed aggregate update
+    never drops the backtest from the leaderboard, then rebuilds the
+    affected groups (in a fixed order, so concurrent refreshes cannot
+    deadlock on the group locks) and commits again. A backtest that is not
+    completed simply drops out of the tables.
+    """
+    old_key = _summary_key(db, backtest_id)
+    db.execute(delete(BacktestSummary).where(BacktestSummary.backtest_id == backtest_id))
+    db.execute(insert(BacktestSummary).from_select(
+        SUMMARY_FIELDS, _summary_query().where(Backtest.id == backtest_id)
+    ))
+    new_key = _summary_key(db, backtest_id)
+    db.commit()
+
+    for key in sorted({old_key, new_key} - {None}):
+        _recompute_group(db, key)
+    db.commit()
+
+
+def remove_backtest(db, backtest_id):
+    """
+    Drop a backtest from the analytics tables (call before deleting it)
+
+    Runs in the caller's transaction, so the backtest and its summary go together.
+
+    Returns:
+        The (ticker, strategy_name, period) group it was in, or None
+    """
+    key = _summary_key(db, backtest_id)
+    if key is None:
+        return None
+    db.execute(delete(BacktestSummary).where(BacktestSummary.backtest_id == backtest_id))
+    _recompute_group(db, key)
+    return key
+
+
+def rebuild(db):
+    """
+    Recreate both tables from the backtests table
+
+    Returns:
+        Number of summarized backtests
+    """
+    db.execute(delete(BacktestAggregate))
+    db.execute(delete(BacktestSummary))
+    db.execute(insert(BacktestSummary).from_select(SUMMARY_FIELDS, _summary_query()))
+    db.execute(insert(BacktestAggregate).from_select(AGGREGATE_FIELDS, _aggregate_query()))
+    return db.execute(select(func.count()).select_from(BacktestSummary)).scalar()
+
+
+def _apply_filters(query, model, filters):
+    for field in GROUP_FIELDS:
+        value = filters.get(field)
+        if value is not None:
+            query = query.where(getattr(model, field) == value)
+    return query
+
+
+def leaderboard(db, sort_by='sharpe_ratio', ascending=False, filters=None, limit=50):
+    """
+    Completed backtests ranked by one metric
+
+    Args:
+        filters: Optional dict of GROUP_FIELDS values to match
+    """
+    if sort_by not in LEADERBOARD_SORT_FIELDS:
+        raise ValueError(f"sort_by must be one of: {', '.join(LEADERBOARD_SORT_FIELDS)}")
+
+    column = getattr(BacktestSummary, sort_by)
+    query = _apply_filters(select(BacktestSummary), BacktestSummary, filters or {})
+    query = query.where(column.isnot(None)).order_by(
+        asc(column) if ascending else desc(column), desc(BacktestSummary.backtest_id)
+    ).limit(limit)
+    return [summary.to_dict() for summary in db.execute(query).scalars()]
+
+
+def aggregates(db, group_by, sort_by='mean_return', ascending=False, filters=None, limit=50):
+    """
+    Metrics rolled up over any subset of GROUP_FIELDS
+
+    Returns:
+        list of dicts with the group values, num_backtests, mean and std of
+        total return, mean Sharpe and max drawdown, best/worst return, best
+        Sharpe, worst drawdown and total trades
+    """
+    unknown = [field for field in group_by if field not in GROUP_FIELDS]
+    if unknown or not group_by:
+        raise ValueError(f"group_by must be one or more of: {', '.join(GROUP_FIELDS)}")
+    if sort_by not in AGGREGATE_SORT_FIELDS:
+        raise ValueError(f"sort_by must be one of: {', '.join(AGGREGATE_SORT_FIELDS)}")
+
+    a = BacktestAggregate
+    count = func.sum(a.num_backtests)
+    columns = {
+        'num_backtests': count,
+        'mean_return': func.sum(a.return_sum) / count,
+        'return_sq_sum': func.sum(a.return_sq_sum),
+        'mean_sharpe': func.sum(a.sharpe_sum) / count,
+        'mean_max_drawdown': func.sum(a.drawdown_sum) / count,
+        'best_return': func.max(a.best_return),
+        'worst_return': func.min(a.worst_return),
+        'best_sharpe': func.max(a.best_sharpe),
+        'worst_drawdown': func.min(a.worst_drawdown),
+        'num_trades': func.sum(a.num_trades_sum)
+    }
+    groups = [getattr(a, field) for field in group_by]
+    query = select(*groups, *[column.label(name) for name, column in columns.items()]).group_by(*groups)
+    query = _apply_filters(query, a, filters or {})
+    order = columns[sort_by]
+    query = query.order_by(asc(order) if ascending else desc(order)).limit(limit)
+
+    results = []
+    for row in db.execute(query).mappings():
+        row = dict(row)
+        n = row['num_backtests']
+        mean = row['mean_return'] or 0.0
+        sq = row.pop('return_sq_sum') or 0.0
+        row['std_return'] = float(np.sqrt(max(sq - n * mean ** 2, 0.0) / (n - 1))) if n > 1 else 0.0
+        results.append(row)
+    return results
+
+
+def correlation_matrix(db, backtest_ids):
+    """
+    Correlation of daily returns between backtests' equity curves
+
+    Curves are aligned on the dates they all share.
+
+    Returns:
+        dict with backtest_ids, num_days and the matrix (None where a curve is flat)
+    """
+    if len(backtest_ids) < 2:
+        raise ValueError('Need at least two backtests to correlate')
+
+    curves = [history_arrays(db, backtest_id) for backtest_id in backtest_ids]
+    common = curves[0]['date']
+    for curve in curves[1:]:
+        common = np.intersect1d(common, curve['date'], assume_unique=True)
+    if len(common) < 3:
+        raise ValueError('Backtests share fewer than 3 days of history')
+
+    values = np.vstack([curve['portfolio_value'][np.isin(curve['date'], common)] for curve in curves])
+    returns = values[:, 1:] / values[:, :-1] - 1
+    with np.errstate(divide='ignore', invalid='ignore'):
+        matrix = np.corrcoef(returns)
+
+    return {
+        'backtest_ids': list(backtest_ids),
+        'num_days': len(common),
+        'start_date': common[0].astype(object).isoformat(),
+        'end_date': common[-1].astype(object).isoformat(),
+        'matrix': [[None if np.isnan(v) else round(float(v), 6) for v in row] for row in matrix]
+    }
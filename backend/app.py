@@ -1,11 +1,22 @@
+import logging
 from flask import Flask
 from flask_cors import CORS
 from config import Config
-from models import init_db
+from models import db_session
 from routes import api
+from instrumentation import configure_logging
+
+logger = logging.getLogger(__name__)
 
 def create_app():
-    """Create and configure Flask application"""
+    """
+    Create and configure Flask application
+    
+    Startup does no database work and loads no strategy or data modules;
+    create the schema once with `python manage.py init-db` (and apply later
+    changes with `python manage.py migrate`).
+    """
+    configure_logging()
     app = Flask(__name__)
     app.config.from_object(Config)
     
@@ -15,25 +26,42 @@ def create_app():
     # Register blueprints
     app.register_blueprint(api, url_prefix='/api')
     
-    # Initialize database
-    with app.app_context():
-        init_db()
+    # Return each request's session to the pool when the request ends
+    @app.teardown_appcontext
+    def remove_session(exception=None):
+        db_session.remove()
     
     return app
 
 if __name__ == '__main__':
+    # Development server; use gunicorn -c gunicorn.conf.py wsgi:app in production
     app = create_app()
-    print("\n" + "="*60)
-    print("Trading Backtester API Server")
-    print("="*60)
-    print("Server running at: http://localhost:5000")
-    print("API endpoints:")
-    print("  GET  /api/health              - Health check")
-    print("  GET  /api/stocks              - Get all stocks")
-    print("  GET  /api/backtests           - Get all backtests")
-    print("  GET  /api/backtests/<id>      - Get backtest details")
-    print("  POST /api/backtests/run       - Run new backtest")
-    print("  DELETE /api/backtests/<id>    - Delete backtest")
-    print("="*60 + "\n")
+    logger.info("\n".join([
+        "="*60,
+        "Trading Backtester API Server",
+        "="*60,
+        "Server running at: http://localhost:5000",
+        "API endpoints:",
+        "  GET  /api/health              - Health check",
+        "  GET  /api/metrics             - Stage timing histograms (Prometheus)",
+        "  GET  /api/stocks              - Get all stocks",
+        "  GET  /api/strategies          - List available strategies",
+        "  GET  /api/backtests           - Get all backtests",
+        "  GET  /api/backtests/<id>      - Get backtest details",
+        "  GET  /api/backtests/<id>/export - Stream history/trades (ndjson, csv, arrow, parquet)",
+        "  POST /api/backtests/run       - Queue new backtest",
+        "  POST /api/backtests/batch     - Queue many backtests as one batch",
+        "  GET  /api/backtests/batch/<id> - Batch status per spec",
+        "  GET  /api/backtests/<id>/status - Poll backtest status",
+        "  GET  /api/backtests/<id>/profile - cProfile report of a profiled run",
+        "  POST /api/backtests/<id>/cancel - Cancel backtest",
+        "  POST /api/backtests/<id>/extend - Extend backtest to a later end date",
+        "  POST /api/backtests/<id>/robustness - Monte Carlo confidence intervals",
+        "  DELETE /api/backtests/<id>    - Delete backtest",
+        "  GET  /api/analytics/leaderboard - Rank completed backtests by a metric",
+        "  GET  /api/analytics/aggregates  - Metrics grouped by ticker/strategy/period",
+        "  GET  /api/analytics/correlation - Return correlations across backtests",
+        "="*60
+    ]))
     
-    app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
+    app.run(debug=Config.DEBUG, host='0.0.0.0', port=5000)
@@ -0,0 +1,303 @@
+"""
+Batch backtests: many specs loaded, simulated and stored together
+
+Specs are grouped by ticker, and each ticker's prices are loaded once for
+the union of its specs' date ranges and sliced per spec. Signals,
+simulation and metrics need no database, so they run across a process
+pool (Config.BATCH_WORKERS) and only the results come back. Everything is
+then written in one transaction, each spec inside its own savepoint, so a
+spec that fails is recorded on its item without rolling back the rest.
+The analytics tables are refreshed after that commit, best-effort per spec.
+"""
+import logging
+from collections import defaultdict
+from datetime import datetime
+import pandas as pd
+from sqlalchemy import select
+from sqlalchemy.exc import SQLAlchemyError
+from config import Config
+from models import SessionLocal, Backtest, BacktestBatch, BacktestBatchItem
+from strategy import create_strategy
+from simulation import simulate
+from price_cache import PriceCache, get_or_create_stock, to_date
+from persistence import store_results
+from metrics import performance_metrics
+from instrumentation import StageTimings, timed, record_timings
+from pools import pool_map
+from jobs import _refresh_analytics
+import result_cache
+
+logger = logging.getLogger(__name__)
+
+
+def create_batch(db, entries, use_cache=True):
+    """
+    Create a batch with a pending Backtest per runnable spec, in one commit
+
+    Args:
+        db: SQLAlchemy database session
+        entries: Per spec, create_strategy keyword arguments (without
+            db_session), or an error message for a spec that failed validation
+        use_cache: Point specs with a cached completed run at it instead of rerunning
+
+    Returns:
+        (batch, {backtest_id: params}) for the specs left to run
+    """
+    batch = BacktestBatch(num_specs=len(entries), status='pending')
+    db.add(batch)
+    pending = []
+
+    for position, params in enumerate(entries):
+        item = BacktestBatchItem(position=position, status='invalid')
+        batch.items.append(item)
+        if isinstance(params, str):
+            item.error_message = params
+            continue
+        item.ticker = params['ticker']
+
+        try:
+            strategy = create_strategy(db_session=db, **params)
+            if strategy.frequency != 'daily':
+                raise ValueError('Batches run daily bars only; submit minute backtests individually')
+        except (TypeError, ValueError) as e:
+            item.error_message = str(e)
+            continue
+
+        if use_cache and Config.RESULT_CACHE_ENABLED:
+            key = result_cache.cache_key(db, strategy)
+            cached = result_cache.lookup(db, key) if key else None
+            if cached is not None:
+                item.backtest = cached
+                item.status = 'cached'
+                continue
+
+        item.backtest = strategy.create_backtest(commit=False)
+        item.status = 'pending'
+        pending.append((item, params))
+
+    batch.num_completed = sum(item.status == 'cached' for item in batch.items)
+    batch.num_failed = sum(item.status == 'invalid' for item in batch.items)
+    if not pending:
+        batch.status = 'completed'
+        batch.completed_at = datetime.utcnow()
+    db.commit()
+
+    return batch, {item.backtest_id: params for item, params in pending}
+
+
+def compute_backtest(params, prices):
+    """
+    Signals, simulation and metrics for one spec on preloaded prices
+
+    Needs no database session, so it can run in a worker process.
+
+    Returns:
+        dict with the simulation result, metrics, resume_state and stage
+        durations, or with error if the spec failed
+    """
+    try:
+        strategy = create_strategy(db_session=None, **params)
+        timings = StageTimings()
+        with timings.stage('signals'):
+            df = strategy.calculate_signals(prices)
+        if len(df) == 0:
+            raise ValueError(f"Not enough data for {strategy.ticker} to compute {strategy.strategy_name} signals")
+
+        with timings.stage('simulation'):
+            result = simulate(df, strategy.initial_capital, engine=strategy.engine, execution=strategy.execution)
+        with timings.stage('metrics'):
+            metrics = performance_metrics(result['portfolio_value'], strategy.initial_capital)
+            resume_state = strategy.resume_state(df, result)
+    except Exception as e:
+        return {'error': str(e)}
+
+    return {'result': result, 'metrics': metrics, 'resume_state': resume_state, 'timings': timings.durations}
+
+
+def _compute_backtest_task(args):
+    return compute_backtest(*args)
+
+
+def compute_all(tasks, workers=None):
+    """
+    compute_backtest for every (params, prices) task, in order
+
+    With workers > 1 the tasks are spread over the shared process pool.
+    """
+    workers = Config.BATCH_WORKERS if workers is None else workers
+    chunksize = max(1, len(tasks) // (workers * 4)) if workers else 1
+    return pool_map(_compute_backtest_task, tasks, workers, chunksize=chunksize)
+
+
+def load_prices(db, specs, timings=None):
+    """
+    Price frame per spec, loading each ticker once for all its date ranges
+
+    Args:
+        specs: {backtest_id: params}
+
+    Returns:
+        ({backtest_id: DataFrame}, {backtest_id: error message})
+    """
+    by_ticker = defaultdict(list)
+    for backtest_id, params in specs.items():
+        by_ticker[params['ticker'].upper()].append(backtest_id)
+
+    cache = PriceCache(db, timings=timings)
+    frames = {}
+    errors = {}
+
+    for ticker, backtest_ids in by_ticker.items():
+        ranges = {backtest_id: (to_date(specs[backtest_id]['start_date']), to_date(specs[backtest_id]['end_date']))
+                  for backtest_id in backtest_ids}
+        try:
+            stock = get_or_create_stock(db, ticker)
+            df = cache.get_prices(stock, min(r[0] for r in ranges.values()), max(r[1] for r in ranges.values()))
+        except Exception as e:
+            logger.exception("Could not load prices for %s", ticker)
+            db.rollback()
+            errors.update((backtest_id, str(e)) for backtest_id in backtest_ids)
+            continue
+
+        for backtest_id, (start, end) in ranges.items():
+            frame = df[(df.index >= pd.Timestamp(start)) & (df.index < pd.Timestamp(end))]
+            if len(frame) == 0:
+                errors[backtest_id] = f"No data found for {ticker}"
+            else:
+                frames[backtest_id] = frame.copy()
+
+    return frames, errors
+
+
+def _complete(backtest, outcome):
+    metrics = outcome['metrics']
+    backtest.resume_state = outcome['resume_state']
+    backtest.stage_timings = dict(outcome['timings'], total=round(sum(outcome['timings'].values()), 6))
+    backtest.final_value = metrics['final_value']
+    backtest.total_return = metrics['total_return']
+    backtest.max_drawdown = metrics['max_drawdown']
+    backtest.sharpe_ratio = metrics['sharpe_ratio']
+    backtest.num_trades = len(outcome['result']['trades'])
+    backtest.status = 'completed'
+    backtest.progress = 100
+    backtest.completed_at = datetime.utcnow()
+
+
+def _fail(backtest, error):
+    backtest.status = 'failed'
+    backtest.error_message = error
+    backtest.completed_at = datetime.utcnow()
+
+
+def _remember(db, params, backtest):
+    """Add a stored run to the result cache inside its own savepoint; a cache failure never fails the spec"""
+    try:
+        with db.begin_nested():
+            key = result_cache.cache_key(db, create_strategy(db_session=db, **params))
+            if key:
+                result_cache.remember(db, key, backtest, commit=False)
+    except SQLAlchemyError:
+        logger.exception("Could not cache backtest %s", backtest.id)
+
+
+def run_batch(db, batch, specs, workers=None):
+    """
+    Run the pending specs of a batch and store all results in one transaction
+
+    Args:
+        db: SQLAlchemy database session
+        batch: Pending BacktestBatch
+        specs: {backtest_id: create_strategy keyword arguments (without db_session)}
+        workers: Process pool size (defaults to Config.BATCH_WORKERS)
+    """
+    timings = StageTimings()
+    items = [item for item in batch.items if item.backtest_id in specs]
+
+    batch.status = 'running'
+    for item in items:
+        item.status = item.backtest.status = 'running'
+    db.commit()
+
+    frames, errors = load_prices(db, specs, timings)
+    backtest_ids = list(frames)
+    with timed(timings, 'compute'):
+        outcomes = compute_all([(specs[backtest_id], frames[backtest_id]) for backtest_id in backtest_ids], workers)
+    outcomes = dict(zip(backtest_ids, outcomes))
+    outcomes.update((backtest_id, {'error': error}) for backtest_id, error in errors.items())
+
+    completed = []
+    with timed(timings, 'persistence'):
+        # Cancelled in the meantime: leave the record as the cancel request set it
+        cancelled = set(db.execute(
+            select(Backtest.id).where(Backtest.id.in_(list(specs)), Backtest.status == 'cancelled')
+        ).scalars())
+
+        for item in items:
+            backtest = item.backtest
+            outcome = outcomes[item.backtest_id]
+            if item.backtest_id in cancelled:
+                item.status = 'cancelled'
+                continue
+
+            if 'error' not in outcome:
+                try:
+                    with db.begin_nested():
+                        store_results(db, backtest.id, outcome['result'])
+                except SQLAlchemyError as e:
+                    logger.exception("Could not store backtest %s", backtest.id)
+                    outcome = {'error': str(e)}
+
+            if 'error' in outcome:
+                _fail(backtest, outcome['error'])
+                item.status = 'failed'
+                item.error_message = outcome['error']
+                continue
+
+            _complete(backtest, outcome)
+            record_timings(db, backtest.strategy, backtest.stage_timings)
+            item.status = 'completed'
+            completed.append(item)
+            if Config.RESULT_CACHE_ENABLED:
+                _remember(db, specs[item.backtest_id], backtest)
+
+        batch.num_completed = sum(item.status in ('completed', 'cached') for item in batch.items)
+        batch.num_failed = sum(item.status in ('failed', 'invalid') for item in batch.items)
+        batch.status = 'completed'
+        batch.completed_at = datetime.utcnow()
+        batch.stage_timings = timings.as_dict()
+        db.commit()
+
+    # Stored results stand even if a summary cannot be updated
+    for item in completed:
+        _refresh_analytics(db, item.backtest)
+
+    logger.info("Batch %s: %d specs, %d completed, %d failed, %d cancelled in %.2fs",
+                batch.id, batch.num_specs, batch.num_completed, batch.num_failed, len(cancelled),
+                batch.stage_timings['total'])
+
+
+def run_batch_job(batch_id, specs):
+    """Job queue entry point for a pending BacktestBatch"""
+    db = SessionLocal()
+    try:
+        batch = db.query(BacktestBatch).filter_by(id=batch_id).first()
+        if batch is None or batch.status != 'pending':
+            return
+        run_batch(db, batch, specs)
+
+    except Exception as e:
+        logger.exception("Batch %s failed", batch_id)
+        db.rollback()
+        batch = db.query(BacktestBatch).filter_by(id=batch_id).first()
+        if batch is not None:
+            for item in batch.items:
+                if item.backtest_id in specs and item.backtest.status in ('pending', 'running'):
+                    _fail(item.backtest, str(e))
+                    item.status = 'failed'
+            batch.status = 'failed'
+            batch.error_message = str(e)
+            batch.completed_at = datetime.utcnow()
+            db.commit()
+
+    finally:
+        db.close()
@@ -0,0 +1,285 @@
+"""
+Benchmark the backtest pipeline stage by stage on synthetic prices
+
+Runs ingestion, price loading, calculate_signals, the simulation,
+persistence and calculate_metrics against a throwaway SQLite database (no
+network) and reports wall time, peak traced memory and rows per second for
+each stage. Results are written as JSON so runs can be compared between
+commits with --baseline.
+
+Series longer than a business-day calendar fits in pandas' date range
+(about 73k bars from 1980) use minute bars instead; ingestion then stores
+one row per day, which its "inserted" count shows.
+
+Usage (from backend/):
+    python benchmarks/bench_pipeline.py --bars 1000 100000 1000000 --tickers 4
+    python benchmarks/bench_pipeline.py --bars 10000000 --stages signals simulation metrics
+    python benchmarks/bench_pipeline.py --bars 100000 --baseline bench_pipeline.json --output new.json
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+STAGES = ('ingest', 'load', 'signals', 'simulation', 'persistence', 'metrics')
+
+
+def synthetic_prices(bars, seed=0, start='1980-01-01'):
+    """Random-walk OHLCV frame on business days, or minute bars when days run out"""
+    import numpy as np
+    import pandas as pd
+
+    try:
+        index = pd.date_range(start, periods=bars, freq='B')
+    except (OverflowError, pd.errors.OutOfBoundsDatetime):
+        index = pd.date_range(start, periods=bars, freq='min')
+
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0.0002, 0.01, bars)))
+    open_ = np.concatenate(([close[0]], close[:-1])) * (1 + rng.normal(0, 0.002, bars))
+    spread = np.abs(rng.normal(0, 0.005, bars))
+
+    return pd.DataFrame({
+        'Open': open_,
+        'High': np.maximum(open_, close) * (1 + spread),
+        'Low': np.minimum(open_, close) * (1 - spread),
+        'Close': close,
+        'Volume': rng.integers(100_000, 10_000_000, bars).astype(float)
+    }, index=index)
+
+
+class StageTimer:
+    """Accumulates wall time, rows and peak traced memory per stage"""
+
+    def __init__(self, trace_memory=True):
+        self.trace_memory = trace_memory
+        self.stages = {}
+
+    @contextlib.contextmanager
+    def stage(self, name, rows=0):
+        """Time a block; the yielded dict's 'rows' may be set inside it"""
+        record = {'rows': rows}
+        if self.trace_memory:
+            tracemalloc.start()
+        started = time.perf_counter()
+        try:
+            yield record
+        finally:
+            elapsed = time.perf_counter() - started
+            peak = tracemalloc.get_traced_memory()[1] if self.trace_memory else None
+            if self.trace_memory:
+                tracemalloc.stop()
+
+            entry = self.stages.setdefault(name, {'seconds': 0.0, 'rows': 0, 'peak_memory_mb': None})
+            entry['seconds'] += elapsed
+            entry['rows'] += record['rows']
+            for key, value in record.items():
+                if key != 'rows':
+                    entry[key] = entry.get(key, 0) + value
+            if peak is not None:
+                entry['peak_memory_mb'] = max(entry['peak_memory_mb'] or 0.0, peak / 2 ** 20)
+
+    def report(self):
+        return {
+            name: dict(entry, rows_per_second=entry['rows'] / entry['seconds'] if entry['seconds'] else None)
+            for name, entry in self.stages.items()
+        }
+
+
+def quiet(verbose):
+    """Silence the pipeline's progress prints unless verbose"""
+    if verbose:
+        return contextlib.nullcontext()
+    return contextlib.redirect_stdout(open(os.devnull, 'w'))
+
+
+def run_ticker(db, ticker, df, args, timer):
+    """Push one synthetic ticker through every selected stage"""
+    from price_cache import PriceCache
+    from ingest import store_prices
+    from strategy import create_strategy
+    from simulation import simulate
+    from persistence import store_results
+
+    start = df.index[0].date()
+    end = df.index[-1].date() + timedelta(days=1)
+    strategy = create_strategy(args.strategy, db, ticker, start.isoformat(), end.isoformat(),
+                               initial_capital=args.initial_capital, engine=args.engine,
+                               params=args.params)
+    stock = strategy.get_or_create_stock()
+
+    if 'ingest' in args.stages:
+        with timer.stage('ingest', len(df)) as record:
+            counts = store_prices(db, stock.id, df)
+            db.commit()
+            record['inserted'] = counts['inserted']
+
+    if 'load' in args.stages:
+        with timer.stage('load') as record:
+            record['rows'] = len(PriceCache(db).load(stock.id, start, end))
+
+    # Later stages work on the in-memory series so intraday bars are not collapsed
+    with timer.stage('signals', len(df)) if 'signals' in args.stages else contextlib.nullcontext():
+        signals = strategy.calculate_signals(df)
+
+    with timer.stage('simulation', len(signals)) if 'simulation' in args.stages else contextlib.nullcontext():
+        result = simulate(signals, args.initial_capital, engine=args.engine)
+
+    strategy.create_backtest()
+    if 'persistence' in args.stages:
+        with timer.stage('persistence', len(signals) + len(result['trades'])):
+            store_results(db, strategy.backtest.id, result)
+            db.commit()
+
+    if 'metrics' in args.stages:
+        with timer.stage('metrics', len(signals)):
+            strategy.calculate_metrics(signals, result)
+
+
+def run_size(run_index, bars, args):
+    from models import SessionLocal
+
+    timer = StageTimer(trace_memory=not args.no_memory)
+    started = time.perf_counter()
+
+    for i in range(args.tickers):
+        df = synthetic_prices(bars, seed=args.seed + i)
+        db = SessionLocal()
+        try:
+            with quiet(args.verbose):
+                run_ticker(db, f"B{run_index}T{i}", df, args, timer)
+        finally:
+            db.close()
+
+    return {
+        'bars': bars,
+        'tickers': args.tickers,
+        'frequency': 'business_day' if df.index.freqstr == 'B' else 'minute',
+        'total_seconds': time.perf_counter() - started,
+        'stages': timer.report()
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=BACKEND_DIR,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_report(runs, baseline=None):
+    baseline_runs = {(run['bars'], run['tickers']): run for run in (baseline or {}).get('runs', [])}
+
+    for run in runs:
+        print(f"\n{run['bars']:,} bars x {run['tickers']} tickers ({run['frequency']}): "
+              f"{run['total_seconds']:.3f}s total")
+        print(f"  {'stage':<12} {'seconds':>10} {'rows/s':>14} {'peak MB':>10} {'vs base':>8}")
+        previous = baseline_runs.get((run['bars'], run['tickers']), {}).get('stages', {})
+
+        for name in STAGES:
+            if name not in run['stages']:
+                continue
+            stage = run['stages'][name]
+            rate = f"{stage['rows_per_second']:,.0f}" if stage['rows_per_second'] else '-'
+            peak = f"{stage['peak_memory_mb']:.1f}" if stage['peak_memory_mb'] is not None else '-'
+            ratio = '-'
+            if name in previous and previous[name]['seconds']:
+                ratio = f"{stage['seconds'] / previous[name]['seconds']:.2f}x"
+            print(f"  {name:<12} {stage['seconds']:>10.4f} {rate:>14} {peak:>10} {ratio:>8}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the backtest pipeline on synthetic data')
+    parser.add_argument('--bars', type=int, nargs='+', default=[1_000, 10_000, 100_000],
+                        help='Series lengths to run (1k to 10M)')
+    parser.add_argument('--tickers', type=int, default=1, help='Synthetic tickers per series length')
+    parser.add_argument('--stages', nargs='+', choices=STAGES, default=list(STAGES))
+    parser.add_argument('--strategy', default='ma_crossover')
+    parser.add_argument('--params', type=json.loads, default={}, help='Strategy parameters as JSON')
+    parser.add_argument('--engine', default='vectorized')
+    parser.add_argument('--initial-capital', type=float, default=10000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--database-url', help='Database to use instead of a temporary SQLite file')
+    parser.add_argument('--keep-db', action='store_true', help='Keep the temporary SQLite file')
+    parser.add_argument('--no-memory', action='store_true',
+                        help='Skip tracemalloc (it slows allocation-heavy stages)')
+    parser.add_argument('--output', default='bench_pipeline.json', help='JSON results file')
+    parser.add_argument('--baseline', help='Earlier results file to compare stage times against')
+    parser.add_argument('--verbose', action='store_true', help='Show pipeline output')
+    args = parser.parse_args(argv)
+
+    if 'load' in args.stages and 'ingest' not in args.stages:
+        parser.error('the load stage needs the ingest stage')
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    tmpdir = None
+    if not args.database_url:
+        tmpdir = tempfile.mkdtemp(prefix='backtest-bench-')
+        args.database_url = f"sqlite:///{os.path.join(tmpdir, 'bench.db')}"
+
+    # Must be set before models creates its engine
+    os.environ['DATABASE_URL'] = args.database_url
+    os.environ['COLUMN_STORE_ENABLED'] = 'False'
+    os.environ['RESULT_CACHE_ENABLED'] = 'False'
+
+    from models import init_db, engine
+    import numpy as np
+    import pandas as pd
+
+    with quiet(args.verbose):
+        init_db()
+
+    try:
+        runs = [run_size(i, bars, args) for i, bars in enumerate(args.bars)]
+    finally:
+        engine.dispose()
+        if tmpdir and not args.keep_db:
+            shutil.rmtree(tmpdir, ignore_errors=True)
+
+    results = {
+        'meta': {
+            'timestamp': datetime.utcnow().isoformat(),
+            'commit': git_commit(),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'pandas': pd.__version__,
+            'platform': platform.platform(),
+            'database': engine.dialect.name,
+            'strategy': args.strategy,
+            'params': args.params,
+            'engine': args.engine,
+            'memory_traced': not args.no_memory
+        },
+        'runs': runs
+    }
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    print_report(runs, baseline)
+
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults written to {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,165 @@
+"""
+Benchmark API cold start: time until /api/health answers
+
+Each run starts a fresh interpreter that imports the app, builds it with
+create_app() and requests /api/health, and reports the phase timings and
+which heavy modules ended up loaded. With --eager every view's
+dependencies are imported first, which is what startup cost before they
+were made lazy.
+
+With --server the real server command is started instead and
+/api/health is polled over HTTP until it answers.
+
+Usage (from backend/):
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --runs 20 --output startup.json
+    python benchmarks/bench_startup.py --server "python wsgi.py" --url http://127.0.0.1:5000/api/health
+"""
+import argparse
+import json
+import os
+import shlex
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+from datetime import datetime
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules a health check should not need
+HEAVY_MODULES = ('numpy', 'pandas', 'yfinance', 'pyarrow', 'strategy', 'simulation', 'price_cache')
+
+# Everything routes.py imports inside its views
+VIEW_MODULES = ('strategy', 'simulation', 'result_cache', 'queries', 'export', 'sweep',
+                'portfolio', 'walkforward', 'robustness', 'price_cache')
+
+_CHILD = """
+import json, sys, time
+started = time.perf_counter()
+sys.path.insert(0, {backend!r})
+for name in {eager!r}:
+    __import__(name)
+from app import create_app
+imported = time.perf_counter()
+app = create_app()
+created = time.perf_counter()
+response = app.test_client().get('/api/health')
+answered = time.perf_counter()
+print(json.dumps({{
+    'status': response.status_code,
+    'import_ms': (imported - started) * 1000,
+    'create_app_ms': (created - imported) * 1000,
+    'first_health_ms': (answered - created) * 1000,
+    'heavy_modules': [name for name in {heavy!r} if name in sys.modules]
+}}))
+"""
+
+
+def run_in_process(eager, env):
+    """One cold start via the Flask test client; returns the child's timings plus wall time"""
+    code = _CHILD.format(backend=BACKEND_DIR, eager=list(VIEW_MODULES) if eager else [],
+                         heavy=list(HEAVY_MODULES))
+    started = time.perf_counter()
+    output = subprocess.run([sys.executable, '-c', code], cwd=BACKEND_DIR, env=env,
+                            capture_output=True, text=True, check=True).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+    result['total_ms'] = (time.perf_counter() - started) * 1000
+    return result
+
+
+def run_server(command, url, timeout, env):
+    """Start the server and poll url; returns ms until the first 200"""
+    process = subprocess.Popen(shlex.split(command), cwd=BACKEND_DIR, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    started = time.perf_counter()
+    try:
+        while time.perf_counter() - started < timeout:
+            if process.poll() is not None:
+                raise RuntimeError(f"Server exited with code {process.returncode}")
+            try:
+                with urllib.request.urlopen(url, timeout=1) as response:
+                    if response.status == 200:
+                        return {'total_ms': (time.perf_counter() - started) * 1000}
+            except (urllib.error.URLError, ConnectionError, OSError):
+                time.sleep(0.01)
+        raise RuntimeError(f"No answer from {url} within {timeout}s")
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def summarize(samples, field):
+    values = sorted(sample[field] for sample in samples)
+    return {'median_ms': statistics.median(values), 'min_ms': values[0], 'max_ms': values[-1]}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Time API cold start until /api/health answers')
+    parser.add_argument('--runs', type=int, default=10, help='Cold starts per mode')
+    parser.add_argument('--eager', action='store_true', help='Also time starts with every view module preloaded')
+    parser.add_argument('--server', help='Server command to start and poll instead of the test client')
+    parser.add_argument('--url', default='http://127.0.0.1:5000/api/health', help='Health URL polled with --server')
+    parser.add_argument('--timeout', type=float, default=60, help='Seconds to wait for the server')
+    parser.add_argument('--database-url', help='Database to configure (defaults to a temporary SQLite file)')
+    parser.add_argument('--output', default='bench_startup.json', help='JSON results file')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    tmpdir = None
+    if not args.database_url:
+        tmpdir = tempfile.mkdtemp(prefix='backtest-bench-')
+        args.database_url = f"sqlite:///{os.path.join(tmpdir, 'bench.db')}"
+    env = dict(os.environ, DATABASE_URL=args.database_url)
+
+    results = {}
+    try:
+        if args.server:
+            samples = [run_server(args.server, args.url, args.timeout, env) for _ in range(args.runs)]
+            results['server'] = {'samples': samples, 'total': summarize(samples, 'total_ms')}
+        else:
+            for mode in ('lazy', 'eager') if args.eager else ('lazy',):
+                samples = [run_in_process(mode == 'eager', env) for _ in range(args.runs)]
+                results[mode] = {
+                    'samples': samples,
+                    'heavy_modules': samples[-1]['heavy_modules'],
+                    **{field: summarize(samples, f"{field}_ms")
+                       for field in ('total', 'import', 'create_app', 'first_health')}
+                }
+    finally:
+        if tmpdir:
+            shutil.rmtree(tmpdir, ignore_errors=True)
+
+    print(f"{args.runs} cold starts per mode (median, ms)")
+    print(f"  {'mode':<8} {'total':>8} {'import':>8} {'app':>8} {'health':>8}  heavy modules loaded")
+    for mode, result in results.items():
+        row = [result['total']['median_ms']] + [
+            result[field]['median_ms'] if field in result else float('nan')
+            for field in ('import', 'create_app', 'first_health')
+        ]
+        loaded = ', '.join(result.get('heavy_modules', [])) or '-'
+        print(f"  {mode:<8} " + ' '.join(f"{value:>8.1f}" for value in row) + f"  {loaded}")
+
+    with open(args.output, 'w') as f:
+        json.dump({
+            'meta': {
+                'timestamp': datetime.utcnow().isoformat(),
+                'python': sys.version.split()[0],
+                'runs': args.runs,
+                'server': args.server
+            },
+            'results': results
+        }, f, indent=2)
+    print(f"\nResults written to {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,198 @@
+import io
+import os
+from contextlib import contextmanager
+import numpy as np
+import pandas as pd
+from sqlalchemy import select, func
+from config import Config
+from models import StockPrice
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks, run one syncing process at a time
+    fcntl = None
+
+# Column name in the store -> (StockPrice attribute, dtype, DataFrame column)
+COLUMNS = {
+    'date': ('date', 'datetime64[D]', None),
+    'open': ('open', np.float64, 'Open'),
+    'high': ('high', np.float64, 'High'),
+    'low': ('low', np.float64, 'Low'),
+    'close': ('close', np.float64, 'Close'),
+    'volume': ('volume', np.float64, 'Volume')  # Float like every other price column, so frames need no cast
+}
+
+
+def _append_npy(path, values):
+    """
+    Append values to a 1-D .npy file in place
+
+    The data is written first and the header (with the new length) last, so
+    a concurrent reader sees either the old or the new array. numpy pads the
+    header so the length can grow; if it no longer fits, the file is rewritten.
+    """
+    with open(path, 'r+b') as f:
+        version = np.lib.format.read_magic(f)
+        if version == (1, 0):
+            shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+        else:
+            shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+        header_length = f.tell()
+
+        header = io.BytesIO()
+        header_fields = {'descr': np.lib.format.dtype_to_descr(dtype), 'fortran_order': fortran_order,
+                         'shape': (shape[0] + len(values),)}
+        if version == (1, 0):
+            np.lib.format.write_array_header_1_0(header, header_fields)
+        else:
+            np.lib.format.write_array_header_2_0(header, header_fields)
+
+        if len(header.getvalue()) == header_length:
+            f.seek(0, os.SEEK_END)
+            f.write(np.ascontiguousarray(values, dtype=dtype).tobytes())
+            f.flush()
+            f.seek(0)
+            f.write(header.getvalue())
+            return
+
+    # Header grew: rewrite the whole file
+    existing = np.load(path)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        np.save(f, np.concatenate([existing, values.astype(dtype)]))
+    os.replace(tmp_path, path)
+
+
+class ColumnStore:
+    """
+    Columnar on-disk price store: one directory per ticker, one .npy per column
+
+    Files are memory-mapped on read, so slicing a date range returns views
+    into the mapped files rather than copies.
+    """
+
+    def __init__(self, root=None):
+        self.root = root or Config.COLUMN_STORE_DIR
+
+    def path(self, ticker):
+        return os.path.join(self.root, ticker.upper())
+
+    def has(self, ticker):
+        return os.path.exists(os.path.join(self.path(ticker), 'date.npy'))
+
+    def read(self, ticker, start=None, end=None):
+        """
+        Memory-mapped column arrays for [start, end)
+
+        Returns:
+            dict of column name -> read-only array view
+        """
+        directory = self.path(ticker)
+        columns = {name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode='r') for name in COLUMNS}
+
+        dates = columns['date']
+        lo = 0 if start is None else int(np.searchsorted(dates, np.datetime64(start, 'D'), side='left'))
+        hi = len(dates) if end is None else int(np.searchsorted(dates, np.datetime64(end, 'D'), side='left'))
+        return {name: values[lo:hi] for name, values in columns.items()}
+
+    def load_frame(self, ticker, start=None, end=None):
+        """
+        Price frame for [start, end)
+
+        The price columns are views of the mapped arrays; only the date
+        index is converted (to nanoseconds), and so copied.
+        """
+        columns = self.read(ticker, start, end)
+        data = {frame_name: columns[name] for name, (_, _, frame_name) in COLUMNS.items() if frame_name}
+        if data['Volume'].dtype != np.float64:
+            # Stores written before volumes were float: cast until the next full sync
+            data['Volume'] = data['Volume'].astype(np.float64)
+        index = pd.DatetimeIndex(columns['date'].astype('datetime64[ns]'))
+        return pd.DataFrame(data, index=index, copy=False)
+
+    def last_date(self, ticker):
+        dates = np.load(os.path.join(self.path(ticker), 'date.npy'), mmap_mode='r')
+        return dates[-1].astype(object) if len(dates) else None
+
+    def _fetch(self, db, stock_id, after=None):
+        """Column arrays for a stock's stored prices, optionally only after a date"""
+        query = select(*[getattr(StockPrice, attr) for attr, _, _ in COLUMNS.values()]).where(
+            StockPrice.stock_id == stock_id
+        )
+        if after is not None:
+            query = query.where(StockPrice.date > after)
+        rows = db.execute(query.order_by(StockPrice.date)).all()
+
+        columns = list(zip(*rows)) if rows else [[] for _ in COLUMNS]
+        arrays = {}
+        for (name, (_, dtype, _)), values in zip(COLUMNS.items(), columns):
+            if dtype == np.float64:
+                values = [np.nan if v is None else float(v) for v in values]
+            arrays[name] = np.array(values, dtype=dtype)
+        return arrays
+
+    def write(self, ticker, arrays):
+        """Replace a ticker's files atomically"""
+        directory = self.path(ticker)
+        os.makedirs(directory, exist_ok=True)
+        for name, values in arrays.items():
+            tmp_path = os.path.join(directory, f".{name}.npy.tmp")
+            with open(tmp_path, 'wb') as f:
+                np.save(f, values)
+            os.replace(tmp_path, os.path.join(directory, f"{name}.npy"))
+
+    @contextmanager
+    def lock(self, ticker):
+        """Exclusive per-ticker lock (a .lock file next to the columns) held while writing"""
+        directory = self.path(ticker)
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, '.lock'), 'a') as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def sync(self, db, stock, full=False):
+        """
+        Bring a ticker's files up to date with stock_prices
+
+        Appends only dates after the last stored one. Falls back to a full
+        rebuild when requested, when nothing is stored yet, when the
+        database gained rows at or before the last stored date, or when the
+        files predate float volumes. Runs under the ticker's lock, so two
+        jobs syncing one ticker cannot interleave their appends.
+
+        Returns:
+            Number of rows written
+        """
+        with self.lock(stock.ticker):
+            return self._sync(db, stock, full)
+
+    def _sync(self, db, stock, full):
+        if not full and self.has(stock.ticker):
+            volume = np.load(os.path.join(self.path(stock.ticker), 'volume.npy'), mmap_mode='r')
+            full = volume.dtype != np.float64
+
+        if not full and self.has(stock.ticker):
+            last = self.last_date(stock.ticker)
+            stored = len(np.load(os.path.join(self.path(stock.ticker), 'date.npy'), mmap_mode='r'))
+            in_db = db.execute(
+                select(func.count()).select_from(StockPrice).where(
+                    StockPrice.stock_id == stock.id, StockPrice.date <= last
+                )
+            ).scalar() if last is not None else 0
+
+            if in_db == stored:
+                arrays = self._fetch(db, stock.id, after=last)
+                if len(arrays['date']):
+                    # Write the date column last so readers never see dates without values
+                    for name in [n for n in COLUMNS if n != 'date'] + ['date']:
+                        _append_npy(os.path.join(self.path(stock.ticker), f"{name}.npy"), arrays[name])
+                return len(arrays['date'])
+
+        arrays = self._fetch(db, stock.id)
+        self.write(stock.ticker, arrays)
+        return len(arrays['date'])
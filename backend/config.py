@@ -17,11 +17,97 @@ class Config:
     DB_USER = os.getenv('DB_USER', 'postgres')
     DB_PASSWORD = os.getenv('DB_PASSWORD', 'postgres')
     
-    # SQLAlchemy database URI
-    SQLALCHEMY_DATABASE_URI = f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+    # SQLAlchemy database URI (DATABASE_URL overrides, e.g. sqlite:///bench.db)
+    SQLALCHEMY_DATABASE_URI = os.getenv(
+        'DATABASE_URL', f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+    )
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     
+    # Connection pool (pool size/overflow apply to server databases, not SQLite)
+    DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '10'))
+    DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', '20'))
+    DB_POOL_TIMEOUT = int(os.getenv('DB_POOL_TIMEOUT', '30'))  # Seconds to wait for a free connection
+    DB_POOL_PRE_PING = os.getenv('DB_POOL_PRE_PING', 'True') == 'True'
+    DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', '1800'))  # Seconds; -1 = never
+    
     # Trading config
     DEFAULT_INITIAL_CAPITAL = 10000
     DEFAULT_SHORT_WINDOW = 20  # Short-term moving average period
-    DEFAULT_LONG_WINDOW = 50   # Long-term moving average period
\ No newline at end of file
+    DEFAULT_LONG_WINDOW = 50   # Long-term moving average period
+    
+    # Simulation engine: 'vectorized', 'loop', or 'verify' (runs both and checks they agree)
+    SIMULATION_ENGINE = os.getenv('SIMULATION_ENGINE', 'vectorized')
+    
+    # Rows per executemany batch when storing downloaded prices
+    PRICE_INSERT_BATCH_SIZE = int(os.getenv('PRICE_INSERT_BATCH_SIZE', '1000'))
+    
+    # Price data source: 'yfinance' or 'file' (CSV/Parquet per ticker in PRICE_DATA_DIR)
+    DATA_SOURCE = os.getenv('DATA_SOURCE', 'yfinance')
+    PRICE_DATA_DIR = os.getenv('PRICE_DATA_DIR', 'data/prices')
+    
+    # Longest empty gap (weekdays) next to covered prices that counts as a market holiday
+    PRICE_HOLIDAY_GAP_DAYS = int(os.getenv('PRICE_HOLIDAY_GAP_DAYS', '4'))
+    
+    # Background backtest jobs: worker count and pool type ('thread' or 'process')
+    JOB_WORKERS = int(os.getenv('JOB_WORKERS', '4'))
+    JOB_EXECUTOR = os.getenv('JOB_EXECUTOR', 'thread')
+    
+    # How the sweep, walk-forward, robustness and batch process pools start workers
+    # ('spawn' or 'forkserver'; 'fork' can deadlock under multi-threaded web workers)
+    PROCESS_START_METHOD = os.getenv('PROCESS_START_METHOD', 'spawn')
+    
+    # Parameter sweeps: process pool size (0 or 1 = in-process) and max pairs x bars per batch
+    SWEEP_WORKERS = int(os.getenv('SWEEP_WORKERS', '0'))
+    SWEEP_CHUNK_CELLS = int(os.getenv('SWEEP_CHUNK_CELLS', '5000000'))
+    
+    # Portfolio backtests: per-ticker loading/signal pool size and type ('thread' or 'process')
+    PORTFOLIO_WORKERS = int(os.getenv('PORTFOLIO_WORKERS', '16'))
+    PORTFOLIO_EXECUTOR = os.getenv('PORTFOLIO_EXECUTOR', 'thread')
+    
+    # Max memoized indicator columns kept in memory (LRU)
+    INDICATOR_CACHE_SIZE = int(os.getenv('INDICATOR_CACHE_SIZE', '256'))
+    
+    # Walk-forward evaluation: process pool size for folds (0 or 1 = in-process)
+    WALKFORWARD_WORKERS = int(os.getenv('WALKFORWARD_WORKERS', '0'))
+    
+    # Rows per server-side cursor fetch when streaming exports
+    EXPORT_CHUNK_SIZE = int(os.getenv('EXPORT_CHUNK_SIZE', '5000'))
+    
+    # Columnar price store (one .npy per column per ticker), memory-mapped on read
+    COLUMN_STORE_ENABLED = os.getenv('COLUMN_STORE_ENABLED', 'False') == 'True'
+    COLUMN_STORE_DIR = os.getenv('COLUMN_STORE_DIR', 'data/columns')
+    
+    # Result cache: reuse completed backtests with identical inputs and price data
+    RESULT_CACHE_ENABLED = os.getenv('RESULT_CACHE_ENABLED', 'True') == 'True'
+    RESULT_CACHE_TTL = int(os.getenv('RESULT_CACHE_TTL', '86400'))  # Seconds; 0 = never expire
+    RESULT_CACHE_MAX_ENTRIES = int(os.getenv('RESULT_CACHE_MAX_ENTRIES', '10000'))
+    
+    # Logging level ('DEBUG' also logs every trade) and functions listed in profile reports
+    LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+    PROFILE_TOP_FUNCTIONS = int(os.getenv('PROFILE_TOP_FUNCTIONS', '40'))
+    
+    # Production server (gunicorn.conf.py / wsgi.py): bind address, worker processes, threads per worker
+    WEB_BIND = os.getenv('WEB_BIND', '0.0.0.0:5000')
+    WEB_WORKERS = int(os.getenv('WEB_WORKERS', '4'))
+    WEB_THREADS = int(os.getenv('WEB_THREADS', '4'))
+    
+    # Daily portfolio history storage: 'rows' (portfolio_history table) or 'compact' (compressed blobs)
+    HISTORY_STORAGE = os.getenv('HISTORY_STORAGE', 'rows')
+    
+    # Minute-bar backtests: bars per streamed chunk, and the CSV directory for manage.py load-intraday
+    INTRADAY_CHUNK_SIZE = int(os.getenv('INTRADAY_CHUNK_SIZE', '50000'))
+    INTRADAY_DATA_DIR = os.getenv('INTRADAY_DATA_DIR', 'data/intraday')
+    
+    # Monte Carlo robustness: process pool size (0 or 1 = in-process), paths per seeded batch,
+    # largest request accepted and default block length (days) for the block bootstrap
+    ROBUSTNESS_WORKERS = int(os.getenv('ROBUSTNESS_WORKERS', '0'))
+    ROBUSTNESS_BATCH_PATHS = int(os.getenv('ROBUSTNESS_BATCH_PATHS', '500'))
+    ROBUSTNESS_MAX_PATHS = int(os.getenv('ROBUSTNESS_MAX_PATHS', '100000'))
+    ROBUSTNESS_BLOCK_SIZE = int(os.getenv('ROBUSTNESS_BLOCK_SIZE', '20'))
+    
+    # Most backtests accepted by one /api/analytics/correlation request
+    ANALYTICS_MAX_CORRELATION = int(os.getenv('ANALYTICS_MAX_CORRELATION', '50'))
+    
+    # Batch backtests (/api/backtests/batch): process pool size (0 or 1 = in-process) and most specs per request
+    BATCH_WORKERS = int(os.getenv('BATCH_WORKERS', '0'))
+    BATCH_MAX_SPECS = int(os.getenv('BATCH_MAX_SPECS', '1000'))
@@ -0,0 +1,163 @@
+import struct
+import zlib
+import numpy as np
+from sqlalchemy import select, func, insert, delete
+from models import PortfolioHistory, PortfolioCurve
+
+CURVE_ENCODING = 'shuffle-zlib-v1'
+CURVE_COLUMNS = ('portfolio_value', 'stock_price', 'shares_held')
+
+# Decimal places kept per column, matching the portfolio_history Numeric columns
+CURVE_PRECISION = {'portfolio_value': 2, 'stock_price': 2, 'shares_held': 6}
+
+# magic, number of points, first date (days since 1970-01-01)
+_HEADER = struct.Struct('<4sIq')
+_MAGIC = b'PHC1'
+
+
+def _shuffle(array):
+    """Group byte k of every element together so zlib sees long similar runs"""
+    array = np.ascontiguousarray(array)
+    return array.view(np.uint8).reshape(-1, array.itemsize).T.tobytes()
+
+
+def _unshuffle(data, dtype, n):
+    itemsize = np.dtype(dtype).itemsize
+    return np.frombuffer(data, dtype=np.uint8).reshape(itemsize, n).T.copy().view(dtype).reshape(n)
+
+
+def encode_curve(dates, columns):
+    """
+    Pack one equity curve into a compressed blob
+
+    Dates are stored as day deltas (int32); each float column is rounded
+    to its Numeric precision and byte-shuffled before a single zlib pass.
+
+    Args:
+        dates: Daily dates (anything convertible to datetime64[D])
+        columns: dict with a float array for each of CURVE_COLUMNS
+    """
+    days = np.asarray(dates, dtype='datetime64[D]').astype(np.int64)
+    n = len(days)
+    first_day = int(days[0]) if n else 0
+
+    parts = [_shuffle(np.diff(days, prepend=first_day).astype(np.int32))]
+    for name in CURVE_COLUMNS:
+        values = np.round(np.asarray(columns[name], dtype=np.float64), CURVE_PRECISION[name])
+        parts.append(_shuffle(values))
+
+    return _HEADER.pack(_MAGIC, n, first_day) + zlib.compress(b''.join(parts), 6)
+
+
+def decode_curve(blob):
+    """
+    Unpack a blob from encode_curve
+
+    Returns:
+        dict with 'date' (datetime64[D]) and a float64 array per CURVE_COLUMNS
+    """
+    magic, n, first_day = _HEADER.unpack_from(blob)
+    if magic != _MAGIC:
+        raise ValueError('Unknown portfolio curve encoding')
+    raw = zlib.decompress(bytes(blob[_HEADER.size:]))
+
+    deltas = _unshuffle(raw[:4 * n], np.int32, n)
+    arrays = {'date': (first_day + np.cumsum(deltas, dtype=np.int64)).astype('datetime64[D]')}
+    offset = 4 * n
+    for name in CURVE_COLUMNS:
+        arrays[name] = _unshuffle(raw[offset:offset + 8 * n], np.float64, n)
+        offset += 8 * n
+    return arrays
+
+
+def _empty_arrays():
+    arrays = {'date': np.empty(0, dtype='datetime64[D]')}
+    arrays.update({name: np.empty(0) for name in CURVE_COLUMNS})
+    return arrays
+
+
+def _concat(parts):
+    if not parts:
+        return _empty_arrays()
+    return {key: np.concatenate([part[key] for part in parts]) for key in parts[0]}
+
+
+def store_curve(db, backtest_id, dates, columns):
+    """Add a curve segment after any the backtest already has"""
+    if len(dates) == 0:
+        return
+    segment = db.execute(
+        select(func.max(PortfolioCurve.segment)).where(PortfolioCurve.backtest_id == backtest_id)
+    ).scalar()
+    days = np.asarray(dates, dtype='datetime64[D]')
+
+    db.execute(insert(PortfolioCurve), [{
+        'backtest_id': backtest_id,
+        'segment': 0 if segment is None else segment + 1,
+        'start_date': days[0].astype(object),
+        'end_date': days[-1].astype(object),
+        'num_points': len(days),
+        'encoding': CURVE_ENCODING,
+        'data': encode_curve(days, columns)
+    }])
+
+
+def has_curve(db, backtest_id):
+    return db.execute(
+        select(PortfolioCurve.id).where(PortfolioCurve.backtest_id == backtest_id).limit(1)
+    ).first() is not None
+
+
+def history_arrays(db, backtest_id):
+    """
+    A backtest's full daily history as NumPy arrays, whichever way it is stored
+
+    Rows still in portfolio_history and the decoded curve segments are
+    merged in date order: a backtest extended after HISTORY_STORAGE
+    changed can hold later days in portfolio_history than in its curves.
+    """
+    parts = []
+
+    rows = db.execute(
+        select(PortfolioHistory.date, PortfolioHistory.portfolio_value,
+               PortfolioHistory.stock_price, PortfolioHistory.shares_held)
+        .where(PortfolioHistory.backtest_id == backtest_id)
+        .order_by(PortfolioHistory.date)
+    ).all()
+    if rows:
+        dates, values, prices, shares = zip(*rows)
+        parts.append({
+            'date': np.array(dates, dtype='datetime64[D]'),
+            'portfolio_value': np.array(values, dtype=np.float64),
+            'stock_price': np.array(prices, dtype=np.float64),
+            'shares_held': np.array([0.0 if s is None else float(s) for s in shares])
+        })
+
+    blobs = db.execute(
+        select(PortfolioCurve.data).where(PortfolioCurve.backtest_id == backtest_id)
+        .order_by(PortfolioCurve.segment)
+    ).scalars()
+    parts.extend(decode_curve(blob) for blob in blobs)
+
+    arrays = _concat(parts)
+    if len(parts) > 1:
+        order = np.argsort(arrays['date'], kind='stable')
+        arrays = {key: values[order] for key, values in arrays.items()}
+    return arrays
+
+
+def compact_backtest_history(db, backtest_id):
+    """
+    Move a backtest's portfolio_history rows (and any segments) into one curve blob
+
+    Returns:
+        Number of points stored, or 0 if there was nothing to compact
+    """
+    arrays = history_arrays(db, backtest_id)
+    if len(arrays['date']) == 0:
+        return 0
+
+    db.execute(delete(PortfolioHistory).where(PortfolioHistory.backtest_id == backtest_id))
+    db.execute(delete(PortfolioCurve).where(PortfolioCurve.backtest_id == backtest_id))
+    store_curve(db, backtest_id, arrays['date'], arrays)
+    return len(arrays['date'])
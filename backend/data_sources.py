@@ -0,0 +1,100 @@
+import os
+import pandas as pd
+from config import Config
+
+
+class DataSource:
+    """
+    Base class for historical price sources
+
+    fetch() returns a DataFrame indexed by date with Open, High, Low, Close
+    and Volume columns covering [start_date, end_date).
+    """
+
+    name = None
+
+    def fetch(self, ticker, start_date, end_date):
+        raise NotImplementedError
+
+    def confirms_empty(self, ticker):
+        """
+        Whether an empty fetch() result for this ticker means there are no bars
+
+        False when an empty frame may also stand for a failed request, so
+        the range must not be treated as fetched.
+        """
+        return False
+
+
+class YFinanceSource(DataSource):
+    """
+    Downloads daily bars from Yahoo Finance
+
+    yf.download returns an empty frame on network errors and rate limits
+    as well as for ranges without bars, so empty results are never confirmed.
+    """
+
+    name = 'yfinance'
+
+    def fetch(self, ticker, start_date, end_date):
+        import yfinance as yf
+        return yf.download(ticker, start=str(start_date), end=str(end_date), progress=False)
+
+
+class FileSource(DataSource):
+    """
+    Reads daily bars from local files, one per ticker
+
+    Looks for <data_dir>/<TICKER>.parquet, then <data_dir>/<TICKER>.csv.
+    CSV files need a date column first, followed by Open/High/Low/Close/Volume.
+    """
+
+    name = 'file'
+
+    def __init__(self, data_dir=None):
+        self.data_dir = data_dir or Config.PRICE_DATA_DIR
+
+    def _path(self, ticker):
+        """The ticker's Parquet or CSV file, or None if there is neither"""
+        for extension in ('parquet', 'csv'):
+            path = os.path.join(self.data_dir, f"{ticker}.{extension}")
+            if os.path.exists(path):
+                return path
+        return None
+
+    def _load(self, ticker):
+        path = self._path(ticker)
+        if path is None:
+            return pd.DataFrame(columns=['Open', 'High', 'Low', 'Close', 'Volume'],
+                                index=pd.DatetimeIndex([]))
+
+        if path.endswith('.parquet'):
+            df = pd.read_parquet(path)
+        else:
+            df = pd.read_csv(path, index_col=0, parse_dates=True)
+
+        df.index = pd.DatetimeIndex(df.index)
+        return df.sort_index()
+
+    def fetch(self, ticker, start_date, end_date):
+        df = self._load(ticker)
+        mask = (df.index >= pd.Timestamp(start_date)) & (df.index < pd.Timestamp(end_date))
+        return df.loc[mask]
+
+    def confirms_empty(self, ticker):
+        # A file that exists is the full history; a missing one may still be added
+        return self._path(ticker) is not None
+
+
+DATA_SOURCES = {
+    YFinanceSource.name: YFinanceSource,
+    FileSource.name: FileSource
+}
+
+
+def get_data_source(name=None):
+    """Create the configured data source"""
+    name = name or Config.DATA_SOURCE
+    if name not in DATA_SOURCES:
+        raise ValueError(f"Unknown data source: {name}")
+    return DATA_SOURCES[name]()
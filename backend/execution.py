@@ -0,0 +1,130 @@
+import math
+import numpy as np
+
+# Where orders fill: on the signal bar's close, or the next bar's open
+FILL_MODES = ('close', 'next_open')
+
+
+class ExecutionModel:
+    """
+    Trading costs and order handling applied by the simulation
+
+    The default instance is frictionless (all in at the signal bar's close,
+    no costs), which reproduces the original simulation exactly.
+
+    Args:
+        commission: Fixed commission per trade in dollars
+        commission_pct: Commission as a fraction of the traded value
+        slippage_bps: Price moved against us on every fill, in basis points
+        whole_shares: Buy whole shares only; leftover cash stays uninvested
+        fill: 'close' or 'next_open'
+        position_size: Fraction of available cash committed to each buy
+    """
+
+    def __init__(self, commission=0.0, commission_pct=0.0, slippage_bps=0.0,
+                 whole_shares=False, fill='close', position_size=1.0):
+        self.commission = float(commission)
+        self.commission_pct = float(commission_pct)
+        self.slippage_bps = float(slippage_bps)
+        self.whole_shares = bool(whole_shares)
+        self.fill = fill
+        self.position_size = float(position_size)
+        self.validate()
+
+    @classmethod
+    def from_dict(cls, params=None):
+        """
+        Build from a request/Backtest dict (None gives the frictionless model)
+
+        Raises:
+            ValueError: for unknown keys or invalid values
+        """
+        params = dict(params or {})
+        unknown = set(params) - set(cls().to_dict())
+        if unknown:
+            raise ValueError(f"Unknown execution settings: {', '.join(sorted(unknown))}")
+        return cls(**params)
+
+    def to_dict(self):
+        return {
+            'commission': self.commission,
+            'commission_pct': self.commission_pct,
+            'slippage_bps': self.slippage_bps,
+            'whole_shares': self.whole_shares,
+            'fill': self.fill,
+            'position_size': self.position_size
+        }
+
+    def validate(self):
+        if self.fill not in FILL_MODES:
+            raise ValueError(f"fill must be one of: {', '.join(FILL_MODES)}")
+        if self.commission < 0 or self.commission_pct < 0 or self.slippage_bps < 0:
+            raise ValueError('Commission and slippage cannot be negative')
+        if not 0 < self.position_size <= 1:
+            raise ValueError('position_size must be in (0, 1]')
+
+    def fill_prices(self, df, events):
+        """
+        Fill bar and price for every bar's order, as arrays
+
+        Args:
+            df: Signal frame (needs Close, and Open for next_open fills)
+            events: +1 buy / -1 sell / 0 per bar
+
+        Returns:
+            (fill_bar, fill_price); fill_bar is len(df) where an order
+            cannot fill (a next_open order on the last bar)
+        """
+        n = len(events)
+        slippage = self.slippage_bps / 10000
+
+        if self.fill == 'next_open':
+            fill_bar = np.arange(1, n + 1)
+            base = np.append(np.asarray(df['Open'], dtype=np.float64).reshape(-1)[1:], np.nan)
+        else:
+            fill_bar = np.arange(n)
+            base = np.asarray(df['Close'], dtype=np.float64).reshape(-1)
+
+        return fill_bar, base * (1 + events * slippage)
+
+    def fill_price(self, base, side):
+        """Scalar counterpart of fill_prices for one order"""
+        return base * (1 + side * (self.slippage_bps / 10000))
+
+    def buy(self, cash, price):
+        """
+        Open a position with position_size of cash
+
+        Returns:
+            (shares bought, cash left, fees); zero shares if the budget
+            cannot cover the commission or a single whole share
+        """
+        budget = cash * self.position_size
+        shares = (budget - self.commission) / (price * (1 + self.commission_pct))
+
+        if self.whole_shares:
+            shares = math.floor(shares)
+            if shares <= 0:
+                return 0.0, cash, 0.0
+            cost = shares * price
+            fees = self.commission + cost * self.commission_pct
+            return float(shares), cash - cost - fees, fees
+
+        if shares <= 0:
+            return 0.0, cash, 0.0
+        fees = self.commission + shares * price * self.commission_pct
+        return shares, cash - budget, fees
+
+    def sell(self, shares, cash, price):
+        """
+        Close the whole position
+
+        Returns:
+            (cash after the sale, fees)
+        """
+        proceeds = shares * price
+        fees = self.commission + proceeds * self.commission_pct
+        return cash + (proceeds - fees), fees
+
+
+FRICTIONLESS = ExecutionModel()
@@ -0,0 +1,191 @@
+import csv
+import io
+import json
+from sqlalchemy import select
+from config import Config
+from models import SessionLocal, Trade, PortfolioHistory
+from curve_store import has_curve, history_arrays
+
+EXPORT_TABLES = {
+    'history': (PortfolioHistory, ('date', 'portfolio_value', 'stock_price', 'shares_held')),
+    'trades': (Trade, ('date', 'trade_type', 'price', 'shares', 'capital', 'fees'))
+}
+
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+    'arrow': 'application/vnd.apache.arrow.stream',
+    'parquet': 'application/vnd.apache.parquet'
+}
+
+# Formats that need pyarrow installed
+ARROW_FORMATS = ('arrow', 'parquet')
+
+
+def _convert(value):
+    """JSON/CSV-friendly scalar: Decimal -> float, date -> ISO string"""
+    if value is None or isinstance(value, (str, int, float)):
+        return value
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return float(value)
+
+
+def iter_chunks(db, table, backtest_id, chunk_size=None):
+    """
+    Yield lists of rows for one backtest, reading through a server-side cursor
+
+    Only chunk_size rows are held in memory at a time.
+    """
+    model, fields = EXPORT_TABLES[table]
+    chunk_size = chunk_size or Config.EXPORT_CHUNK_SIZE
+
+    if table == 'history' and has_curve(db, backtest_id):
+        # Compact curves are decoded whole; they are small compared to the row form
+        arrays = history_arrays(db, backtest_id)
+        columns = [arrays[field].tolist() for field in fields]
+        rows = list(zip(*columns))
+        for start in range(0, len(rows), chunk_size):
+            yield rows[start:start + chunk_size]
+        return
+
+    result = db.execute(
+        select(*[getattr(model, field) for field in fields])
+        .where(model.backtest_id == backtest_id)
+        .order_by(model.date, model.id)
+        .execution_options(stream_results=True, yield_per=chunk_size)
+    )
+    for partition in result.partitions(chunk_size):
+        yield partition
+
+
+def ndjson_lines(chunks, fields):
+    for rows in chunks:
+        yield ''.join(
+            json.dumps({field: _convert(value) for field, value in zip(fields, row)}) + '\n'
+            for row in rows
+        )
+
+
+def csv_lines(chunks, fields):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    writer.writerow(fields)
+    for rows in chunks:
+        writer.writerows([_convert(value) for value in row] for row in rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file that hands back whatever was written since the last drain"""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _arrow_schema(pa, table):
+    if table == 'history':
+        return pa.schema([
+            ('date', pa.date32()),
+            ('portfolio_value', pa.float64()),
+            ('stock_price', pa.float64()),
+            ('shares_held', pa.float64())
+        ])
+    return pa.schema([
+        ('date', pa.date32()),
+        ('trade_type', pa.string()),
+        ('price', pa.float64()),
+        ('shares', pa.float64()),
+        ('capital', pa.float64()),
+        ('fees', pa.float64())
+    ])
+
+
+def _record_batch(pa, schema, rows):
+    columns = list(zip(*rows))
+    arrays = []
+    for field, values in zip(schema, columns):
+        if pa.types.is_floating(field.type):
+            values = [None if v is None else float(v) for v in values]
+        arrays.append(pa.array(values, type=field.type))
+    return pa.record_batch(arrays, schema=schema)
+
+
+def arrow_bytes(chunks, table, fmt):
+    """Yield an Arrow IPC stream or Parquet file one record batch / row group at a time"""
+    import pyarrow as pa
+
+    schema = _arrow_schema(pa, table)
+    sink = _ChunkSink()
+    output = pa.PythonFile(sink, mode='w')
+
+    if fmt == 'parquet':
+        import pyarrow.parquet as pq
+        writer = pq.ParquetWriter(output, schema)
+        write = lambda batch: writer.write_table(pa.Table.from_batches([batch]))
+    else:
+        writer = pa.ipc.new_stream(output, schema)
+        write = writer.write_batch
+
+    for rows in chunks:
+        if rows:
+            write(_record_batch(pa, schema, rows))
+            yield sink.drain()
+
+    writer.close()
+    yield sink.drain()
+
+
+def stream_export(backtest_id, table, fmt, chunk_size=None):
+    """
+    Generator producing the export body; owns its own session for the whole stream
+
+    Args:
+        backtest_id: Backtest to export
+        table: 'history' or 'trades'
+        fmt: One of EXPORT_FORMATS
+    """
+    fields = EXPORT_TABLES[table][1]
+    db = SessionLocal()
+    try:
+        chunks = iter_chunks(db, table, backtest_id, chunk_size)
+        if fmt == 'ndjson':
+            yield from ndjson_lines(chunks, fields)
+        elif fmt == 'csv':
+            yield from csv_lines(chunks, fields)
+        else:
+            yield from arrow_bytes(chunks, table, fmt)
+    finally:
+        db.close()
+
+
+def arrow_available():
+    try:
+        import pyarrow  # noqa: F401
+        return True
+    except ImportError:
+        return False
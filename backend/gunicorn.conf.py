@@ -0,0 +1,18 @@
+"""
+gunicorn settings, read from Config: gunicorn -c gunicorn.conf.py wsgi:app
+
+Tables are not created on start; run `python manage.py init-db` once per database.
+"""
+from config import Config
+
+bind = Config.WEB_BIND
+workers = Config.WEB_WORKERS
+threads = Config.WEB_THREADS
+worker_class = 'gthread'
+timeout = 120
+accesslog = '-'
+
+
+def post_fork(server, worker):
+    from models import engine
+    engine.dispose(close=False)
@@ -0,0 +1,114 @@
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from config import Config
+
+
+def series_fingerprint(series):
+    """Cheap identity for a price series: length, date span and end values"""
+    if len(series) == 0:
+        return (0,)
+    return (
+        len(series),
+        series.index[0],
+        series.index[-1],
+        float(series.iloc[0]),
+        float(series.iloc[-1])
+    )
+
+
+class IndicatorCache:
+    """
+    Memoized indicator columns with LRU eviction
+
+    Entries are keyed on (series key, series fingerprint, indicator, params),
+    so repeated runs on the same ticker and window reuse computed columns.
+    Cached Series are shared between callers and must not be modified.
+    """
+
+    def __init__(self, maxsize=None):
+        self.maxsize = maxsize if maxsize is not None else Config.INDICATOR_CACHE_SIZE
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, series, indicator, params, compute):
+        """
+        Return a cached indicator, computing it on a miss
+
+        Args:
+            key: Identifies the series (e.g. (ticker, 'Close'))
+            series: The input pandas Series
+            indicator: Indicator name
+            params: Tuple of indicator parameters
+            compute: Callable taking the series and returning the indicator
+        """
+        cache_key = (key, series_fingerprint(series), indicator, params)
+
+        with self._lock:
+            if cache_key in self._entries:
+                self._entries.move_to_end(cache_key)
+                self.hits += 1
+                return self._entries[cache_key]
+            self.misses += 1
+
+        value = compute(series)
+
+        if self.maxsize > 0:
+            with self._lock:
+                self._entries[cache_key] = value
+                self._entries.move_to_end(cache_key)
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses
+            }
+
+
+indicator_cache = IndicatorCache()
+
+
+def sma(series, window, key=None):
+    """Simple moving average"""
+    return indicator_cache.get(key, series, 'sma', (window,),
+                               lambda s: s.rolling(window=window).mean())
+
+
+def rolling_std(series, window, key=None):
+    """Rolling sample standard deviation"""
+    return indicator_cache.get(key, series, 'std', (window,),
+                               lambda s: s.rolling(window=window).std())
+
+
+def rsi(series, period, key=None):
+    """Relative Strength Index with Wilder smoothing"""
+    def compute(s):
+        delta = s.diff()
+        gain = delta.clip(lower=0).ewm(alpha=1 / period, adjust=False, min_periods=period).mean()
+        loss = (-delta.clip(upper=0)).ewm(alpha=1 / period, adjust=False, min_periods=period).mean()
+        rs = gain / loss
+        # No losses in the window means maximum strength
+        return pd.Series(np.where(loss == 0, 100.0, 100 - 100 / (1 + rs)), index=s.index).where(loss.notna())
+    return indicator_cache.get(key, series, 'rsi', (period,), compute)
+
+
+def momentum(series, lookback, key=None):
+    """Rate of change over a lookback period"""
+    return indicator_cache.get(key, series, 'momentum', (lookback,),
+                               lambda s: s / s.shift(lookback) - 1)
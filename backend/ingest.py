@@ -0,0 +1,178 @@
+import numpy as np
+import pandas as pd
+from sqlalchemy import insert, select
+from config import Config
+from models import StockPrice, IntradayPrice
+
+
+def _column(df, name):
+    """Return a DataFrame column as a flat array"""
+    return np.asarray(df[name]).reshape(-1)
+
+
+def _insert_prices(db, model=StockPrice, key='date'):
+    """
+    INSERT for a price table that skips rows already present
+
+    Another worker may store the same bar between our existence check and
+    the insert; on PostgreSQL and SQLite the unique (stock_id, key) index
+    then drops the duplicate instead of failing the batch.
+    """
+    dialect = db.get_bind().dialect.name
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        return insert(model)
+    return dialect_insert(model).on_conflict_do_nothing(index_elements=['stock_id', key])
+
+
+def _insert_batches(db, statement, rows, batch_size):
+    """
+    executemany the rows in batches and return how many were inserted
+
+    Runs on the session's Core connection: an ORM-enabled execute returns
+    a result without rowcount. ON CONFLICT DO NOTHING skips rows stored
+    concurrently, so rowcount is what actually landed; drivers that cannot
+    report it for executemany (rowcount -1) count the whole batch.
+    """
+    connection = db.connection()
+    inserted = 0
+    for start in range(0, len(rows), batch_size):
+        batch = rows[start:start + batch_size]
+        result = connection.execute(statement, batch)
+        inserted += result.rowcount if result.rowcount >= 0 else len(batch)
+    return inserted
+
+
+def store_prices(db, stock_id, df, batch_size=None):
+    """
+    Bulk insert downloaded OHLCV rows that are not already stored
+
+    Existing dates are found with a single range query over the download
+    window, and the new rows are written with executemany in batches
+    instead of one ORM object per day.
+
+    Args:
+        db: SQLAlchemy database session
+        stock_id: ID of the Stock the prices belong to
+        df: DataFrame indexed by date with Open/High/Low/Close/Volume columns
+        batch_size: Rows per executemany batch (defaults to Config.PRICE_INSERT_BATCH_SIZE)
+
+    Returns:
+        dict with the number of rows inserted and skipped
+    """
+    if len(df) == 0:
+        return {'inserted': 0, 'skipped': 0}
+
+    batch_size = batch_size or Config.PRICE_INSERT_BATCH_SIZE
+    dates = [d.date() for d in df.index]
+
+    # One range query for every date we already hold in this window
+    existing = set(db.execute(
+        select(StockPrice.date).where(
+            StockPrice.stock_id == stock_id,
+            StockPrice.date >= min(dates),
+            StockPrice.date <= max(dates)
+        )
+    ).scalars())
+
+    opens = _column(df, 'Open').astype(float).tolist()
+    highs = _column(df, 'High').astype(float).tolist()
+    lows = _column(df, 'Low').astype(float).tolist()
+    closes = _column(df, 'Close').astype(float).tolist()
+    volumes = _column(df, 'Volume').astype(np.int64).tolist()
+
+    rows = []
+    seen = set()
+    for i, date in enumerate(dates):
+        if date in existing or date in seen:
+            continue
+        seen.add(date)
+        rows.append({
+            'stock_id': stock_id,
+            'date': date,
+            'open': opens[i],
+            'high': highs[i],
+            'low': lows[i],
+            'close': closes[i],
+            'volume': volumes[i]
+        })
+
+    inserted = _insert_batches(db, _insert_prices(db), rows, batch_size)
+
+    return {'inserted': inserted, 'skipped': len(dates) - inserted}
+
+
+def store_intraday_prices(db, stock_id, df, batch_size=None):
+    """
+    Bulk insert timestamped bars that are not already stored
+
+    Same approach as store_prices, keyed on the bar timestamp.
+
+    Args:
+        db: SQLAlchemy database session
+        stock_id: ID of the Stock the bars belong to
+        df: DataFrame indexed by timestamp with Open/High/Low/Close/Volume columns
+        batch_size: Rows per executemany batch (defaults to Config.PRICE_INSERT_BATCH_SIZE)
+
+    Returns:
+        dict with the number of rows inserted and skipped
+    """
+    if len(df) == 0:
+        return {'inserted': 0, 'skipped': 0}
+
+    batch_size = batch_size or Config.PRICE_INSERT_BATCH_SIZE
+    timestamps = [t.to_pydatetime() for t in pd.DatetimeIndex(df.index)]
+
+    existing = set(db.execute(
+        select(IntradayPrice.timestamp).where(
+            IntradayPrice.stock_id == stock_id,
+            IntradayPrice.timestamp >= min(timestamps),
+            IntradayPrice.timestamp <= max(timestamps)
+        )
+    ).scalars())
+
+    columns = {name: _column(df, name).astype(float).tolist() for name in ('Open', 'High', 'Low', 'Close')}
+    volumes = np.nan_to_num(_column(df, 'Volume').astype(float)).astype(np.int64).tolist()
+
+    rows = []
+    seen = set()
+    for i, timestamp in enumerate(timestamps):
+        if timestamp in existing or timestamp in seen:
+            continue
+        seen.add(timestamp)
+        rows.append({
+            'stock_id': stock_id,
+            'timestamp': timestamp,
+            'open': columns['Open'][i],
+            'high': columns['High'][i],
+            'low': columns['Low'][i],
+            'close': columns['Close'][i],
+            'volume': volumes[i]
+        })
+
+    inserted = _insert_batches(db, _insert_prices(db, IntradayPrice, 'timestamp'), rows, batch_size)
+
+    return {'inserted': inserted, 'skipped': len(timestamps) - inserted}
+
+
+def load_intraday_csv(db, stock, path, chunk_size=None):
+    """
+    Stream a minute-bar CSV into intraday_prices, committing every chunk
+
+    The file needs a timestamp column first, followed by
+    Open/High/Low/Close/Volume; only chunk_size rows are read at a time.
+
+    Returns:
+        dict with the number of rows inserted and skipped
+    """
+    totals = {'inserted': 0, 'skipped': 0}
+    for chunk in pd.read_csv(path, index_col=0, parse_dates=True,
+                             chunksize=chunk_size or Config.INTRADAY_CHUNK_SIZE):
+        stats = store_intraday_prices(db, stock.id, chunk)
+        db.commit()
+        totals['inserted'] += stats['inserted']
+        totals['skipped'] += stats['skipped']
+    return totals
@@ -0,0 +1,166 @@
+import cProfile
+import io
+import logging
+import pstats
+import time
+from contextlib import contextmanager, nullcontext
+from config import Config
+
+# Pipeline stages timed on every backtest run, in order
+PIPELINE_STAGES = ('fetch', 'ingest', 'load', 'signals', 'simulation', 'persistence', 'metrics')
+
+# Upper bounds (seconds) of the duration histogram buckets
+DURATION_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def configure_logging(level=None):
+    """Send log records to stderr at Config.LOG_LEVEL (or the given level)"""
+    logging.basicConfig(
+        level=level or Config.LOG_LEVEL,
+        format='%(asctime)s %(levelname)s %(name)s: %(message)s'
+    )
+
+
+# Stored histograms: key in duration_histogram_buckets -> (metric name, help text, label name)
+HISTOGRAMS = {
+    'stage': ('backtest_stage_duration_seconds', 'Wall time of each backtest pipeline stage', 'stage'),
+    'backtest': ('backtest_duration_seconds', 'Wall time of whole backtest runs by strategy', 'strategy')
+}
+
+
+def bucket_bound(seconds, buckets=DURATION_BUCKETS):
+    """The le label of the bucket a duration falls in"""
+    for bound in buckets:
+        if seconds <= bound:
+            return str(bound)
+    return '+Inf'
+
+
+def timing_observations(strategy, timings):
+    """(histogram, label, seconds) for every entry of a run's stage_timings"""
+    for stage, seconds in (timings or {}).items():
+        if stage == 'total':
+            yield 'backtest', strategy or 'unknown', seconds
+        else:
+            yield 'stage', stage, seconds
+
+
+def _dialect_insert(dialect):
+    """INSERT construct with ON CONFLICT support for the dialect, or None"""
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+        return insert
+    if dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+        return insert
+    return None
+
+
+def record_timings(db, strategy, timings):
+    """
+    Add a completed run's stage timings to the stored /metrics histograms
+
+    Runs in the caller's transaction, so a run is counted when its
+    completion commits. Buckets are incremented in the database (an upsert
+    on PostgreSQL and SQLite), so concurrent runs in other processes never
+    lose an observation.
+    """
+    from models import DurationHistogramBucket
+
+    table = DurationHistogramBucket.__table__
+    connection = db.connection()
+    insert = _dialect_insert(connection.dialect.name)
+
+    for histogram, label, seconds in timing_observations(strategy, timings):
+        key = {'histogram': histogram, 'label': label, 'le': bucket_bound(seconds)}
+        increment = {'count': table.c.count + 1, 'sum': table.c.sum + seconds}
+
+        if insert is not None:
+            connection.execute(insert(table).values(count=1, sum=seconds, **key).on_conflict_do_update(
+                index_elements=['histogram', 'label', 'le'], set_=increment
+            ))
+            continue
+
+        updated = connection.execute(
+            table.update().where(*[table.c[name] == value for name, value in key.items()]).values(**increment)
+        ).rowcount
+        if not updated:
+            connection.execute(table.insert().values(count=1, sum=seconds, **key))
+
+
+def render_metrics(buckets):
+    """
+    The stored histograms in Prometheus text format
+
+    Args:
+        buckets: Iterable of (histogram, label, le, count, sum) rows from
+            duration_histogram_buckets
+    """
+    series = {}
+    for histogram, label, le, count, seconds in buckets:
+        series.setdefault(histogram, {}).setdefault(label, []).append((le, count, seconds))
+
+    lines = []
+    for histogram, (name, help_text, label_name) in HISTOGRAMS.items():
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+        for label_value, rows in sorted(series.get(histogram, {}).items()):
+            label = f'{label_name}="{label_value}"'
+            counts = {le: count for le, count, _ in rows}
+            total = sum(count for _, count, _ in rows)
+            bounds = sorted({str(bound) for bound in DURATION_BUCKETS} | (set(counts) - {'+Inf'}), key=float)
+            cumulative = 0
+            for bound in bounds:
+                cumulative += counts.get(bound, 0)
+                lines.append(f'{name}_bucket{{{label},le="{bound}"}} {cumulative}')
+            lines.append(f'{name}_bucket{{{label},le="+Inf"}} {total}')
+            lines.append(f'{name}_sum{{{label}}} {sum(seconds for _, _, seconds in rows)}')
+            lines.append(f'{name}_count{{{label}}} {total}')
+    return '\n'.join(lines) + '\n'
+
+
+class StageTimings:
+    """Collects wall time per named stage; repeated stages accumulate"""
+
+    def __init__(self):
+        self.durations = {}
+        self._started = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.durations[name] = self.durations.get(name, 0.0) + time.perf_counter() - started
+
+    def as_dict(self):
+        """Rounded durations plus the total since creation"""
+        durations = {name: round(seconds, 6) for name, seconds in self.durations.items()}
+        durations['total'] = round(time.perf_counter() - self._started, 6)
+        return durations
+
+
+def timed(timings, name):
+    """timings.stage(name), or a no-op when timings is None"""
+    return timings.stage(name) if timings is not None else nullcontext()
+
+
+class Profiler:
+    """cProfile wrapper producing a plain-text report of the hottest functions"""
+
+    def __init__(self, limit=None):
+        self.limit = limit or Config.PROFILE_TOP_FUNCTIONS
+        self._profile = cProfile.Profile()
+
+    def __enter__(self):
+        self._profile.enable()
+        return self
+
+    def __exit__(self, *exc):
+        self._profile.disable()
+        return False
+
+    def report(self, sort='cumulative'):
+        output = io.StringIO()
+        pstats.Stats(self._profile, stream=output).sort_stats(sort).print_stats(self.limit)
+        return output.getvalue()
@@ -0,0 +1,174 @@
+"""
+Streaming pipeline for intraday (minute bar) backtests
+
+Bars are read from intraday_prices in timestamp order, one chunk at a time,
+and pass through generator stages: signals are computed per chunk with the
+previous chunk's last warmup_bars() bars prepended (so rolling indicators
+carry over the boundary with bounded state), and each chunk is simulated
+from the cash, shares, signal and pending order the previous chunk ended
+with. Only the last bar of each day is kept as an equity point, so memory
+and stored history depend on the chunk size and number of days, not on
+the number of bars.
+"""
+import numpy as np
+import pandas as pd
+from sqlalchemy import select, func
+from config import Config
+from models import IntradayPrice
+from simulation import simulate
+from instrumentation import timed
+
+BAR_FREQUENCIES = ('daily', 'minute')
+
+_PRICE_COLUMNS = ('Open', 'High', 'Low', 'Close', 'Volume')
+
+
+def _bounds(start_date, end_date):
+    return pd.Timestamp(start_date).to_pydatetime(), pd.Timestamp(end_date).to_pydatetime()
+
+
+def count_bars(db, stock_id, start_date, end_date):
+    """Number of stored bars in [start_date, end_date)"""
+    start, end = _bounds(start_date, end_date)
+    return db.execute(
+        select(func.count()).select_from(IntradayPrice).where(
+            IntradayPrice.stock_id == stock_id,
+            IntradayPrice.timestamp >= start,
+            IntradayPrice.timestamp < end
+        )
+    ).scalar()
+
+
+def stream_bars(db, stock_id, start_date, end_date, chunk_size=None, timings=None):
+    """
+    Yield bars in [start_date, end_date) as DataFrames of up to chunk_size rows
+
+    Pages on the last timestamp seen (keyset), so every query is one range
+    scan of the (stock_id, timestamp) index.
+    """
+    chunk_size = chunk_size or Config.INTRADAY_CHUNK_SIZE
+    start, end = _bounds(start_date, end_date)
+    columns = (IntradayPrice.timestamp, IntradayPrice.open, IntradayPrice.high,
+               IntradayPrice.low, IntradayPrice.close, IntradayPrice.volume)
+    after = None
+
+    while True:
+        query = select(*columns).where(IntradayPrice.stock_id == stock_id, IntradayPrice.timestamp < end)
+        if after is None:
+            query = query.where(IntradayPrice.timestamp >= start)
+        else:
+            query = query.where(IntradayPrice.timestamp > after)
+        with timed(timings, 'load'):
+            rows = db.execute(query.order_by(IntradayPrice.timestamp).limit(chunk_size)).all()
+            if not rows:
+                return
+            timestamps, *values = zip(*rows)
+            chunk = pd.DataFrame(
+                {name: np.asarray(column, dtype=np.float64) for name, column in zip(_PRICE_COLUMNS, values)},
+                index=pd.DatetimeIndex(timestamps)
+            )
+        yield chunk
+
+        if len(rows) < chunk_size:
+            return
+        after = timestamps[-1]
+
+
+def signal_chunks(strategy, chunks):
+    """
+    Signal frames for a stream of price chunks
+
+    Only rows after the carried-over bars are yielded, so each bar appears
+    exactly once.
+    """
+    warmup = strategy.warmup_bars()
+    carry = None
+
+    for chunk in chunks:
+        with timed(strategy.timings, 'signals'):
+            frame = chunk if carry is None else pd.concat([carry, chunk])
+            signals = strategy.calculate_signals(frame)
+            if carry is not None:
+                signals = signals[signals.index > carry.index[-1]]
+            carry = frame.iloc[-warmup:]
+        if len(signals):
+            yield signals.copy()
+
+
+def simulate_chunks(strategy, chunks):
+    """
+    Simulate a stream of signal frames as one continuous run
+
+    Yields:
+        (signals, result) per chunk, result as returned by simulation.simulate
+    """
+    state = None
+
+    for signals in chunks:
+        with timed(strategy.timings, 'simulation'):
+            if state is None:
+                result = simulate(signals, strategy.initial_capital, engine=strategy.engine,
+                                  execution=strategy.execution)
+            else:
+                # The chunk's first bar trades against the signal the last chunk ended on
+                signals.iloc[0, signals.columns.get_loc('Position')] = signals['Signal'].iloc[0] - state['signal']
+                result = simulate(signals, state['cash'], engine=strategy.engine, initial_shares=state['shares'],
+                                  execution=strategy.execution, pending_order=state['pending_order'])
+
+        state = {
+            'signal': int(signals['Signal'].iloc[-1]),
+            'cash': float(result['cash'][-1]),
+            'shares': float(result['shares'][-1]),
+            'pending_order': result['pending_order']
+        }
+        yield signals, result
+
+
+def _take(result, positions):
+    return {
+        'dates': result['dates'][positions],
+        'close': result['close'][positions],
+        'shares': result['shares'][positions],
+        'cash': result['cash'][positions],
+        'portfolio_value': result['portfolio_value'][positions]
+    }
+
+
+def _join(first, second):
+    joined = {key: np.concatenate([first[key], second[key]]) for key in first if key != 'dates'}
+    joined['dates'] = first['dates'].append(second['dates'])
+    return joined
+
+
+class DailySampler:
+    """
+    Reduces per-bar simulation results to one equity point per day
+
+    The last day of a chunk may continue in the next one, so its point is
+    held back until a later day appears or flush() is called.
+    """
+
+    def __init__(self):
+        self._open_day = None
+
+    def add(self, result):
+        """
+        Results for the days completed by this chunk
+
+        Returns:
+            dict in simulation result layout (without trades), possibly empty
+        """
+        days = result['dates'].normalize()
+        last_bars = np.append(np.flatnonzero(days[1:] != days[:-1]), len(days) - 1)
+        sample = _take(result, last_bars)
+
+        if self._open_day is not None and self._open_day['dates'][0].normalize() != sample['dates'][0].normalize():
+            sample = _join(self._open_day, sample)
+
+        self._open_day = _take(sample, slice(-1, None))
+        return _take(sample, slice(None, -1))
+
+    def flush(self):
+        """The held-back last day, if any"""
+        sample, self._open_day = self._open_day, None
+        return sample
@@ -0,0 +1,167 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from contextlib import nullcontext
+from datetime import datetime
+from config import Config
+from models import SessionLocal, Backtest, engine
+from instrumentation import Profiler
+
+logger = logging.getLogger(__name__)
+
+
+def _init_process_worker():
+    """Drop connections inherited from the parent process"""
+    engine.dispose(close=False)
+
+
+def _remember_result(db, strategy, backtest):
+    """Add a finished run to the result cache; a cache failure never fails the run"""
+    import result_cache
+
+    try:
+        key = result_cache.cache_key(db, strategy)
+        if key:
+            result_cache.remember(db, key, backtest)
+    except Exception:
+        logger.exception("Could not cache backtest %s", backtest.id)
+        db.rollback()
+
+
+def _refresh_analytics(db, backtest):
+    """Add a finished run to the analytics tables; a failure never fails the run"""
+    import analytics
+
+    try:
+        analytics.refresh_backtest(db, backtest.id)
+    except Exception:
+        logger.exception("Could not update analytics for backtest %s", backtest.id)
+        db.rollback()
+
+
+def run_backtest_job(backtest_id, params, profile=False):
+    """
+    Worker entry point: run one queued backtest in its own session
+
+    Args:
+        backtest_id: ID of the pending Backtest record
+        params: Keyword arguments for strategy.create_strategy (without db_session)
+        profile: Store a cProfile report of the run on the Backtest
+    """
+    # Loaded by the first job rather than at import, which keeps API startup light
+    from strategy import create_strategy, BacktestCancelled
+
+    db = SessionLocal()
+    try:
+        backtest = db.query(Backtest).filter_by(id=backtest_id).first()
+        if backtest is None or backtest.status != 'pending':
+            return
+
+        strategy = create_strategy(db_session=db, **params)
+        with Profiler() if profile else nullcontext() as profiler:
+            strategy.run_backtest(backtest)
+
+        if profiler is not None:
+            backtest.profile = profiler.report()
+            db.commit()
+
+        if Config.RESULT_CACHE_ENABLED:
+            _remember_result(db, strategy, backtest)
+        _refresh_analytics(db, backtest)
+
+    except BacktestCancelled:
+        db.rollback()
+        logger.info("Backtest %s cancelled", backtest_id)
+
+    except Exception as e:
+        logger.exception("Backtest %s failed", backtest_id)
+        db.rollback()
+        # Conditional, so a cancel committed meanwhile is kept
+        db.query(Backtest).filter(Backtest.id == backtest_id, Backtest.status != 'cancelled').update(
+            {'status': 'failed', 'error_message': str(e), 'completed_at': datetime.utcnow()},
+            synchronize_session=False
+        )
+        db.commit()
+
+    finally:
+        db.close()
+
+
+class JobQueue:
+    """
+    Runs backtests in the background on a thread or process pool
+
+    The pool is created on first use so importing this module stays cheap.
+    """
+
+    def __init__(self, max_workers=None, executor=None):
+        self.max_workers = max_workers or Config.JOB_WORKERS
+        self.executor_type = executor or Config.JOB_EXECUTOR
+        self._executor = None
+        self._futures = {}
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                if self.executor_type == 'process':
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.max_workers,
+                        initializer=_init_process_worker
+                    )
+                elif self.executor_type == 'thread':
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.max_workers,
+                        thread_name_prefix='backtest'
+                    )
+                else:
+                    raise ValueError(f"Unknown job executor: {self.executor_type}")
+            return self._executor
+
+    def submit(self, backtest_id, params, profile=False):
+        """Queue a pending backtest for execution"""
+        return self.submit_job(('backtest', backtest_id), run_backtest_job, backtest_id, params, profile)
+
+    def submit_batch(self, batch_id, specs):
+        """Queue the pending specs of a BacktestBatch ({backtest_id: params})"""
+        from batch import run_batch_job
+
+        return self.submit_job(('batch', batch_id), run_batch_job, batch_id, specs)
+
+    def submit_job(self, key, fn, *args):
+        """
+        Queue any picklable job function
+
+        Args:
+            key: Hashable job identifier used by cancel()
+            fn: Module-level function to run in the pool
+        """
+        future = self._get_executor().submit(fn, *args)
+        with self._lock:
+            self._futures[key] = future
+        future.add_done_callback(lambda f: self._forget(key))
+        return future
+
+    def _forget(self, key):
+        with self._lock:
+            self._futures.pop(key, None)
+
+    def cancel(self, backtest_id, kind='backtest'):
+        """
+        Drop a queued job before it starts
+
+        Returns True if the job never ran. Jobs already running stop at their
+        next progress checkpoint once the record is marked cancelled.
+        """
+        with self._lock:
+            future = self._futures.get((kind, backtest_id))
+        return future.cancel() if future is not None else False
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=True)
+
+
+job_queue = JobQueue()
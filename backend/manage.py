@@ -0,0 +1,141 @@
+"""
+Maintenance commands
+
+Usage:
+    python manage.py init-db
+    python manage.py migrate [--status]
+    python manage.py sync-prices [--ticker AAPL ...] [--full]
+    python manage.py compact-history [--backtest-id 1 ...]
+    python manage.py load-intraday --ticker AAPL [--file AAPL.csv]
+    python manage.py refresh-analytics
+"""
+import argparse
+import os
+import sys
+from sqlalchemy import select
+from config import Config
+from models import SessionLocal, Stock, PortfolioHistory, init_db, engine
+from migrations import upgrade, pending
+from column_store import ColumnStore
+from curve_store import compact_backtest_history
+from price_cache import get_or_create_stock
+from ingest import load_intraday_csv
+
+
+def create_tables(args):
+    """Create any missing tables and apply pending migrations"""
+    init_db()
+    print("Database ready")
+
+
+def migrate(args):
+    """Apply pending schema migrations, or list them with --status"""
+    if args.status:
+        versions = pending(engine)
+        print('\n'.join(versions) if versions else 'No pending migrations')
+        return
+    for version in upgrade(engine):
+        print(f"Applied {version}")
+
+
+def sync_prices(args):
+    """Copy stored prices into the columnar store (append-only unless --full)"""
+    store = ColumnStore(args.dir)
+    db = SessionLocal()
+    try:
+        query = db.query(Stock).order_by(Stock.ticker)
+        if args.ticker:
+            query = query.filter(Stock.ticker.in_([t.upper() for t in args.ticker]))
+
+        for stock in query.all():
+            rows = store.sync(db, stock, full=args.full)
+            print(f"{stock.ticker}: {rows} rows written")
+    finally:
+        db.close()
+
+
+def compact_history(args):
+    """Move portfolio_history rows into compressed portfolio_curves blobs, one backtest per transaction"""
+    db = SessionLocal()
+    try:
+        query = select(PortfolioHistory.backtest_id).distinct().order_by(PortfolioHistory.backtest_id)
+        if args.backtest_id:
+            query = query.where(PortfolioHistory.backtest_id.in_(args.backtest_id))
+        backtest_ids = db.execute(query).scalars().all()
+
+        for backtest_id in backtest_ids:
+            points = compact_backtest_history(db, backtest_id)
+            db.commit()
+            print(f"Backtest {backtest_id}: {points} days compacted")
+    finally:
+        db.close()
+
+
+def load_intraday(args):
+    """Load minute bars from CSV files (INTRADAY_DATA_DIR/<TICKER>.csv by default)"""
+    if args.file and len(args.ticker) > 1:
+        raise SystemExit('--file can only be used with a single --ticker')
+
+    db = SessionLocal()
+    try:
+        for ticker in args.ticker:
+            ticker = ticker.upper()
+            path = args.file or os.path.join(Config.INTRADAY_DATA_DIR, f"{ticker}.csv")
+            stock = get_or_create_stock(db, ticker)
+            stats = load_intraday_csv(db, stock, path, chunk_size=args.chunk_size)
+            print(f"{ticker}: {stats['inserted']} bars inserted, {stats['skipped']} already stored")
+    finally:
+        db.close()
+
+
+def refresh_analytics(args):
+    """Rebuild the analytics summary and aggregate tables from the backtests table"""
+    from analytics import rebuild
+
+    db = SessionLocal()
+    try:
+        count = rebuild(db)
+        db.commit()
+        print(f"{count} completed backtests summarized")
+    finally:
+        db.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Trading backtester maintenance commands')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    init = commands.add_parser('init-db', help='Create missing database tables')
+    init.set_defaults(handler=create_tables)
+
+    migrate_parser = commands.add_parser('migrate', help='Apply pending schema migrations')
+    migrate_parser.add_argument('--status', action='store_true', help='Only list pending migrations')
+    migrate_parser.set_defaults(handler=migrate)
+
+    sync = commands.add_parser('sync-prices', help='Sync stock_prices into the columnar price store')
+    sync.add_argument('--ticker', action='append', help='Only this ticker (repeatable)')
+    sync.add_argument('--full', action='store_true', help='Rebuild files instead of appending')
+    sync.add_argument('--dir', help='Store directory (defaults to COLUMN_STORE_DIR)')
+    sync.set_defaults(handler=sync_prices)
+
+    compact = commands.add_parser('compact-history',
+                                  help='Convert portfolio_history rows to compact curve blobs')
+    compact.add_argument('--backtest-id', type=int, action='append', help='Only this backtest (repeatable)')
+    compact.set_defaults(handler=compact_history)
+
+    intraday = commands.add_parser('load-intraday', help='Load minute bars from CSV into intraday_prices')
+    intraday.add_argument('--ticker', action='append', required=True, help='Ticker to load (repeatable)')
+    intraday.add_argument('--file', help='CSV file (defaults to INTRADAY_DATA_DIR/<TICKER>.csv)')
+    intraday.add_argument('--chunk-size', type=int, help='Rows read per chunk (defaults to INTRADAY_CHUNK_SIZE)')
+    intraday.set_defaults(handler=load_intraday)
+
+    refresh = commands.add_parser('refresh-analytics', help='Rebuild the analytics summary tables')
+    refresh.set_defaults(handler=refresh_analytics)
+
+    args = parser.parse_args(argv)
+    args.handler(args)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
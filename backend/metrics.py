@@ -0,0 +1,103 @@
+import numpy as np
+
+TRADING_DAYS_PER_YEAR = 252
+
+
+def performance_metrics(portfolio_values, initial_capital):
+    """
+    Summary metrics for an equity curve
+
+    Args:
+        portfolio_values: Sequence of daily portfolio values
+        initial_capital: Starting capital in dollars
+
+    Returns:
+        dict with final_value, total_return (%), max_drawdown (%) and sharpe_ratio
+    """
+    portfolio_array = np.asarray(portfolio_values, dtype=np.float64)
+    final_value = float(portfolio_array[-1])
+
+    # Total return
+    total_return = ((final_value - initial_capital) / initial_capital) * 100
+
+    # Max drawdown
+    running_max = np.maximum.accumulate(portfolio_array)
+    drawdown = (portfolio_array - running_max) / running_max
+    max_drawdown = float(drawdown.min() * 100)
+
+    # Sharpe ratio (sample std, matching pandas)
+    returns = portfolio_array[1:] / portfolio_array[:-1] - 1
+    if len(returns) > 1 and returns.std(ddof=1) > 0:
+        sharpe_ratio = float((returns.mean() / returns.std(ddof=1)) * np.sqrt(TRADING_DAYS_PER_YEAR))
+    else:
+        sharpe_ratio = 0.0
+
+    return {
+        'final_value': final_value,
+        'total_return': float(total_return),
+        'max_drawdown': max_drawdown,
+        'sharpe_ratio': sharpe_ratio
+    }
+
+
+def curve_summary(portfolio_values, previous=None):
+    """
+    Running totals from which performance_metrics can be recovered
+
+    Args:
+        portfolio_values: Daily portfolio values (continuing previous, if given)
+        previous: Summary of the curve so far, from an earlier call
+
+    Returns:
+        dict with last_value, peak, max_drawdown (fraction) and the count,
+        mean and sum of squared deviations of daily returns
+    """
+    values = np.asarray(portfolio_values, dtype=np.float64)
+
+    if previous is None:
+        running_max = np.maximum.accumulate(values)
+        returns = values[1:] / values[:-1] - 1
+        previous = {'peak': values[0], 'max_drawdown': 0.0, 'count': 0, 'mean': 0.0, 'm2': 0.0}
+    else:
+        running_max = np.maximum.accumulate(np.concatenate(([previous['peak']], values)))[1:]
+        returns = values / np.concatenate(([previous['last_value']], values[:-1])) - 1
+
+    drawdown = (values - running_max) / running_max
+
+    # Merge return moments (Chan et al. parallel update)
+    count = previous['count'] + len(returns)
+    mean, m2 = previous['mean'], previous['m2']
+    if len(returns):
+        batch_mean = float(returns.mean())
+        batch_m2 = float(((returns - batch_mean) ** 2).sum())
+        delta = batch_mean - mean
+        mean += delta * len(returns) / count
+        m2 += batch_m2 + delta ** 2 * previous['count'] * len(returns) / count
+
+    return {
+        'last_value': float(values[-1]),
+        'peak': float(running_max[-1]),
+        'max_drawdown': float(min(previous['max_drawdown'], drawdown.min())),
+        'count': int(count),
+        'mean': float(mean),
+        'm2': float(m2)
+    }
+
+
+def summary_metrics(summary, initial_capital):
+    """performance_metrics computed from a curve_summary instead of the full curve"""
+    final_value = summary['last_value']
+    total_return = ((final_value - initial_capital) / initial_capital) * 100
+
+    std = np.sqrt(summary['m2'] / (summary['count'] - 1)) if summary['count'] > 1 else 0.0
+    if std > 0:
+        sharpe_ratio = float((summary['mean'] / std) * np.sqrt(TRADING_DAYS_PER_YEAR))
+    else:
+        sharpe_ratio = 0.0
+
+    return {
+        'final_value': final_value,
+        'total_return': float(total_return),
+        'max_drawdown': summary['max_drawdown'] * 100,
+        'sharpe_ratio': sharpe_ratio
+    }
@@ -0,0 +1,484 @@
+"""
+Versioned schema migrations
+
+create_all only creates missing tables, so columns and indexes added to
+existing tables need a migration. Applied versions are recorded in
+schema_migrations; each migration runs once, in order, in its own
+transaction, and checks the live schema first so it is safe on a database
+that create_all has just built from the current models.
+
+0001 is the baseline: it creates whichever of the tables that existed when
+migrations were introduced are missing. Every migration spells out its own
+tables, columns and backfill SQL below instead of going through the current
+models, so what a version does never changes after it ships.
+
+Usage:
+    python manage.py migrate
+"""
+import logging
+from datetime import datetime
+from sqlalchemy import (inspect, text, select, insert, func, cast, extract, Table, Column, String, Text, Integer,
+                        BigInteger, Float, Numeric, Date, DateTime, JSON, LargeBinary, ForeignKey, UniqueConstraint,
+                        Index, MetaData)
+
+logger = logging.getLogger(__name__)
+
+_metadata = MetaData()
+schema_migrations = Table(
+    'schema_migrations', _metadata,
+    Column('version', String(50), primary_key=True),
+    Column('applied_at', DateTime, nullable=False)
+)
+
+# Tables as the migration that introduced them created them
+
+# 0001: the schema when migrations were introduced
+_stocks = Table(
+    'stocks', _metadata,
+    Column('id', Integer, primary_key=True),
+    Column('ticker', String(10), unique=True, nullable=False),
+    Column('name', String(255)),
+    Column('created_at', DateTime)
+)
+
+_stock_prices = Table(
+    'stock_prices', _metadata,
+    Column('id', Integer, primary_key=True),
+    Column('stock_id', Integer, ForeignKey('stocks.id'), nullable=False),
+    Column('date', Date, nullable=False),
+    Column('open', Numeric(10, 2)),
+    Column('high', Numeric(10, 2)),
+    Column('low', Numeric(10, 2)),
+    Column('close', Numeric(10, 2)),
+    Column('volume', BigInteger),
+    Column('created_at', DateTime),
+    Index('uq_stock_prices_stock_date', 'stock_id', 'date', unique=True)
+)
+
+_price_coverage = Table(
+    'price_coverage', _metadata,
+    Column('id', Integer, primary_key=True),
+    Column('stock_id', Integer, ForeignKey('stocks.id'), nullable=False),
+    Column('start_date', Date, nullable=False),
+    Column('end_date', Date, nullable=False),
+    Column('updated_at', DateTime)
+)
+
+_backtests = Table(
+    'backtests', _metadata,
+    Column('id', Integer, primary_key=True),
+    Column('stock_id', Integer, ForeignKey('stocks.id'), nullable=False),
+    Column('strategy', String(50)),
+    Column('strategy_name', String(100), nullable=False),
+    Column('strategy_params', JSON),
+    Column('start_date', Date, nullable=False),
+    Column('end_date', Date, nullable=False),
+    Column('initial_capital', Numeric(12, 2), nullable=False),
+    Column('final_value', Numeric(12, 2)),
+    Column('total_return', Numeric(8, 4)),
+    Column('max_drawdown', Numeric(8, 4)),
+    Column('sharpe_ratio', Numeric(8, 4)),
+    Column('num_trades', Integer),
+    Column('status', String(20)),
+    Column('progress', Integer),
+    Column('error_message', Text),
+    Column('resume_state', JSON),
+    Column('stage_timings', JSON),
+    Column('profile', Text),
+    Column('created_at', DateTime),
+    Column('completed_at', DateTime),
+    Index('ix_backtests_created_at_id', 'created_at', 'id')
+)
+
+_trades = Table(
+    'trades', _metadata,
+    Column('id', Integer, primary_key=True),
+    Column('backtest_id', Integer, ForeignKey('backtests.id'), nullable=False),
+    Column('trade_type', String(10), nullable=False),
+    Column('date', Date, nullable=False),
+    Column('price', Numeric(10, 2), nullable=False),
+    Column('shares', Numeric(12, 6), nullable=False),
+    Column('capital', Numeric(12, 2)),
+    Column('created_at', DateTime),
+    Index('ix_trades_backtest_date', 'backtest_id', 'date')
+)
+
+_portfolio_history = Table(
+    'portfolio_history', _metadata,
+    Column('id', Integer, primary_key=True),
+    Column('backtest_id', Integer, ForeignKey('backtests.id'), nullable=False),
+    Column('date', Date, nullable=False),
+    Column('portfolio_value', Numeric(12, 2), nullable=False),
+    Column('stock_price', Numeric(10, 2), nullable=False),
+    Column('shares_held', Numeric(12, 6)),
+    Column('created_at', DateTime),
+    Index('ix_portfolio_history_backtest_date', 'backtest_id', 'date')
+)
+
+_portfolio_curves = Table(
+    'portfolio_curves', _metadata,
+    Column('id', Integer, primary_key=True),
+    Column('backtest_id', Integer, ForeignKey('backtests.id'), nullable=False),
+    Column('segment', Integer, nullable=False),
+    Column('start_date', Date, nullable=False),
+    Column('end_date', Date, nullable=False),
+    Column('num_points', Integer, nullable=False),
+    Column('encoding', String(20), nullable=False),
+    Column('data', LargeBinary, nullable=False),
+    Column('created_at', DateTime),
+    UniqueConstraint('backtest_id', 'segment')
+)
+
+_parameter_sweeps = Table(
+    'parameter_sweeps', _metadata,
+    Column('id', Integer, primary_key=True),
+    Column('tickers', JSON, nullable=False),
+    Column('date_ranges', JSON, nullable=False),
+    Column('short_windows', JSON, nullable=False),
+    Column('long_windows', JSON, nullable=False),
+    Column('initial_capital', Numeric(12, 2), nullable=False),
+    Column('num_combinations', Integer),
+    Column('status', String(20)),
+    Column('error_message', Text),
+    Column('created_at', DateTime),
+    Column('completed_at', DateTime)
+)
+
+_sweep_results = Table(
+    'sweep_results', _metadata,
+    Column('id', Integer, primary_key=True),
+    Column('sweep_id', Integer, ForeignKey('parameter_sweeps.id'), nullable=False),
+    Column('ticker', String(10), nullable=False),
+    Column('start_date', Date, nullable=False),
+    Column('end_date', Date, nullable=False),
+    Column('short_window', Integer, nullable=False),
+    Column('long_window', Integer, nullable=False),
+    Column('final_value', Float),
+    Column('total_return', Float),
+    Column('max_drawdown', Float),
+    Column('sharpe_ratio', Float),
+    Column('num_trades', Integer)
+)
+
+_portfolio_backtests = Table(
+    'portfolio_backtests', _metadata,
+    Column('id', Integer, primary_key=True),
+    Column('strategy_name', String(100), nullable=False),
+    Column('allocation', String(20), nullable=False),
+    Column('start_date', Date, nullable=False),
+    Column('end_date', Date, nullable=False),
+    Column('initial_capital', Numeric(14, 2), nullable=False),
+    Column('short_window', Integer, nullable=False),
+    Column('long_window', Integer, nullable=False),
+    Column('final_value', Numeric(14, 2)),
+    Column('total_return', Numeric(8, 4)),
+    Column('max_drawdown', Numeric(8, 4)),
+    Column('sharpe_ratio', Numeric(8, 4)),
+    Column('num_trades', Integer),
+    Column('status', String(20)),
+    Column('progress', Integer),
+    Column('error_message', Text),
+    Column('created_at', DateTime),
+    Column('completed_at', DateTime)
+)
+
+_portfolio_backtest_members = Table(
+    'portfolio_backtest_members', _metadata,
+    Column('id', Integer, primary_key=True),
+    Column('portfolio_id', Integer, ForeignKey('portfolio_backtests.id'), nullable=False),
+    Column('ticker', String(10), nullable=False),
+    Column('weight', Float, nullable=False),
+    Column('allocated_capital', Numeric(14, 2)),
+    Column('final_value', Numeric(14, 2)),
+    Column('total_return', Numeric(8, 4)),
+    Column('num_trades', Integer),
+    Column('status', String(20)),
+    Column('error_message', Text)
+)
+
+_portfolio_backtest_history = Table(
+    'portfolio_backtest_history', _metadata,
+    Column('id', Integer, primary_key=True),
+    Column('portfolio_id', Integer, ForeignKey('portfolio_backtests.id'), nullable=False),
+    Column('date', Date, nullable=False),
+    Column('portfolio_value', Numeric(14, 2), nullable=False)
+)
+
+_backtest_cache = Table(
+    'backtest_cache', _metadata,
+    Column('id', Integer, primary_key=True),
+    Column('cache_key', String(64), nullable=False, unique=True, index=True),
+    Column('backtest_id', Integer, ForeignKey('backtests.id'), nullable=False),
+    Column('hits', Integer),
+    Column('created_at', DateTime),
+    Column('last_hit_at', DateTime)
+)
+
+# 0001 creates these, in dependency order
+_BASELINE_TABLES = (_stocks, _stock_prices, _price_coverage, _backtests, _trades, _portfolio_history,
+                    _portfolio_curves, _parameter_sweeps, _sweep_results, _portfolio_backtests,
+                    _portfolio_backtest_members, _portfolio_backtest_history, _backtest_cache)
+
+# 0005
+_intraday_prices = Table(
+    'intraday_prices', _metadata,
+    Column('id', Integer, primary_key=True),
+    Column('stock_id', Integer, ForeignKey('stocks.id'), nullable=False),
+    Column('timestamp', DateTime, nullable=False),
+    Column('open', Float),
+    Column('high', Float),
+    Column('low', Float),
+    Column('close', Float),
+    Column('volume', BigInteger),
+    Index('uq_intraday_prices_stock_timestamp', 'stock_id', 'timestamp', unique=True)
+)
+
+# 0006
+_backtest_summaries = Table(
+    'backtest_summaries', _metadata,
+    Column('backtest_id', Integer, ForeignKey('backtests.id'), primary_key=True),
+    Column('stock_id', Integer, nullable=False),
+    Column('ticker', String(10), nullable=False),
+    Column('strategy', String(50)),
+    Column('strategy_name', String(100), nullable=False),
+    Column('period', Integer, nullable=False),
+    Column('start_date', Date, nullable=False),
+    Column('end_date', Date, nullable=False),
+    Column('initial_capital', Float),
+    Column('final_value', Float),
+    Column('total_return', Float),
+    Column('max_drawdown', Float),
+    Column('sharpe_ratio', Float),
+    Column('num_trades', Integer),
+    Column('completed_at', DateTime),
+    Index('ix_backtest_summaries_group', 'ticker', 'strategy_name', 'period')
+)
+
+_backtest_aggregates = Table(
+    'backtest_aggregates', _metadata,
+    Column('id', Integer, primary_key=True),
+    Column('ticker', String(10), nullable=False),
+    Column('strategy', String(50)),
+    Column('strategy_name', String(100), nullable=False),
+    Column('period', Integer, nullable=False),
+    Column('num_backtests', Integer, nullable=False),
+    Column('return_sum', Float),
+    Column('return_sq_sum', Float),
+    Column('sharpe_sum', Float),
+    Column('drawdown_sum', Float),
+    Column('best_return', Float),
+    Column('worst_return', Float),
+    Column('best_sharpe', Float),
+    Column('worst_drawdown', Float),
+    Column('num_trades_sum', Integer),
+    UniqueConstraint('ticker', 'strategy_name', 'period')
+)
+
+# 0007
+_backtest_batches = Table(
+    'backtest_batches', _metadata,
+    Column('id', Integer, primary_key=True),
+    Column('num_specs', Integer, nullable=False),
+    Column('num_completed', Integer),
+    Column('num_failed', Integer),
+    Column('status', String(20)),
+    Column('error_message', Text),
+    Column('stage_timings', JSON),
+    Column('created_at', DateTime),
+    Column('completed_at', DateTime)
+)
+
+_backtest_batch_items = Table(
+    'backtest_batch_items', _metadata,
+    Column('id', Integer, primary_key=True),
+    Column('batch_id', Integer, ForeignKey('backtest_batches.id'), nullable=False, index=True),
+    Column('position', Integer, nullable=False),
+    Column('backtest_id', Integer, ForeignKey('backtests.id', ondelete='SET NULL')),
+    Column('ticker', String(10)),
+    Column('status', String(20)),
+    Column('error_message', Text)
+)
+
+# 0008
+_duration_histogram_buckets = Table(
+    'duration_histogram_buckets', _metadata,
+    Column('id', Integer, primary_key=True),
+    Column('histogram', String(20), nullable=False),
+    Column('label', String(100), nullable=False),
+    Column('le', String(20), nullable=False),
+    Column('count', BigInteger, nullable=False),
+    Column('sum', Float, nullable=False),
+    UniqueConstraint('histogram', 'label', 'le')
+)
+
+# Histogram bucket bounds (seconds) when 0008 ran
+_DURATION_BUCKETS_0008 = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _create_table(connection, table):
+    table.create(connection, checkfirst=True)
+
+
+def _create_tables(connection):
+    """Create whichever baseline tables are missing"""
+    for table in _BASELINE_TABLES:
+        _create_table(connection, table)
+
+
+def _add_column(connection, table, name, column_type):
+    """ALTER TABLE ... ADD COLUMN (nullable) unless the column already exists"""
+    existing = {column['name'] for column in inspect(connection).get_columns(table)}
+    if name in existing:
+        return
+    compiled = column_type.compile(dialect=connection.dialect)
+    connection.execute(text(f'ALTER TABLE {table} ADD COLUMN {name} {compiled}'))
+    logger.info("Added column %s.%s", table, name)
+
+
+def _add_backtest_columns(connection):
+    """Columns the job queue, strategy registry, extend, timing and profiling added to backtests"""
+    for name, column_type in (('strategy', String(50)), ('strategy_params', JSON()), ('progress', Integer()),
+                              ('error_message', Text()), ('resume_state', JSON()), ('stage_timings', JSON()),
+                              ('profile', Text())):
+        _add_column(connection, 'backtests', name, column_type)
+
+    # Rows from before the strategy registry were all moving average crossovers
+    connection.execute(text("UPDATE backtests SET strategy = 'ma_crossover' WHERE strategy IS NULL"))
+
+
+def _add_hot_path_indexes(connection):
+    """
+    Indexes for the price, history, trade and listing queries
+
+    Duplicate (stock_id, date) price rows are removed first, keeping the
+    earliest, so the unique index can be built.
+    """
+    connection.execute(text(
+        'DELETE FROM stock_prices WHERE id NOT IN '
+        '(SELECT MIN(id) FROM stock_prices GROUP BY stock_id, date)'
+    ))
+    for statement in (
+        'CREATE UNIQUE INDEX IF NOT EXISTS uq_stock_prices_stock_date ON stock_prices (stock_id, date)',
+        'CREATE INDEX IF NOT EXISTS ix_backtests_created_at_id ON backtests (created_at, id)',
+        'CREATE INDEX IF NOT EXISTS ix_trades_backtest_date ON trades (backtest_id, date)',
+        'CREATE INDEX IF NOT EXISTS ix_portfolio_history_backtest_date ON portfolio_history (backtest_id, date)'
+    ):
+        connection.execute(text(statement))
+
+
+def _add_execution_columns(connection):
+    """backtests.execution and trades.fees"""
+    _add_column(connection, 'backtests', 'execution', JSON())
+    _add_column(connection, 'trades', 'fees', Numeric(12, 2))
+
+
+def _add_intraday_schema(connection):
+    """intraday_prices table, backtests.frequency and trades.executed_at"""
+    _create_table(connection, _intraday_prices)
+    _add_column(connection, 'backtests', 'frequency', String(10))
+    _add_column(connection, 'trades', 'executed_at', DateTime())
+
+
+def _add_analytics_tables(connection):
+    """backtest_summaries and backtest_aggregates, filled from existing completed backtests"""
+    _create_table(connection, _backtest_summaries)
+    _create_table(connection, _backtest_aggregates)
+
+    b = _backtests
+    connection.execute(insert(_backtest_summaries).from_select(
+        ['backtest_id', 'stock_id', 'ticker', 'strategy', 'strategy_name', 'period', 'start_date', 'end_date',
+         'initial_capital', 'final_value', 'total_return', 'max_drawdown', 'sharpe_ratio', 'num_trades',
+         'completed_at'],
+        select(
+            b.c.id, b.c.stock_id, _stocks.c.ticker, b.c.strategy, b.c.strategy_name,
+            cast(extract('year', b.c.start_date), Integer), b.c.start_date, b.c.end_date, b.c.initial_capital,
+            b.c.final_value, b.c.total_return, b.c.max_drawdown, b.c.sharpe_ratio, b.c.num_trades, b.c.completed_at
+        ).join(_stocks, _stocks.c.id == b.c.stock_id).where(b.c.status == 'completed')
+    ))
+
+    s = _backtest_summaries.c
+    connection.execute(insert(_backtest_aggregates).from_select(
+        ['ticker', 'strategy', 'strategy_name', 'period', 'num_backtests', 'return_sum', 'return_sq_sum',
+         'sharpe_sum', 'drawdown_sum', 'best_return', 'worst_return', 'best_sharpe', 'worst_drawdown',
+         'num_trades_sum'],
+        select(
+            s.ticker, s.strategy, s.strategy_name, s.period, func.count(), func.sum(s.total_return),
+            func.sum(s.total_return * s.total_return), func.sum(s.sharpe_ratio), func.sum(s.max_drawdown),
+            func.max(s.total_return), func.min(s.total_return), func.max(s.sharpe_ratio),
+            func.min(s.max_drawdown), func.sum(s.num_trades)
+        ).group_by(s.ticker, s.strategy, s.strategy_name, s.period)
+    ))
+
+
+def _add_batch_tables(connection):
+    """backtest_batches and backtest_batch_items"""
+    _create_table(connection, _backtest_batches)
+    _create_table(connection, _backtest_batch_items)
+
+
+def _add_duration_histograms(connection):
+    """duration_histogram_buckets, filled from the stage timings of existing backtests"""
+    _create_table(connection, _duration_histogram_buckets)
+
+    buckets = {}
+    for strategy, timings in connection.execute(
+        select(_backtests.c.strategy, _backtests.c.stage_timings).where(_backtests.c.stage_timings.isnot(None))
+    ):
+        for stage, seconds in (timings or {}).items():
+            key = ('backtest', strategy or 'unknown') if stage == 'total' else ('stage', stage)
+            le = next((str(bound) for bound in _DURATION_BUCKETS_0008 if seconds <= bound), '+Inf')
+            count, total = buckets.get(key + (le,), (0, 0.0))
+            buckets[key + (le,)] = (count + 1, total + seconds)
+
+    if buckets:
+        connection.execute(_duration_histogram_buckets.insert(), [
+            {'histogram': histogram, 'label': label, 'le': le, 'count': count, 'sum': total}
+            for (histogram, label, le), (count, total) in buckets.items()
+        ])
+
+
+# (version, migration) in the order they must run
+MIGRATIONS = [
+    ('0001_create_tables', _create_tables),
+    ('0002_add_missing_columns', _add_backtest_columns),
+    ('0003_hot_path_indexes', _add_hot_path_indexes),
+    ('0004_execution_columns', _add_execution_columns),
+    ('0005_intraday', _add_intraday_schema),
+    ('0006_analytics', _add_analytics_tables),
+    ('0007_backtest_batches', _add_batch_tables),
+    ('0008_duration_histograms', _add_duration_histograms),
+]
+
+
+def applied_versions(connection):
+    schema_migrations.create(connection, checkfirst=True)
+    return set(connection.execute(schema_migrations.select().with_only_columns(schema_migrations.c.version)).scalars())
+
+
+def upgrade(engine):
+    """
+    Apply pending migrations
+
+    Returns:
+        list of versions applied by this call
+    """
+    with engine.begin() as connection:
+        done = applied_versions(connection)
+
+    applied = []
+    for version, migration in MIGRATIONS:
+        if version in done:
+            continue
+        with engine.begin() as connection:
+            migration(connection)
+            connection.execute(schema_migrations.insert().values(version=version, applied_at=datetime.utcnow()))
+        logger.info("Applied migration %s", version)
+        applied.append(version)
+    return applied
+
+
+def pending(engine):
+    """Versions not yet applied"""
+    with engine.begin() as connection:
+        done = applied_versions(connection)
+    return [version for version, _ in MIGRATIONS if version not in done]
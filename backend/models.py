@@ -1,13 +1,37 @@
-from sqlalchemy import create_engine, Column, Integer, String, Date, Numeric, BigInteger, DateTime, ForeignKey
+from sqlalchemy import (create_engine, Column, Integer, String, Text, Date, Numeric, BigInteger, DateTime,
+                        ForeignKey, JSON, Float, LargeBinary, UniqueConstraint, Index)
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import relationship, sessionmaker
+from sqlalchemy.orm import relationship, sessionmaker, scoped_session
+import logging
 from datetime import datetime
 from config import Config
 
+logger = logging.getLogger(__name__)
+
 Base = declarative_base()
-engine = create_engine(Config.SQLALCHEMY_DATABASE_URI)
+
+
+def engine_options(uri):
+    """Pool settings from Config for create_engine"""
+    options = {
+        'pool_pre_ping': Config.DB_POOL_PRE_PING,
+        'pool_recycle': Config.DB_POOL_RECYCLE
+    }
+    if not uri.startswith('sqlite'):
+        options.update(
+            pool_size=Config.DB_POOL_SIZE,
+            max_overflow=Config.DB_MAX_OVERFLOW,
+            pool_timeout=Config.DB_POOL_TIMEOUT
+        )
+    return options
+
+
+engine = create_engine(Config.SQLALCHEMY_DATABASE_URI, **engine_options(Config.SQLALCHEMY_DATABASE_URI))
 SessionLocal = sessionmaker(bind=engine)
 
+# Per-thread session for request handlers; removed on app context teardown
+db_session = scoped_session(SessionLocal)
+
 class Stock(Base):
     """Stock model - stores ticker information"""
     __tablename__ = 'stocks'
@@ -20,6 +44,8 @@ class Stock(Base):
     # Relationships
     prices = relationship('StockPrice', back_populates='stock', cascade='all, delete-orphan')
     backtests = relationship('Backtest', back_populates='stock', cascade='all, delete-orphan')
+    price_coverage = relationship('PriceCoverage', back_populates='stock', cascade='all, delete-orphan')
+    intraday_prices = relationship('IntradayPrice', back_populates='stock', cascade='all, delete-orphan')
     
     def to_dict(self):
         return {
@@ -33,6 +59,7 @@ class Stock(Base):
 class StockPrice(Base):
     """Stock price model - stores historical OHLCV data"""
     __tablename__ = 'stock_prices'
+    __table_args__ = (Index('uq_stock_prices_stock_date', 'stock_id', 'date', unique=True),)
     
     id = Column(Integer, primary_key=True)
     stock_id = Column(Integer, ForeignKey('stocks.id'), nullable=False)
@@ -60,13 +87,58 @@ class StockPrice(Base):
         }
 
 
+class PriceCoverage(Base):
+    """Price coverage model - date ranges already fetched into stock_prices"""
+    __tablename__ = 'price_coverage'
+    
+    id = Column(Integer, primary_key=True)
+    stock_id = Column(Integer, ForeignKey('stocks.id'), nullable=False)
+    start_date = Column(Date, nullable=False)
+    end_date = Column(Date, nullable=False)  # Exclusive
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    # Relationships
+    stock = relationship('Stock', back_populates='price_coverage')
+    
+    def to_dict(self):
+        return {
+            'stock_id': self.stock_id,
+            'start_date': self.start_date.isoformat() if self.start_date else None,
+            'end_date': self.end_date.isoformat() if self.end_date else None
+        }
+
+
+class IntradayPrice(Base):
+    """Intraday price model - stores timestamped (minute) OHLCV bars"""
+    __tablename__ = 'intraday_prices'
+    __table_args__ = (Index('uq_intraday_prices_stock_timestamp', 'stock_id', 'timestamp', unique=True),)
+    
+    id = Column(Integer, primary_key=True)
+    stock_id = Column(Integer, ForeignKey('stocks.id'), nullable=False)
+    timestamp = Column(DateTime, nullable=False)
+    # Float rather than Numeric: bars are read in bulk and Decimal conversion dominates
+    open = Column(Float)
+    high = Column(Float)
+    low = Column(Float)
+    close = Column(Float)
+    volume = Column(BigInteger)
+    
+    # Relationships
+    stock = relationship('Stock', back_populates='intraday_prices')
+
+
 class Backtest(Base):
     """Backtest model - stores backtest configuration and results"""
     __tablename__ = 'backtests'
+    __table_args__ = (Index('ix_backtests_created_at_id', 'created_at', 'id'),)
     
     id = Column(Integer, primary_key=True)
     stock_id = Column(Integer, ForeignKey('stocks.id'), nullable=False)
+    strategy = Column(String(50), default='ma_crossover')  # Registry name in strategy.STRATEGIES
     strategy_name = Column(String(100), nullable=False)
+    strategy_params = Column(JSON)
+    execution = Column(JSON)  # ExecutionModel settings (costs, fills, sizing); NULL means frictionless
+    frequency = Column(String(10), default='daily')  # Bar size: 'daily' or 'minute'
     start_date = Column(Date, nullable=False)
     end_date = Column(Date, nullable=False)
     initial_capital = Column(Numeric(12, 2), nullable=False)
@@ -75,7 +147,12 @@ class Backtest(Base):
     max_drawdown = Column(Numeric(8, 4))
     sharpe_ratio = Column(Numeric(8, 4))
     num_trades = Column(Integer)
-    status = Column(String(20), default='pending')
+    status = Column(String(20), default='pending')  # pending, running, completed, failed, cancelled
+    progress = Column(Integer, default=0)  # Percent complete while running
+    error_message = Column(Text)
+    resume_state = Column(JSON)  # Final simulation state, used to extend the run to later dates
+    stage_timings = Column(JSON)  # Seconds per pipeline stage, plus total
+    profile = Column(Text)  # cProfile report, when the run was profiled
     created_at = Column(DateTime, default=datetime.utcnow)
     completed_at = Column(DateTime)
     
@@ -83,13 +160,20 @@ class Backtest(Base):
     stock = relationship('Stock', back_populates='backtests')
     trades = relationship('Trade', back_populates='backtest', cascade='all, delete-orphan')
     portfolio_history = relationship('PortfolioHistory', back_populates='backtest', cascade='all, delete-orphan')
+    portfolio_curves = relationship('PortfolioCurve', back_populates='backtest', cascade='all, delete-orphan')
+    cache_entries = relationship('BacktestCacheEntry', back_populates='backtest', cascade='all, delete-orphan')
+    summary = relationship('BacktestSummary', back_populates='backtest', uselist=False, cascade='all, delete-orphan')
     
     def to_dict(self):
         return {
             'id': self.id,
             'stock_id': self.stock_id,
             'ticker': self.stock.ticker if self.stock else None,
+            'strategy': self.strategy,
             'strategy_name': self.strategy_name,
+            'strategy_params': self.strategy_params,
+            'execution': self.execution,
+            'frequency': self.frequency or 'daily',
             'start_date': self.start_date.isoformat() if self.start_date else None,
             'end_date': self.end_date.isoformat() if self.end_date else None,
             'initial_capital': float(self.initial_capital) if self.initial_capital else None,
@@ -99,6 +183,9 @@ class Backtest(Base):
             'sharpe_ratio': float(self.sharpe_ratio) if self.sharpe_ratio else None,
             'num_trades': self.num_trades,
             'status': self.status,
+            'progress': self.progress,
+            'stage_timings': self.stage_timings,
+            'error_message': self.error_message,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'completed_at': self.completed_at.isoformat() if self.completed_at else None
         }
@@ -107,6 +194,7 @@ class Backtest(Base):
 class Trade(Base):
     """Trade model - stores individual buy/sell trades"""
     __tablename__ = 'trades'
+    __table_args__ = (Index('ix_trades_backtest_date', 'backtest_id', 'date'),)
     
     id = Column(Integer, primary_key=True)
     backtest_id = Column(Integer, ForeignKey('backtests.id'), nullable=False)
@@ -115,6 +203,8 @@ class Trade(Base):
     price = Column(Numeric(10, 2), nullable=False)
     shares = Column(Numeric(12, 6), nullable=False)
     capital = Column(Numeric(12, 2))
+    fees = Column(Numeric(12, 2))  # Commission paid on the fill
+    executed_at = Column(DateTime)  # Fill time, for intraday backtests
     created_at = Column(DateTime, default=datetime.utcnow)
     
     # Relationships
@@ -128,13 +218,16 @@ class Trade(Base):
             'date': self.date.isoformat() if self.date else None,
             'price': float(self.price) if self.price else None,
             'shares': float(self.shares) if self.shares else None,
-            'capital': float(self.capital) if self.capital else None
+            'capital': float(self.capital) if self.capital else None,
+            'fees': float(self.fees) if self.fees else 0.0,
+            'executed_at': self.executed_at.isoformat() if self.executed_at else None
         }
 
 
 class PortfolioHistory(Base):
     """Portfolio history model - stores daily portfolio values"""
     __tablename__ = 'portfolio_history'
+    __table_args__ = (Index('ix_portfolio_history_backtest_date', 'backtest_id', 'date'),)
     
     id = Column(Integer, primary_key=True)
     backtest_id = Column(Integer, ForeignKey('backtests.id'), nullable=False)
@@ -158,10 +251,356 @@ class PortfolioHistory(Base):
         }
 
 
+class PortfolioCurve(Base):
+    """Portfolio curve model - compact daily history, one compressed blob per simulated segment"""
+    __tablename__ = 'portfolio_curves'
+    __table_args__ = (UniqueConstraint('backtest_id', 'segment'),)
+    
+    id = Column(Integer, primary_key=True)
+    backtest_id = Column(Integer, ForeignKey('backtests.id'), nullable=False)
+    segment = Column(Integer, nullable=False, default=0)  # 0 for the run, +1 per extension
+    start_date = Column(Date, nullable=False)
+    end_date = Column(Date, nullable=False)  # Inclusive
+    num_points = Column(Integer, nullable=False)
+    encoding = Column(String(20), nullable=False)
+    data = Column(LargeBinary, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    
+    # Relationships
+    backtest = relationship('Backtest', back_populates='portfolio_curves')
+
+
+class ParameterSweep(Base):
+    """Parameter sweep model - one grid search over short/long windows"""
+    __tablename__ = 'parameter_sweeps'
+    
+    id = Column(Integer, primary_key=True)
+    tickers = Column(JSON, nullable=False)
+    date_ranges = Column(JSON, nullable=False)
+    short_windows = Column(JSON, nullable=False)
+    long_windows = Column(JSON, nullable=False)
+    initial_capital = Column(Numeric(12, 2), nullable=False)
+    num_combinations = Column(Integer)
+    status = Column(String(20), default='pending')
+    error_message = Column(Text)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    completed_at = Column(DateTime)
+    
+    # Relationships
+    results = relationship('SweepResult', back_populates='sweep', cascade='all, delete-orphan')
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'tickers': self.tickers,
+            'date_ranges': self.date_ranges,
+            'short_windows': self.short_windows,
+            'long_windows': self.long_windows,
+            'initial_capital': float(self.initial_capital) if self.initial_capital else None,
+            'num_combinations': self.num_combinations,
+            'status': self.status,
+            'error_message': self.error_message,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'completed_at': self.completed_at.isoformat() if self.completed_at else None
+        }
+
+
+class SweepResult(Base):
+    """Sweep result model - summary metrics for one parameter combination"""
+    __tablename__ = 'sweep_results'
+    
+    id = Column(Integer, primary_key=True)
+    sweep_id = Column(Integer, ForeignKey('parameter_sweeps.id'), nullable=False)
+    ticker = Column(String(10), nullable=False)
+    start_date = Column(Date, nullable=False)
+    end_date = Column(Date, nullable=False)
+    short_window = Column(Integer, nullable=False)
+    long_window = Column(Integer, nullable=False)
+    final_value = Column(Float)
+    total_return = Column(Float)
+    max_drawdown = Column(Float)
+    sharpe_ratio = Column(Float)
+    num_trades = Column(Integer)
+    
+    # Relationships
+    sweep = relationship('ParameterSweep', back_populates='results')
+    
+    def to_dict(self):
+        return {
+            'ticker': self.ticker,
+            'start_date': self.start_date.isoformat() if self.start_date else None,
+            'end_date': self.end_date.isoformat() if self.end_date else None,
+            'short_window': self.short_window,
+            'long_window': self.long_window,
+            'final_value': self.final_value,
+            'total_return': self.total_return,
+            'max_drawdown': self.max_drawdown,
+            'sharpe_ratio': self.sharpe_ratio,
+            'num_trades': self.num_trades
+        }
+
+
+class PortfolioBacktest(Base):
+    """Portfolio backtest model - one strategy run across several tickers"""
+    __tablename__ = 'portfolio_backtests'
+    
+    id = Column(Integer, primary_key=True)
+    strategy_name = Column(String(100), nullable=False)
+    allocation = Column(String(20), nullable=False)  # 'equal' or 'fixed'
+    start_date = Column(Date, nullable=False)
+    end_date = Column(Date, nullable=False)
+    initial_capital = Column(Numeric(14, 2), nullable=False)
+    short_window = Column(Integer, nullable=False)
+    long_window = Column(Integer, nullable=False)
+    final_value = Column(Numeric(14, 2))
+    total_return = Column(Numeric(8, 4))
+    max_drawdown = Column(Numeric(8, 4))
+    sharpe_ratio = Column(Numeric(8, 4))
+    num_trades = Column(Integer)
+    status = Column(String(20), default='pending')
+    progress = Column(Integer, default=0)
+    error_message = Column(Text)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    completed_at = Column(DateTime)
+    
+    # Relationships
+    members = relationship('PortfolioBacktestMember', back_populates='portfolio', cascade='all, delete-orphan')
+    history = relationship('PortfolioBacktestHistory', back_populates='portfolio', cascade='all, delete-orphan')
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'strategy_name': self.strategy_name,
+            'allocation': self.allocation,
+            'start_date': self.start_date.isoformat() if self.start_date else None,
+            'end_date': self.end_date.isoformat() if self.end_date else None,
+            'initial_capital': float(self.initial_capital) if self.initial_capital else None,
+            'short_window': self.short_window,
+            'long_window': self.long_window,
+            'final_value': float(self.final_value) if self.final_value else None,
+            'total_return': float(self.total_return) if self.total_return else None,
+            'max_drawdown': float(self.max_drawdown) if self.max_drawdown else None,
+            'sharpe_ratio': float(self.sharpe_ratio) if self.sharpe_ratio else None,
+            'num_trades': self.num_trades,
+            'status': self.status,
+            'progress': self.progress,
+            'error_message': self.error_message,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'completed_at': self.completed_at.isoformat() if self.completed_at else None
+        }
+
+
+class PortfolioBacktestMember(Base):
+    """Portfolio member model - one ticker's sleeve of a portfolio backtest"""
+    __tablename__ = 'portfolio_backtest_members'
+    
+    id = Column(Integer, primary_key=True)
+    portfolio_id = Column(Integer, ForeignKey('portfolio_backtests.id'), nullable=False)
+    ticker = Column(String(10), nullable=False)
+    weight = Column(Float, nullable=False)
+    allocated_capital = Column(Numeric(14, 2))
+    final_value = Column(Numeric(14, 2))
+    total_return = Column(Numeric(8, 4))
+    num_trades = Column(Integer)
+    status = Column(String(20), default='pending')  # completed or failed
+    error_message = Column(Text)
+    
+    # Relationships
+    portfolio = relationship('PortfolioBacktest', back_populates='members')
+    
+    def to_dict(self):
+        return {
+            'ticker': self.ticker,
+            'weight': self.weight,
+            'allocated_capital': float(self.allocated_capital) if self.allocated_capital else None,
+            'final_value': float(self.final_value) if self.final_value else None,
+            'total_return': float(self.total_return) if self.total_return else None,
+            'num_trades': self.num_trades,
+            'status': self.status,
+            'error_message': self.error_message
+        }
+
+
+class PortfolioBacktestHistory(Base):
+    """Portfolio backtest history model - combined daily equity curve"""
+    __tablename__ = 'portfolio_backtest_history'
+    
+    id = Column(Integer, primary_key=True)
+    portfolio_id = Column(Integer, ForeignKey('portfolio_backtests.id'), nullable=False)
+    date = Column(Date, nullable=False)
+    portfolio_value = Column(Numeric(14, 2), nullable=False)
+    
+    # Relationships
+    portfolio = relationship('PortfolioBacktest', back_populates='history')
+    
+    def to_dict(self):
+        return {
+            'date': self.date.isoformat() if self.date else None,
+            'portfolio_value': float(self.portfolio_value) if self.portfolio_value else None
+        }
+
+
+class BacktestCacheEntry(Base):
+    """Result cache entry - maps a hash of a run's inputs to the completed Backtest"""
+    __tablename__ = 'backtest_cache'
+    
+    id = Column(Integer, primary_key=True)
+    cache_key = Column(String(64), nullable=False, unique=True, index=True)  # sha256 hex
+    backtest_id = Column(Integer, ForeignKey('backtests.id'), nullable=False)
+    hits = Column(Integer, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    last_hit_at = Column(DateTime, default=datetime.utcnow)
+    
+    # Relationships
+    backtest = relationship('Backtest', back_populates='cache_entries')
+
+
+class BacktestSummary(Base):
+    """Analytics summary - one denormalized row per completed backtest, maintained by analytics.py"""
+    __tablename__ = 'backtest_summaries'
+    __table_args__ = (Index('ix_backtest_summaries_group', 'ticker', 'strategy_name', 'period'),)
+    
+    backtest_id = Column(Integer, ForeignKey('backtests.id'), primary_key=True)
+    stock_id = Column(Integer, nullable=False)
+    ticker = Column(String(10), nullable=False)
+    strategy = Column(String(50))
+    strategy_name = Column(String(100), nullable=False)
+    period = Column(Integer, nullable=False)  # Calendar year of start_date
+    start_date = Column(Date, nullable=False)
+    end_date = Column(Date, nullable=False)
+    initial_capital = Column(Float)
+    final_value = Column(Float)
+    total_return = Column(Float)
+    max_drawdown = Column(Float)
+    sharpe_ratio = Column(Float)
+    num_trades = Column(Integer)
+    completed_at = Column(DateTime)
+    
+    # Relationships
+    backtest = relationship('Backtest', back_populates='summary')
+    
+    def to_dict(self):
+        return {
+            'backtest_id': self.backtest_id,
+            'ticker': self.ticker,
+            'strategy': self.strategy,
+            'strategy_name': self.strategy_name,
+            'period': self.period,
+            'start_date': self.start_date.isoformat() if self.start_date else None,
+            'end_date': self.end_date.isoformat() if self.end_date else None,
+            'initial_capital': self.initial_capital,
+            'final_value': self.final_value,
+            'total_return': self.total_return,
+            'max_drawdown': self.max_drawdown,
+            'sharpe_ratio': self.sharpe_ratio,
+            'num_trades': self.num_trades,
+            'completed_at': self.completed_at.isoformat() if self.completed_at else None
+        }
+
+
+class BacktestAggregate(Base):
+    """Analytics aggregate - running sums per (ticker, strategy_name, period), rolled up at query time"""
+    __tablename__ = 'backtest_aggregates'
+    __table_args__ = (UniqueConstraint('ticker', 'strategy_name', 'period'),)
+    
+    id = Column(Integer, primary_key=True)
+    ticker = Column(String(10), nullable=False)
+    strategy = Column(String(50))
+    strategy_name = Column(String(100), nullable=False)
+    period = Column(Integer, nullable=False)
+    num_backtests = Column(Integer, nullable=False)
+    return_sum = Column(Float)
+    return_sq_sum = Column(Float)
+    sharpe_sum = Column(Float)
+    drawdown_sum = Column(Float)
+    best_return = Column(Float)
+    worst_return = Column(Float)
+    best_sharpe = Column(Float)
+    worst_drawdown = Column(Float)
+    num_trades_sum = Column(Integer)
+
+
+class BacktestBatch(Base):
+    """Backtest batch model - many backtest specs submitted and stored together"""
+    __tablename__ = 'backtest_batches'
+
+    id = Column(Integer, primary_key=True)
+    num_specs = Column(Integer, nullable=False)
+    num_completed = Column(Integer, default=0)
+    num_failed = Column(Integer, default=0)
+    status = Column(String(20), default='pending')  # pending, running, completed, failed
+    error_message = Column(Text)
+    stage_timings = Column(JSON)  # Seconds per batch stage, plus total
+    created_at = Column(DateTime, default=datetime.utcnow)
+    completed_at = Column(DateTime)
+
+    # Relationships
+    items = relationship('BacktestBatchItem', back_populates='batch', cascade='all, delete-orphan',
+                         order_by='BacktestBatchItem.position')
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'num_specs': self.num_specs,
+            'num_completed': self.num_completed,
+            'num_failed': self.num_failed,
+            'status': self.status,
+            'error_message': self.error_message,
+            'stage_timings': self.stage_timings,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'completed_at': self.completed_at.isoformat() if self.completed_at else None
+        }
+
+
+class BacktestBatchItem(Base):
+    """Batch item model - one spec of a batch and the Backtest it produced"""
+    __tablename__ = 'backtest_batch_items'
+
+    id = Column(Integer, primary_key=True)
+    batch_id = Column(Integer, ForeignKey('backtest_batches.id'), nullable=False, index=True)
+    position = Column(Integer, nullable=False)  # Index of the spec in the request
+    backtest_id = Column(Integer, ForeignKey('backtests.id', ondelete='SET NULL'))
+    ticker = Column(String(10))
+    status = Column(String(20), default='pending')  # pending, cached, invalid, completed, failed, cancelled
+    error_message = Column(Text)
+
+    # Relationships
+    batch = relationship('BacktestBatch', back_populates='items')
+    backtest = relationship('Backtest')
+
+    def to_dict(self):
+        return {
+            'index': self.position,
+            'ticker': self.ticker,
+            'backtest_id': self.backtest_id,
+            'status': self.status,
+            'error_message': self.error_message
+        }
+
+
+class DurationHistogramBucket(Base):
+    """
+    One bucket of a /metrics duration histogram, incremented as runs complete
+
+    Counts are per bucket (not cumulative); le is the bucket's upper bound
+    as exposed to Prometheus, '+Inf' for the overflow bucket.
+    """
+    __tablename__ = 'duration_histogram_buckets'
+    __table_args__ = (UniqueConstraint('histogram', 'label', 'le'),)
+
+    id = Column(Integer, primary_key=True)
+    histogram = Column(String(20), nullable=False)  # Key in instrumentation.HISTOGRAMS
+    label = Column(String(100), nullable=False)  # Stage or strategy
+    le = Column(String(20), nullable=False)
+    count = Column(BigInteger, nullable=False, default=0)
+    sum = Column(Float, nullable=False, default=0.0)  # Seconds observed in this bucket
+
+
 def init_db():
-    """Initialize database - create all tables"""
-    Base.metadata.create_all(engine)
-    print("Database tables created successfully!")
+    """Initialize database - create missing tables and apply pending migrations"""
+    from migrations import upgrade
+    applied = upgrade(engine)
+    logger.info("Database ready (%d migrations applied)", len(applied))
 
 
 def get_db():
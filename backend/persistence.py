@@ -0,0 +1,62 @@
+from sqlalchemy import insert
+from config import Config
+from models import Trade, PortfolioHistory
+from curve_store import store_curve
+
+
+def trade_rows(backtest_id, result):
+    """Trade insert mappings for a simulation result"""
+    return [{
+        'backtest_id': backtest_id,
+        'trade_type': trade['trade_type'],
+        'date': trade['date'].date(),
+        'price': trade['price'],
+        'shares': trade['shares'],
+        'capital': trade['capital'],
+        'fees': trade.get('fees', 0.0),
+        'executed_at': trade.get('executed_at')
+    } for trade in result['trades']]
+
+
+def history_rows(backtest_id, result):
+    """PortfolioHistory insert mappings for a simulation result"""
+    dates = [d.date() for d in result['dates']]
+    values = result['portfolio_value'].tolist()
+    prices = result['close'].tolist()
+    shares = result['shares'].tolist()
+    return [{
+        'backtest_id': backtest_id,
+        'date': dates[i],
+        'portfolio_value': values[i],
+        'stock_price': prices[i],
+        'shares_held': shares[i]
+    } for i in range(len(dates))]
+
+
+def store_results(db, backtest_id, result):
+    """
+    Write a simulation's trades and daily history with one executemany per table
+
+    With HISTORY_STORAGE = 'compact' the daily history is stored as one
+    compressed portfolio_curves blob instead of portfolio_history rows.
+
+    Args:
+        db: SQLAlchemy database session
+        backtest_id: ID of the Backtest the rows belong to
+        result: dict returned by simulation.simulate
+    """
+    trades = trade_rows(backtest_id, result)
+    if trades:
+        db.execute(insert(Trade), trades)
+
+    if Config.HISTORY_STORAGE == 'compact':
+        store_curve(db, backtest_id, result['dates'].values.astype('datetime64[D]'), {
+            'portfolio_value': result['portfolio_value'],
+            'stock_price': result['close'],
+            'shares_held': result['shares']
+        })
+        return
+
+    history = history_rows(backtest_id, result)
+    if history:
+        db.execute(insert(PortfolioHistory), history)
@@ -0,0 +1,56 @@
+"""
+Process pools shared by the CPU-bound fan-outs: sweeps, walk-forward folds,
+Monte Carlo robustness and batch backtests
+
+Pools are created on first use, one per worker count, and kept for the life
+of the process instead of being started per request. Workers are started
+with Config.PROCESS_START_METHOD ('spawn' by default) rather than fork:
+gunicorn's gthread workers are multi-threaded, and a child forked from
+them can inherit locks held by other threads and deadlock.
+"""
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from config import Config
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(workers):
+    """The shared pool with this many workers, created on first use"""
+    with _pools_lock:
+        if workers not in _pools:
+            _pools[workers] = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context(Config.PROCESS_START_METHOD)
+            )
+        return _pools[workers]
+
+
+def drop_pool(workers):
+    """Forget a pool whose workers died so the next call starts a fresh one"""
+    with _pools_lock:
+        pool = _pools.pop(workers, None)
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def pool_map(fn, tasks, workers, chunksize=1):
+    """
+    fn over tasks, in order
+
+    Runs on the shared pool when workers > 1 and there is more than one
+    task, otherwise in-process. fn and the tasks must be picklable.
+
+    Raises:
+        BrokenProcessPool: if a worker died (the pool is dropped first)
+    """
+    if not workers or workers <= 1 or len(tasks) <= 1:
+        return [fn(task) for task in tasks]
+    try:
+        return list(get_pool(workers).map(fn, tasks, chunksize=chunksize))
+    except BrokenProcessPool:
+        drop_pool(workers)
+        raise
@@ -0,0 +1,199 @@
+import logging
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from datetime import datetime
+from sqlalchemy import insert
+from config import Config
+from models import SessionLocal, PortfolioBacktest, PortfolioBacktestMember, PortfolioBacktestHistory
+from strategy import MovingAverageCrossover
+from simulation import simulate
+from metrics import performance_metrics
+from jobs import _init_process_worker
+
+logger = logging.getLogger(__name__)
+
+ALLOCATIONS = ('equal', 'fixed')
+
+
+def allocation_weights(tickers, allocation='equal', weights=None):
+    """
+    Capital weight per ticker
+
+    Args:
+        tickers: List of tickers
+        allocation: 'equal' or 'fixed'
+        weights: dict of ticker -> weight for 'fixed' (normalized to sum to 1)
+    """
+    if allocation == 'equal':
+        return {ticker: 1.0 / len(tickers) for ticker in tickers}
+
+    if allocation == 'fixed':
+        weights = {ticker.upper(): float(w) for ticker, w in (weights or {}).items()}
+        missing = [ticker for ticker in tickers if ticker not in weights]
+        if missing:
+            raise ValueError(f"Missing weights for: {', '.join(missing)}")
+        if any(weights[ticker] < 0 for ticker in tickers):
+            raise ValueError('Weights must not be negative')
+        total = sum(weights[ticker] for ticker in tickers)
+        if total <= 0:
+            raise ValueError('Weights must sum to a positive value')
+        return {ticker: weights[ticker] / total for ticker in tickers}
+
+    raise ValueError(f"Allocation must be one of: {', '.join(ALLOCATIONS)}")
+
+
+def run_ticker(ticker, start_date, end_date, capital, short_window, long_window):
+    """
+    Load prices, compute signals and simulate one ticker in its own session
+
+    Runs inside the portfolio's thread/process pool.
+    """
+    db = SessionLocal()
+    try:
+        strategy = MovingAverageCrossover(
+            db_session=db,
+            ticker=ticker,
+            start_date=start_date,
+            end_date=end_date,
+            initial_capital=capital,
+            short_window=short_window,
+            long_window=long_window,
+            engine='vectorized'
+        )
+        df = strategy.fetch_and_store_data()
+        df = strategy.calculate_signals(df)
+        if len(df) == 0:
+            raise ValueError(f"Not enough data for {ticker} to fill a {long_window}-day window")
+        return simulate(df, capital, engine='vectorized')
+    finally:
+        db.close()
+
+
+def combine_equity(curves, capitals):
+    """
+    Sum per-ticker equity curves into one portfolio curve
+
+    Each sleeve holds its allocated cash before its first bar and carries
+    its last value forward over dates where it has no bar.
+
+    Args:
+        curves: dict of ticker -> pd.Series of portfolio values indexed by date
+        capitals: dict of ticker -> allocated capital (including failed tickers)
+    """
+    frame = pd.concat(curves, axis=1).sort_index().ffill()
+    for ticker in frame.columns:
+        frame[ticker] = frame[ticker].fillna(capitals[ticker])
+
+    idle_cash = sum(capital for ticker, capital in capitals.items() if ticker not in curves)
+    return frame.sum(axis=1) + idle_cash
+
+
+def _create_pool(workers):
+    if Config.PORTFOLIO_EXECUTOR == 'process':
+        return ProcessPoolExecutor(max_workers=workers, initializer=_init_process_worker)
+    return ThreadPoolExecutor(max_workers=workers, thread_name_prefix='portfolio')
+
+
+def run_portfolio_backtest(db, portfolio, tickers, weights, workers=None):
+    """
+    Run every ticker concurrently and store the combined result
+
+    Tickers that fail keep their allocation as cash and are reported on
+    their member row; the run fails only if no ticker succeeds.
+    """
+    workers = workers or Config.PORTFOLIO_WORKERS
+    initial_capital = float(portfolio.initial_capital)
+    capitals = {ticker: initial_capital * weights[ticker] for ticker in tickers}
+
+    portfolio.status = 'running'
+    db.commit()
+
+    results = {}
+    errors = {}
+    with _create_pool(min(workers, len(tickers))) as pool:
+        futures = {
+            pool.submit(
+                run_ticker, ticker, portfolio.start_date.isoformat(), portfolio.end_date.isoformat(),
+                capitals[ticker], portfolio.short_window, portfolio.long_window
+            ): ticker
+            for ticker in tickers
+        }
+        for done, future in enumerate(as_completed(futures), start=1):
+            ticker = futures[future]
+            try:
+                results[ticker] = future.result()
+            except Exception as e:
+                errors[ticker] = str(e)
+            portfolio.progress = int(90 * done / len(tickers))
+            db.commit()
+
+    if not results:
+        raise ValueError(f"All tickers failed: {errors}")
+
+    curves = {
+        ticker: pd.Series(result['portfolio_value'], index=result['dates'])
+        for ticker, result in results.items()
+    }
+    combined = combine_equity(curves, capitals)
+    metrics = performance_metrics(combined.to_numpy(), initial_capital)
+
+    for ticker in tickers:
+        member = PortfolioBacktestMember(
+            portfolio_id=portfolio.id,
+            ticker=ticker,
+            weight=weights[ticker],
+            allocated_capital=capitals[ticker]
+        )
+        if ticker in results:
+            final_value = float(results[ticker]['portfolio_value'][-1])
+            member.final_value = final_value
+            member.total_return = ((final_value - capitals[ticker]) / capitals[ticker] * 100
+                                   if capitals[ticker] else 0.0)
+            member.num_trades = len(results[ticker]['trades'])
+            member.status = 'completed'
+        else:
+            member.status = 'failed'
+            member.error_message = errors[ticker]
+        db.add(member)
+
+    db.execute(insert(PortfolioBacktestHistory), [
+        {'portfolio_id': portfolio.id, 'date': date.date(), 'portfolio_value': float(value)}
+        for date, value in combined.items()
+    ])
+
+    portfolio.final_value = metrics['final_value']
+    portfolio.total_return = metrics['total_return']
+    portfolio.max_drawdown = metrics['max_drawdown']
+    portfolio.sharpe_ratio = metrics['sharpe_ratio']
+    portfolio.num_trades = sum(len(result['trades']) for result in results.values())
+    portfolio.status = 'completed'
+    portfolio.progress = 100
+    portfolio.completed_at = datetime.utcnow()
+    db.commit()
+
+    logger.info("Portfolio backtest %s: %d/%d tickers, final value $%s",
+                portfolio.id, len(results), len(tickers), f"{metrics['final_value']:,.2f}")
+    return portfolio
+
+
+def run_portfolio_job(portfolio_id, tickers, weights):
+    """Job queue entry point for a pending PortfolioBacktest"""
+    db = SessionLocal()
+    try:
+        portfolio = db.query(PortfolioBacktest).filter_by(id=portfolio_id).first()
+        if portfolio is None or portfolio.status != 'pending':
+            return
+        run_portfolio_backtest(db, portfolio, tickers, weights)
+
+    except Exception as e:
+        logger.exception("Portfolio backtest %s failed", portfolio_id)
+        db.rollback()
+        portfolio = db.query(PortfolioBacktest).filter_by(id=portfolio_id).first()
+        if portfolio is not None:
+            portfolio.status = 'failed'
+            portfolio.error_message = str(e)
+            portfolio.completed_at = datetime.utcnow()
+            db.commit()
+
+    finally:
+        db.close()
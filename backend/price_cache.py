@@ -0,0 +1,202 @@
+import logging
+import numpy as np
+import pandas as pd
+from datetime import date, datetime
+from sqlalchemy import select
+from config import Config
+from models import Stock, StockPrice, PriceCoverage
+from column_store import ColumnStore
+from data_sources import get_data_source
+from ingest import store_prices
+from instrumentation import timed
+
+PRICE_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
+
+logger = logging.getLogger(__name__)
+
+
+def to_date(value):
+    """Convert a YYYY-MM-DD string, datetime or date into a date"""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+
+def get_or_create_stock(db, ticker):
+    """Look up the Stock row for a ticker, creating it if needed"""
+    stock = db.query(Stock).filter_by(ticker=ticker).first()
+
+    if not stock:
+        stock = Stock(ticker=ticker)
+        db.add(stock)
+        db.commit()
+        logger.info("Created new stock entry for %s", ticker)
+
+    return stock
+
+
+def missing_ranges(covered, start, end):
+    """
+    Return the parts of [start, end) not covered by the given ranges
+
+    Args:
+        covered: Sorted list of (start, end) tuples, end exclusive
+        start: Requested start date
+        end: Requested end date (exclusive)
+    """
+    gaps = []
+    cursor = start
+    for range_start, range_end in covered:
+        if range_end <= cursor:
+            continue
+        if range_start >= end:
+            break
+        if range_start > cursor:
+            gaps.append((cursor, range_start))
+        cursor = max(cursor, range_end)
+        if cursor >= end:
+            break
+    if cursor < end:
+        gaps.append((cursor, end))
+    return gaps
+
+
+class PriceCache:
+    """
+    Local-first price loader backed by the stock_prices table
+
+    A range is served straight from the database when price_coverage says
+    it has already been fetched. Only the uncovered gaps are requested from
+    the data source, stored, and recorded as covered.
+
+    With a column store configured, reads are served from its memory-mapped
+    files, which are synced from the table after new rows are stored.
+    """
+
+    def __init__(self, db_session, source=None, column_store=None, timings=None):
+        self.db = db_session
+        self.timings = timings
+        self.source = source or get_data_source()
+        if column_store is None and Config.COLUMN_STORE_ENABLED:
+            column_store = ColumnStore()
+        self.column_store = column_store
+        self.stats = {'inserted': 0, 'skipped': 0, 'fetched_ranges': []}
+
+    def covered_ranges(self, stock_id):
+        """Covered (start, end) ranges for a stock, sorted by start"""
+        rows = self.db.query(PriceCoverage).filter_by(
+            stock_id=stock_id
+        ).order_by(PriceCoverage.start_date).all()
+        return [(row.start_date, row.end_date) for row in rows]
+
+    def record_coverage(self, stock_id, start, end):
+        """
+        Add [start, end) to the coverage of a stock, merging overlapping ranges
+
+        The stock row is locked first (FOR UPDATE; SQLite serializes writers
+        anyway), so concurrent jobs on one ticker read each other's committed
+        ranges before replacing them instead of clobbering them.
+        """
+        self.db.execute(select(Stock.id).where(Stock.id == stock_id).with_for_update())
+        ranges = self.covered_ranges(stock_id) + [(start, end)]
+        ranges.sort()
+
+        merged = []
+        for range_start, range_end in ranges:
+            if merged and range_start <= merged[-1][1]:
+                merged[-1] = (merged[-1][0], max(merged[-1][1], range_end))
+            else:
+                merged.append((range_start, range_end))
+
+        self.db.query(PriceCoverage).filter_by(stock_id=stock_id).delete()
+        for range_start, range_end in merged:
+            self.db.add(PriceCoverage(stock_id=stock_id, start_date=range_start, end_date=range_end))
+
+    def empty_gap_is_final(self, stock, covered, gap_start, gap_end):
+        """
+        Whether a gap the source returned no bars for can be recorded as covered
+
+        An empty download may be a failed one (yf.download returns an empty
+        frame on network errors and rate limits), and a range recorded as
+        covered is never fetched again. So it only counts when the source
+        confirms the empty result, when the gap has no weekdays, or when it
+        is a short hole between covered ranges (a market holiday).
+        """
+        if self.source.confirms_empty(stock.ticker):
+            return True
+
+        weekdays = int(np.busday_count(gap_start, gap_end))
+        if weekdays == 0:
+            return True
+
+        after_covered = any(range_end == gap_start for _, range_end in covered)
+        before_covered = any(range_start == gap_end for range_start, _ in covered)
+        return after_covered and before_covered and weekdays <= Config.PRICE_HOLIDAY_GAP_DAYS
+
+    def fill_gaps(self, stock, start, end):
+        """Fetch and store whatever part of [start, end) is not covered yet"""
+        # Bars for today may still change, so never treat them as covered
+        end = min(end, date.today())
+
+        covered = self.covered_ranges(stock.id)
+        for gap_start, gap_end in missing_ranges(covered, start, end):
+            logger.info("Fetching %s %s to %s from %s", stock.ticker, gap_start, gap_end, self.source.name)
+            with timed(self.timings, 'fetch'):
+                df = self.source.fetch(stock.ticker, gap_start, gap_end)
+            self.stats['fetched_ranges'].append([gap_start.isoformat(), gap_end.isoformat()])
+
+            with timed(self.timings, 'ingest'):
+                counts = store_prices(self.db, stock.id, df)
+                if len(df) or self.empty_gap_is_final(stock, covered, gap_start, gap_end):
+                    self.record_coverage(stock.id, gap_start, gap_end)
+                else:
+                    logger.warning("No bars for %s %s to %s; leaving the range to be fetched again",
+                                   stock.ticker, gap_start, gap_end)
+            self.stats['inserted'] += counts['inserted']
+            self.stats['skipped'] += counts['skipped']
+
+        with timed(self.timings, 'ingest'):
+            self.db.commit()
+
+    def load(self, stock_id, start, end):
+        """Load stored prices for [start, end) as a DataFrame indexed by date"""
+        rows = self.db.execute(
+            select(
+                StockPrice.date, StockPrice.open, StockPrice.high,
+                StockPrice.low, StockPrice.close, StockPrice.volume
+            ).where(
+                StockPrice.stock_id == stock_id,
+                StockPrice.date >= start,
+                StockPrice.date < end
+            ).order_by(StockPrice.date)
+        ).all()
+
+        df = pd.DataFrame.from_records(rows, columns=['Date'] + PRICE_COLUMNS)
+        df.index = pd.DatetimeIndex(df.pop('Date'))
+        return df.astype(float)
+
+    def get_prices(self, stock, start_date, end_date):
+        """
+        Return daily bars for [start_date, end_date), fetching only missing ranges
+
+        Args:
+            stock: Stock row
+            start_date: Start date (YYYY-MM-DD string or date)
+            end_date: End date, exclusive (YYYY-MM-DD string or date)
+        """
+        start = to_date(start_date)
+        end = to_date(end_date)
+
+        inserted_before = self.stats['inserted']
+        self.fill_gaps(stock, start, end)
+
+        with timed(self.timings, 'load'):
+            if self.column_store is None:
+                return self.load(stock.id, start, end)
+
+            # Serve from the memory-mapped store, appending whatever was just inserted
+            if self.stats['inserted'] > inserted_before or not self.column_store.has(stock.ticker):
+                self.column_store.sync(self.db, stock)
+            return self.column_store.load_frame(stock.ticker, start, end)
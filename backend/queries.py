@@ -0,0 +1,170 @@
+import base64
+import math
+import numpy as np
+from datetime import datetime
+from sqlalchemy import select, func, or_, and_, desc
+from sqlalchemy.orm import joinedload, contains_eager
+from models import Stock, Backtest, PortfolioHistory
+from curve_store import has_curve, history_arrays
+
+HISTORY_FIELDS = ('id', 'backtest_id', 'date', 'portfolio_value', 'stock_price', 'shares_held')
+
+
+def encode_cursor(backtest):
+    """Opaque keyset cursor for the (created_at, id) position of a backtest"""
+    raw = f"{backtest.created_at.isoformat()}|{backtest.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor):
+    """
+    Parse a cursor from encode_cursor
+
+    Raises:
+        ValueError: if the cursor is malformed
+    """
+    try:
+        created_at, backtest_id = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+        return datetime.fromisoformat(created_at), int(backtest_id)
+    except Exception:
+        raise ValueError('Invalid cursor')
+
+
+def list_backtests(db, limit=50, cursor=None, ticker=None, strategy=None, status=None):
+    """
+    One page of backtests, newest first, with their stock eager-loaded
+
+    Args:
+        limit: Page size
+        cursor: Cursor returned with the previous page
+        ticker: Only backtests for this ticker
+        strategy: Registry name (e.g. 'rsi') or full strategy_name (e.g. 'MA_Crossover_20_50')
+        status: Only backtests with this status
+
+    Returns:
+        (backtests, next_cursor) where next_cursor is None on the last page
+    """
+    query = db.query(Backtest)
+
+    if ticker:
+        query = query.join(Backtest.stock).filter(Stock.ticker == ticker.upper()).options(
+            contains_eager(Backtest.stock)
+        )
+    else:
+        query = query.options(joinedload(Backtest.stock))
+
+    if strategy:
+        query = query.filter(or_(Backtest.strategy == strategy, Backtest.strategy_name == strategy))
+    if status:
+        query = query.filter(Backtest.status == status)
+
+    if cursor:
+        created_at, backtest_id = decode_cursor(cursor)
+        query = query.filter(or_(
+            Backtest.created_at < created_at,
+            and_(Backtest.created_at == created_at, Backtest.id < backtest_id)
+        ))
+
+    backtests = query.order_by(desc(Backtest.created_at), desc(Backtest.id)).limit(limit + 1).all()
+
+    next_cursor = encode_cursor(backtests[limit - 1]) if len(backtests) > limit else None
+    return backtests[:limit], next_cursor
+
+
+def _serialize_history_value(field, value):
+    # Same conversions as PortfolioHistory.to_dict
+    if field == 'date':
+        return value.isoformat() if value else None
+    if field in ('id', 'backtest_id'):
+        return value
+    return float(value) if value else None
+
+
+def load_portfolio_history(db, backtest_id, fields=HISTORY_FIELDS, start=None, end=None,
+                           every=None, max_points=None):
+    """
+    Column-projected, optionally filtered and downsampled portfolio history
+
+    Downsampling happens in SQL (row_number() over the date order), so only
+    the sampled rows leave the database. The last row in range is always kept.
+
+    Args:
+        fields: Columns to return (subset of HISTORY_FIELDS)
+        start: Only dates on or after this date
+        end: Only dates on or before this date
+        every: Keep every Nth row
+        max_points: Keep at most about this many rows (overrides every)
+
+    Returns:
+        list of dicts with the requested fields
+    """
+    if has_curve(db, backtest_id):
+        return _load_compact_history(db, backtest_id, fields, start, end, every, max_points)
+
+    conditions = [PortfolioHistory.backtest_id == backtest_id]
+    if start:
+        conditions.append(PortfolioHistory.date >= start)
+    if end:
+        conditions.append(PortfolioHistory.date <= end)
+
+    columns = [getattr(PortfolioHistory, field) for field in fields]
+
+    if max_points:
+        total = db.execute(select(func.count()).select_from(PortfolioHistory).where(*conditions)).scalar()
+        every = max(1, math.ceil(total / max_points))
+
+    if every and every > 1:
+        numbered = select(
+            *columns,
+            (func.row_number().over(order_by=PortfolioHistory.date) - 1).label('rn'),
+            func.count().over().label('total')
+        ).where(*conditions).subquery()
+
+        sampled = [numbered.c[field] for field in fields]
+        rows = db.execute(
+            select(*sampled).where(or_(
+                numbered.c.rn % every == 0,
+                numbered.c.rn == numbered.c.total - 1
+            )).order_by(numbered.c.rn)
+        ).all()
+    else:
+        rows = db.execute(select(*columns).where(*conditions).order_by(PortfolioHistory.date)).all()
+
+    return [
+        {field: _serialize_history_value(field, value) for field, value in zip(fields, row)}
+        for row in rows
+    ]
+
+
+def _load_compact_history(db, backtest_id, fields, start, end, every, max_points):
+    """load_portfolio_history for curves stored as blobs: filter and sample in NumPy"""
+    arrays = history_arrays(db, backtest_id)
+    # No row ids in compact storage; number the days from 1 instead
+    arrays['id'] = np.arange(1, len(arrays['date']) + 1)
+
+    mask = np.ones(len(arrays['date']), dtype=bool)
+    if start:
+        mask &= arrays['date'] >= np.datetime64(start, 'D')
+    if end:
+        mask &= arrays['date'] <= np.datetime64(end, 'D')
+    index = np.flatnonzero(mask)
+
+    if max_points:
+        every = max(1, math.ceil(len(index) / max_points))
+    if every and every > 1 and len(index):
+        sampled = index[::every]
+        if sampled[-1] != index[-1]:
+            sampled = np.append(sampled, index[-1])
+        index = sampled
+
+    columns = {}
+    for field in fields:
+        if field == 'backtest_id':
+            columns[field] = [backtest_id] * len(index)
+        else:
+            columns[field] = arrays[field][index].tolist()
+
+    return [
+        {field: _serialize_history_value(field, columns[field][i]) for field in fields}
+        for i in range(len(index))
+    ]
@@ -0,0 +1,115 @@
+import hashlib
+import json
+from datetime import date, datetime, timedelta
+from sqlalchemy import select, func
+from config import Config
+from models import Stock, StockPrice, PriceCoverage, BacktestCacheEntry
+from price_cache import missing_ranges, to_date
+
+
+def price_revision(db, stock, start, end):
+    """
+    Fingerprint of the stored prices a run over [start, end) would read
+
+    Returns None while part of the range is still uncovered: the run would
+    fetch new data, so nothing cached can stand in for it.
+    """
+    covered = [
+        (row.start_date, row.end_date)
+        for row in db.query(PriceCoverage).filter_by(stock_id=stock.id).order_by(PriceCoverage.start_date)
+    ]
+    if missing_ranges(covered, start, min(end, date.today())):
+        return None
+
+    count, first, last, close_sum = db.execute(
+        select(func.count(), func.min(StockPrice.date), func.max(StockPrice.date), func.sum(StockPrice.close))
+        .where(StockPrice.stock_id == stock.id, StockPrice.date >= start, StockPrice.date < end)
+    ).one()
+    return [count, str(first), str(last), str(close_sum)]
+
+
+def cache_key(db, strategy):
+    """
+    Content hash of a strategy run's inputs
+
+    Covers the strategy name, its version and parameters, the execution
+    model, the ticker, date range and capital, and the revision of the price data in range.
+
+    Returns:
+        sha256 hex digest, or None if the run cannot be cached (yet)
+    """
+    # Minute-bar prices have no coverage records to fingerprint
+    if strategy.frequency != 'daily':
+        return None
+
+    stock = db.query(Stock).filter_by(ticker=strategy.ticker).first()
+    if stock is None:
+        return None
+
+    start = to_date(strategy.start_date)
+    end = to_date(strategy.end_date)
+    revision = price_revision(db, stock, start, end)
+    if revision is None:
+        return None
+
+    payload = {
+        'strategy': strategy.name,
+        'version': strategy.version,
+        'params': strategy.params,
+        'execution': strategy.execution.to_dict(),
+        'ticker': strategy.ticker,
+        'start_date': start.isoformat(),
+        'end_date': end.isoformat(),
+        'initial_capital': float(strategy.initial_capital),
+        'prices': revision
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def lookup(db, key):
+    """
+    Completed Backtest cached under key, or None
+
+    Expired entries and entries whose backtest is no longer completed are
+    dropped on the way.
+    """
+    entry = db.query(BacktestCacheEntry).filter_by(cache_key=key).first()
+    if entry is None:
+        return None
+
+    expired = Config.RESULT_CACHE_TTL and entry.created_at < datetime.utcnow() - timedelta(seconds=Config.RESULT_CACHE_TTL)
+    if expired or entry.backtest.status != 'completed':
+        db.delete(entry)
+        db.commit()
+        return None
+
+    entry.hits = (entry.hits or 0) + 1
+    entry.last_hit_at = datetime.utcnow()
+    db.commit()
+    return entry.backtest
+
+
+def remember(db, key, backtest, commit=True):
+    """
+    Point key at a completed backtest, evicting least recently used entries over the size limit
+
+    With commit=False the change is left to the caller's transaction.
+    """
+    db.query(BacktestCacheEntry).filter_by(cache_key=key).delete()
+    db.add(BacktestCacheEntry(cache_key=key, backtest_id=backtest.id))
+    db.flush()
+
+    excess = db.execute(select(func.count()).select_from(BacktestCacheEntry)).scalar() - Config.RESULT_CACHE_MAX_ENTRIES
+    if excess > 0:
+        stale = select(BacktestCacheEntry.id).order_by(BacktestCacheEntry.last_hit_at).limit(excess)
+        db.query(BacktestCacheEntry).filter(
+            BacktestCacheEntry.id.in_([row.id for row in db.execute(stale)])
+        ).delete(synchronize_session=False)
+
+    if commit:
+        db.commit()
+
+
+def invalidate(db, backtest_id):
+    """Drop cache entries for a backtest whose results changed"""
+    db.query(BacktestCacheEntry).filter_by(backtest_id=backtest_id).delete()
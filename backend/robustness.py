@@ -0,0 +1,136 @@
+import numpy as np
+from config import Config
+from curve_store import history_arrays
+from metrics import performance_metrics
+from sweep import batch_metrics
+from pools import pool_map
+
+RESAMPLING_METHODS = ('bootstrap', 'block')
+DEFAULT_PERCENTILES = (5, 25, 50, 75, 95)
+ROBUSTNESS_METRICS = ('final_value', 'total_return', 'max_drawdown', 'sharpe_ratio')
+
+
+def resample_indices(rng, num_paths, num_returns, method, block_size):
+    """
+    Indices into the return series for a batch of resampled paths
+
+    'bootstrap' draws every day independently; 'block' concatenates
+    randomly placed runs of block_size consecutive days (moving block
+    bootstrap), which keeps short-range autocorrelation and volatility
+    clustering.
+
+    Returns:
+        int array of shape (num_paths, num_returns)
+    """
+    if method == 'bootstrap':
+        return rng.integers(0, num_returns, size=(num_paths, num_returns))
+
+    block_size = min(block_size, num_returns)
+    num_blocks = -(-num_returns // block_size)
+    starts = rng.integers(0, num_returns - block_size + 1, size=(num_paths, num_blocks))
+    return (starts[:, :, None] + np.arange(block_size)).reshape(num_paths, -1)[:, :num_returns]
+
+
+def simulate_paths(returns, num_paths, method, block_size, start_value, seed):
+    """
+    Metrics for one batch of resampled equity curves
+
+    Args:
+        returns: Observed daily returns
+        start_value: Portfolio value every path starts from
+        seed: np.random.SeedSequence (or int) for this batch
+
+    Returns:
+        dict of 1-D arrays as from sweep.batch_metrics
+    """
+    rng = np.random.default_rng(seed)
+    growth = 1 + returns[resample_indices(rng, num_paths, len(returns), method, block_size)]
+
+    equity = np.empty((num_paths, len(returns) + 1))
+    equity[:, 0] = start_value
+    equity[:, 1:] = start_value * np.cumprod(growth, axis=1)
+    return batch_metrics(equity)
+
+
+def _simulate_paths_task(args):
+    return simulate_paths(*args)
+
+
+def run_paths(returns, num_paths, method, block_size, start_value, seed, workers=None):
+    """
+    Simulate num_paths resampled paths in fixed-size batches
+
+    Each batch gets its own child of SeedSequence(seed), and batch sizes do
+    not depend on the worker count, so a seed reproduces the same paths
+    whether they run in-process or across the shared pool.
+    """
+    workers = Config.ROBUSTNESS_WORKERS if workers is None else workers
+    batch = Config.ROBUSTNESS_BATCH_PATHS
+    sizes = [min(batch, num_paths - offset) for offset in range(0, num_paths, batch)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    tasks = [(returns, size, method, block_size, start_value, child) for size, child in zip(sizes, seeds)]
+
+    batches = pool_map(_simulate_paths_task, tasks, workers)
+
+    return {key: np.concatenate([b[key] for b in batches]) for key in batches[0]}
+
+
+def robustness_analysis(db, backtest, num_paths, method='block', block_size=None, seed=None,
+                        percentiles=DEFAULT_PERCENTILES, workers=None):
+    """
+    Monte Carlo confidence intervals for a completed backtest
+
+    The backtest's daily returns are resampled into num_paths alternative
+    equity curves of the same length, and the distribution of their final
+    value, return, max drawdown and Sharpe ratio is summarised.
+
+    Args:
+        db: SQLAlchemy database session
+        backtest: Completed Backtest
+        num_paths: Number of resampled paths
+        method: 'bootstrap' (i.i.d. days) or 'block' (moving blocks)
+        block_size: Days per block (defaults to Config.ROBUSTNESS_BLOCK_SIZE)
+        seed: Integer seed; one is drawn and returned if omitted
+        percentiles: Percentiles to report (0-100)
+
+    Returns:
+        dict with the settings used, the observed metrics, percentiles and
+        mean per metric, and the probability of ending below the initial capital
+    """
+    if method not in RESAMPLING_METHODS:
+        raise ValueError(f"Method must be one of: {', '.join(RESAMPLING_METHODS)}")
+    if not 1 <= num_paths <= Config.ROBUSTNESS_MAX_PATHS:
+        raise ValueError(f"Paths must be between 1 and {Config.ROBUSTNESS_MAX_PATHS}")
+    block_size = int(block_size or Config.ROBUSTNESS_BLOCK_SIZE)
+    if block_size < 1:
+        raise ValueError('Block size must be at least 1')
+    percentiles = [float(p) for p in percentiles]
+    if not percentiles or not all(0 <= p <= 100 for p in percentiles):
+        raise ValueError('Percentiles must be between 0 and 100')
+    if seed is None:
+        seed = int(np.random.SeedSequence().entropy % 2 ** 63)
+
+    values = history_arrays(db, backtest.id)['portfolio_value']
+    if len(values) < 3:
+        raise ValueError(f"Backtest {backtest.id} has too little history to resample")
+    returns = values[1:] / values[:-1] - 1
+    initial_capital = float(backtest.initial_capital)
+
+    paths = run_paths(returns, num_paths, method, block_size, float(values[0]), seed, workers)
+    paths['total_return'] = (paths['final_value'] - initial_capital) / initial_capital * 100
+
+    return {
+        'backtest_id': backtest.id,
+        'method': method,
+        'paths': num_paths,
+        'block_size': block_size if method == 'block' else None,
+        'seed': seed,
+        'num_days': len(values),
+        'observed': performance_metrics(values, initial_capital),
+        'percentiles': {
+            metric: {f"p{p:g}": float(value) for p, value in zip(percentiles, np.percentile(paths[metric], percentiles))}
+            for metric in ROBUSTNESS_METRICS
+        },
+        'mean': {metric: float(paths[metric].mean()) for metric in ROBUSTNESS_METRICS},
+        'probability_of_loss': float((paths['final_value'] < initial_capital).mean())
+    }
@@ -1,9 +1,20 @@
-from flask import Blueprint, request, jsonify
-from models import SessionLocal, Stock, Backtest, Trade, PortfolioHistory
-from strategy import MovingAverageCrossover
+from flask import Blueprint, Response, request, jsonify, stream_with_context
+from config import Config
+from models import (db_session, Stock, Backtest, Trade, ParameterSweep, SweepResult,
+                    PortfolioBacktest, PortfolioBacktestHistory, BacktestBatch, BacktestBatchItem,
+                    DurationHistogramBucket)
+from jobs import job_queue, _refresh_analytics
+from instrumentation import render_metrics
 from datetime import datetime
 from sqlalchemy import desc
-import traceback
+from sqlalchemy.orm import joinedload
+import logging
+
+# Strategy, simulation and data modules (pandas, NumPy, data sources) are
+# imported inside the views that use them, so a worker answers /health
+# without loading them.
+
+logger = logging.getLogger(__name__)
 
 api = Blueprint('api', __name__)
 
@@ -13,142 +24,961 @@ def health_check():
     return jsonify({'status': 'healthy', 'message': 'Trading Backtester API is running'}), 200
 
 
+@api.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Backtest stage duration histograms in Prometheus text format, kept up to date as runs complete"""
+    db = db_session()
+    buckets = db.query(DurationHistogramBucket.histogram, DurationHistogramBucket.label,
+                       DurationHistogramBucket.le, DurationHistogramBucket.count, DurationHistogramBucket.sum).all()
+    return Response(render_metrics(buckets), mimetype='text/plain; version=0.0.4')
+
+
 @api.route('/stocks', methods=['GET'])
 def get_stocks():
     """Get all stocks in database"""
-    db = SessionLocal()
-    try:
-        stocks = db.query(Stock).all()
-        return jsonify([stock.to_dict() for stock in stocks]), 200
-    finally:
-        db.close()
+    db = db_session()
+    stocks = db.query(Stock).all()
+    return jsonify([stock.to_dict() for stock in stocks]), 200
+
+
+@api.route('/strategies', methods=['GET'])
+def get_strategies():
+    """List registered strategies and their default parameters"""
+    from strategy import STRATEGIES
+    
+    return jsonify([{
+        'name': cls.name,
+        'description': cls.description,
+        'default_params': cls.default_params
+    } for cls in STRATEGIES.values()]), 200
 
 
 @api.route('/backtests', methods=['GET'])
 def get_backtests():
-    """Get all backtests"""
-    db = SessionLocal()
+    """
+    Get backtests, newest first, one page at a time
+    
+    Query params: limit (default 50, max 500), cursor (next_cursor from the
+    previous page), ticker, strategy, status
+    """
+    from queries import list_backtests
+    
+    limit = min(request.args.get('limit', 50, type=int), 500)
+    if limit < 1:
+        return jsonify({'error': 'limit must be positive'}), 400
+    
+    db = db_session()
     try:
-        backtests = db.query(Backtest).order_by(desc(Backtest.created_at)).all()
-        return jsonify([bt.to_dict() for bt in backtests]), 200
-    finally:
-        db.close()
+        backtests, next_cursor = list_backtests(
+            db,
+            limit=limit,
+            cursor=request.args.get('cursor'),
+            ticker=request.args.get('ticker'),
+            strategy=request.args.get('strategy'),
+            status=request.args.get('status')
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return jsonify({
+        'backtests': [bt.to_dict() for bt in backtests],
+        'next_cursor': next_cursor
+    }), 200
 
 
 @api.route('/backtests/<int:backtest_id>', methods=['GET'])
 def get_backtest(backtest_id):
-    """Get specific backtest details"""
-    db = SessionLocal()
+    """
+    Get specific backtest details
+    
+    Query params:
+        fields: Sections to return (default "backtest,trades,portfolio_history")
+        history_fields: portfolio_history columns (default all)
+        start, end: Date range for portfolio_history (YYYY-MM-DD, inclusive)
+        every: Return every Nth portfolio_history row
+        max_points: Downsample portfolio_history to about this many rows
+    """
+    from queries import load_portfolio_history, HISTORY_FIELDS
+    
+    sections = request.args.get('fields', 'backtest,trades,portfolio_history').split(',')
+    history_fields = request.args.get('history_fields')
+    history_fields = tuple(history_fields.split(',')) if history_fields else HISTORY_FIELDS
+    
+    unknown = [f for f in sections if f not in ('backtest', 'trades', 'portfolio_history')]
+    unknown += [f for f in history_fields if f not in HISTORY_FIELDS]
+    if unknown:
+        return jsonify({'error': f"Unknown fields: {', '.join(unknown)}"}), 400
+    
     try:
-        backtest = db.query(Backtest).filter_by(id=backtest_id).first()
+        start = datetime.strptime(request.args['start'], '%Y-%m-%d').date() if 'start' in request.args else None
+        end = datetime.strptime(request.args['end'], '%Y-%m-%d').date() if 'end' in request.args else None
+    except ValueError:
+        return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD'}), 400
+    
+    db = db_session()
+    backtest = db.query(Backtest).options(joinedload(Backtest.stock)).filter_by(id=backtest_id).first()
+    
+    if not backtest:
+        return jsonify({'error': 'Backtest not found'}), 404
+    
+    response = {}
+    if 'backtest' in sections:
+        response['backtest'] = backtest.to_dict()
+    
+    # Get trades
+    if 'trades' in sections:
+        trades = db.query(Trade).filter_by(backtest_id=backtest_id).order_by(Trade.date).all()
+        response['trades'] = [trade.to_dict() for trade in trades]
+    
+    # Get portfolio history
+    if 'portfolio_history' in sections:
+        response['portfolio_history'] = load_portfolio_history(
+            db, backtest_id,
+            fields=history_fields,
+            start=start,
+            end=end,
+            every=request.args.get('every', type=int),
+            max_points=request.args.get('max_points', type=int)
+        )
+    
+    return jsonify(response), 200
+
+
+@api.route('/backtests/<int:backtest_id>/export', methods=['GET'])
+def export_backtest(backtest_id):
+    """
+    Stream a backtest's equity curve or trades
+    
+    Query params:
+        table: 'history' (default) or 'trades'
+        format: 'ndjson' (default), 'csv', 'arrow' (IPC stream) or 'parquet'
+        chunk_size: Rows fetched from the database per round trip
+    
+    Rows are read through a server-side cursor and written out chunk by
+    chunk, so memory use does not grow with the length of the history.
+    """
+    from export import stream_export, arrow_available, EXPORT_TABLES, EXPORT_FORMATS, ARROW_FORMATS
+    
+    table = request.args.get('table', 'history')
+    fmt = request.args.get('format', 'ndjson')
+    chunk_size = request.args.get('chunk_size', type=int)
+    
+    if table not in EXPORT_TABLES:
+        return jsonify({'error': f"table must be one of: {', '.join(EXPORT_TABLES)}"}), 400
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({'error': f"format must be one of: {', '.join(EXPORT_FORMATS)}"}), 400
+    if fmt in ARROW_FORMATS and not arrow_available():
+        return jsonify({'error': f'{fmt} export requires pyarrow to be installed'}), 501
+    
+    db = db_session()
+    if not db.query(Backtest.id).filter_by(id=backtest_id).first():
+        return jsonify({'error': 'Backtest not found'}), 404
+    
+    extension = {'ndjson': 'ndjson', 'csv': 'csv', 'arrow': 'arrows', 'parquet': 'parquet'}[fmt]
+    return Response(
+        stream_with_context(stream_export(backtest_id, table, fmt, chunk_size)),
+        mimetype=EXPORT_FORMATS[fmt],
+        headers={'Content-Disposition': f'attachment; filename=backtest_{backtest_id}_{table}.{extension}'}
+    )
+
+
+def backtest_params(data):
+    """
+    create_strategy keyword arguments (without db_session) for a run request body
+    
+    Raises:
+        ValueError: for a missing field, bad dates or an unknown engine
+    """
+    from simulation import SIMULATION_ENGINES
+    
+    # Validate required fields
+    required_fields = ['ticker', 'start_date', 'end_date']
+    for field in required_fields:
+        if field not in data:
+            raise ValueError(f'Missing required field: {field}')
+    
+    # Extract parameters with defaults
+    strategy_name = data.get('strategy', 'ma_crossover')
+    strategy_params = dict(data.get('params') or {})
+    engine = data.get('engine', Config.SIMULATION_ENGINE)
+    
+    if strategy_name == 'ma_crossover':
+        for field in ('short_window', 'long_window'):
+            if field in data:
+                strategy_params.setdefault(field, data[field])
+    
+    error = validate_date_range(data['start_date'], data['end_date'])
+    if error:
+        raise ValueError(error)
+    
+    if engine not in SIMULATION_ENGINES:
+        raise ValueError(f"Engine must be one of: {', '.join(SIMULATION_ENGINES)}")
+    
+    return {
+        'name': strategy_name,
+        'ticker': data['ticker'].upper(),
+        'start_date': data['start_date'],
+        'end_date': data['end_date'],
+        'initial_capital': data.get('initial_capital', 10000),
+        'engine': engine,
+        'params': strategy_params,
+        'execution': data.get('execution'),
+        'frequency': data.get('frequency', 'daily')
+    }
+
+
+@api.route('/backtests/run', methods=['POST'])
+def run_backtest():
+    """
+    Queue a new backtest and return its id straight away
+    
+    Poll /api/backtests/<id>/status for progress.
+    
+    Request body:
+    {
+        "ticker": "AAPL",
+        "start_date": "2023-01-01",
+        "end_date": "2024-01-01",
+        "initial_capital": 10000,
+        "strategy": "ma_crossover",
+        "params": {"short_window": 20, "long_window": 50},
+        "engine": "vectorized",
+        "frequency": "daily",
+        "execution": {"commission": 1.0, "slippage_bps": 5, "whole_shares": true,
+                      "fill": "next_open", "position_size": 0.95},
+        "use_cache": true,
+        "profile": false
+    }
+    
+    For ma_crossover, "short_window"/"long_window" may also be given at the top level.
+    "execution" is optional (see execution.ExecutionModel; commission_pct is
+    also accepted); without it trades go all in/all out at the close with no costs.
+    "frequency": "minute" runs on minute bars loaded with manage.py load-intraday.
+    A completed backtest with identical inputs and price data is returned
+    (200, "cached": true) instead of queueing a new run unless use_cache is false.
+    With "profile": true the run is always executed under cProfile; fetch the
+    report from /api/backtests/<id>/profile once it completes.
+    """
+    from strategy import create_strategy
+    import result_cache
+    
+    data = request.get_json()
+    profile = bool(data.get('profile', False))
+    
+    try:
+        params = backtest_params(data)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    # Create the pending record and hand the run to the job queue
+    db = db_session()
+    try:
+        # Validates the strategy name and its parameters
+        try:
+            strategy = create_strategy(db_session=db, **params)
+        except (TypeError, ValueError) as e:
+            return jsonify({'error': str(e)}), 400
+        
+        if Config.RESULT_CACHE_ENABLED and data.get('use_cache', True) and not profile:
+            key = result_cache.cache_key(db, strategy)
+            cached = result_cache.lookup(db, key) if key else None
+            if cached is not None:
+                return jsonify({
+                    'message': 'Backtest served from cache',
+                    'cached': True,
+                    'backtest': cached.to_dict(),
+                    'status_url': f'/api/backtests/{cached.id}/status'
+                }), 200
+        
+        backtest = strategy.create_backtest()
+        job_queue.submit(backtest.id, params, profile=profile)
+        
+        return jsonify({
+            'message': 'Backtest queued',
+            'cached': False,
+            'backtest': backtest.to_dict(),
+            'status_url': f'/api/backtests/{backtest.id}/status'
+        }), 202
+        
+    except Exception as e:
+        logger.exception("Error handling %s", request.path)
+        db.rollback()
+        return jsonify({'error': str(e)}), 500
+
+
+@api.route('/backtests/batch', methods=['POST'])
+def run_backtest_batch():
+    """
+    Queue many backtests as one batch
+    
+    Specs are validated up front; the valid ones are run together (prices
+    loaded once per ticker, simulations spread over Config.BATCH_WORKERS
+    processes) and stored in a single transaction. One spec failing does
+    not affect the others. Poll /api/backtests/batch/<id> for per-spec status.
+    
+    Request body:
+    {
+        "backtests": [
+            {"ticker": "AAPL", "start_date": "2023-01-01", "end_date": "2024-01-01",
+             "strategy": "ma_crossover", "params": {"short_window": 20, "long_window": 50}},
+            {"ticker": "MSFT", "start_date": "2023-01-01", "end_date": "2024-01-01",
+             "strategy": "rsi", "execution": {"commission": 1.0}}
+        ],
+        "use_cache": true
+    }
+    
+    Each spec takes the fields of /api/backtests/run (daily bars only, no profiling).
+    Specs with a cached completed run point at it ("cached") unless use_cache is false.
+    """
+    from batch import create_batch
+    
+    data = request.get_json()
+    specs = data.get('backtests') if isinstance(data, dict) else None
+    if not isinstance(specs, list) or not specs:
+        return jsonify({'error': 'backtests must be a non-empty list of backtest specs'}), 400
+    if len(specs) > Config.BATCH_MAX_SPECS:
+        return jsonify({'error': f'At most {Config.BATCH_MAX_SPECS} backtests per batch'}), 400
+    
+    entries = []
+    for spec in specs:
+        try:
+            if not isinstance(spec, dict):
+                raise ValueError('Backtest spec must be an object')
+            entries.append(backtest_params(spec))
+        except ValueError as e:
+            entries.append(str(e))
+    
+    db = db_session()
+    try:
+        batch, pending = create_batch(db, entries, use_cache=data.get('use_cache', True))
+        if pending:
+            job_queue.submit_batch(batch.id, pending)
+        
+        return jsonify({
+            'message': 'Batch queued' if pending else 'Batch has nothing to run',
+            'batch': batch.to_dict(),
+            'items': [item.to_dict() for item in batch.items],
+            'status_url': f'/api/backtests/batch/{batch.id}'
+        }), 202 if pending else 200
+        
+    except Exception as e:
+        logger.exception("Error handling %s", request.path)
+        db.rollback()
+        return jsonify({'error': str(e)}), 500
+
+
+@api.route('/backtests/batch/<int:batch_id>', methods=['GET'])
+def get_backtest_batch(batch_id):
+    """Get a batch with the status and results of each spec, in request order"""
+    db = db_session()
+    batch = db.query(BacktestBatch).filter_by(id=batch_id).first()
+    
+    if not batch:
+        return jsonify({'error': 'Batch not found'}), 404
+    
+    items = db.query(BacktestBatchItem).options(
+        joinedload(BacktestBatchItem.backtest).joinedload(Backtest.stock)
+    ).filter_by(batch_id=batch_id).order_by(BacktestBatchItem.position).all()
+    
+    return jsonify({
+        'batch': batch.to_dict(),
+        'items': [
+            dict(item.to_dict(), backtest=item.backtest.to_dict() if item.backtest else None)
+            for item in items
+        ]
+    }), 200
+
+
+@api.route('/backtests/<int:backtest_id>/extend', methods=['POST'])
+def extend_backtest(backtest_id):
+    """
+    Extend a completed backtest to a later end date in place
+    
+    Only the new days are fetched, simulated and appended to the existing
+    trades and history; earlier results are left untouched.
+    
+    Request body:
+    {
+        "end_date": "2024-02-01"
+    }
+    """
+    from strategy import create_strategy
+    import result_cache
+    
+    data = request.get_json() or {}
+    
+    end_date = data.get('end_date')
+    try:
+        datetime.strptime(end_date, '%Y-%m-%d')
+    except (TypeError, ValueError):
+        return jsonify({'error': 'Invalid end_date. Use YYYY-MM-DD'}), 400
+    
+    db = db_session()
+    try:
+        # Lock the row so two extends cannot append the same days twice
+        backtest = db.query(Backtest).filter_by(id=backtest_id).with_for_update().first()
         
         if not backtest:
             return jsonify({'error': 'Backtest not found'}), 404
         
-        # Get trades
-        trades = db.query(Trade).filter_by(backtest_id=backtest_id).all()
+        if backtest.status != 'completed':
+            return jsonify({'error': f'Only completed backtests can be extended (status: {backtest.status})'}), 409
+        
+        try:
+            strategy = create_strategy(
+                backtest.strategy or 'ma_crossover', db, backtest.stock.ticker,
+                backtest.start_date.isoformat(), end_date,
+                initial_capital=float(backtest.initial_capital),
+                params=backtest.strategy_params,
+                execution=backtest.execution
+            )
+            # The record's results change, so it no longer matches its cache key
+            result_cache.invalidate(db, backtest.id)
+            appended = strategy.extend_backtest(backtest, end_date)
+        except (TypeError, ValueError) as e:
+            db.rollback()
+            return jsonify({'error': str(e)}), 400
         
-        # Get portfolio history
-        portfolio_history = db.query(PortfolioHistory).filter_by(
-            backtest_id=backtest_id
-        ).order_by(PortfolioHistory.date).all()
+        _refresh_analytics(db, backtest)
         
         return jsonify({
-            'backtest': backtest.to_dict(),
-            'trades': [trade.to_dict() for trade in trades],
-            'portfolio_history': [ph.to_dict() for ph in portfolio_history]
+            'message': f'Backtest extended by {appended} days',
+            'appended_days': appended,
+            'backtest': backtest.to_dict()
         }), 200
-    finally:
-        db.close()
+        
+    except Exception as e:
+        logger.exception("Error handling %s", request.path)
+        db.rollback()
+        return jsonify({'error': str(e)}), 500
 
 
-@api.route('/backtests/run', methods=['POST'])
-def run_backtest():
+@api.route('/backtests/<int:backtest_id>/status', methods=['GET'])
+def get_backtest_status(backtest_id):
+    """Poll the status and progress of a queued or running backtest"""
+    db = db_session()
+    backtest = db.query(Backtest).filter_by(id=backtest_id).first()
+    
+    if not backtest:
+        return jsonify({'error': 'Backtest not found'}), 404
+    
+    return jsonify({
+        'id': backtest.id,
+        'status': backtest.status,
+        'progress': backtest.progress,
+        'error_message': backtest.error_message,
+        'backtest': backtest.to_dict()
+    }), 200
+
+
+@api.route('/backtests/<int:backtest_id>/profile', methods=['GET'])
+def get_backtest_profile(backtest_id):
+    """cProfile report of a backtest run with "profile": true"""
+    db = db_session()
+    backtest = db.query(Backtest).filter_by(id=backtest_id).first()
+    
+    if not backtest:
+        return jsonify({'error': 'Backtest not found'}), 404
+    
+    if not backtest.profile:
+        return jsonify({'error': 'No profile recorded for this backtest'}), 404
+    
+    return jsonify({
+        'id': backtest.id,
+        'stage_timings': backtest.stage_timings,
+        'profile': backtest.profile
+    }), 200
+
+
+@api.route('/backtests/<int:backtest_id>/robustness', methods=['POST'])
+def get_backtest_robustness(backtest_id):
     """
-    Run a new backtest
+    Monte Carlo confidence intervals for a completed backtest's metrics
+    
+    Resamples the daily returns into many alternative paths and returns
+    percentiles of final value, total return, max drawdown and Sharpe ratio.
+    Pass the returned seed back to reproduce a result exactly.
+    
+    Request body (all optional):
+    {
+        "paths": 10000,
+        "method": "block",
+        "block_size": 20,
+        "seed": 42,
+        "percentiles": [5, 25, 50, 75, 95]
+    }
+    """
+    from robustness import robustness_analysis, DEFAULT_PERCENTILES
+    
+    data = request.get_json(silent=True) or {}
+    
+    db = db_session()
+    try:
+        backtest = db.query(Backtest).filter_by(id=backtest_id).first()
+        
+        if not backtest:
+            return jsonify({'error': 'Backtest not found'}), 404
+        
+        if backtest.status != 'completed':
+            return jsonify({'error': f'Backtest is not completed (status: {backtest.status})'}), 409
+        
+        try:
+            result = robustness_analysis(
+                db, backtest,
+                num_paths=int(data.get('paths', 10000)),
+                method=data.get('method', 'block'),
+                block_size=data.get('block_size'),
+                seed=None if data.get('seed') is None else int(data['seed']),
+                percentiles=data.get('percentiles', DEFAULT_PERCENTILES)
+            )
+        except (TypeError, ValueError) as e:
+            return jsonify({'error': str(e)}), 400
+        
+        return jsonify(result), 200
+        
+    except Exception as e:
+        logger.exception("Error handling %s", request.path)
+        return jsonify({'error': str(e)}), 500
+
+
+@api.route('/backtests/<int:backtest_id>/cancel', methods=['POST'])
+def cancel_backtest(backtest_id):
+    """Cancel a pending or running backtest"""
+    db = db_session()
+    backtest = db.query(Backtest).filter_by(id=backtest_id).first()
+    
+    if not backtest:
+        return jsonify({'error': 'Backtest not found'}), 404
+    
+    # Conditional, so a run that completes or fails meanwhile keeps its status
+    cancelled = db.query(Backtest).filter(
+        Backtest.id == backtest_id, Backtest.status.in_(('pending', 'running'))
+    ).update({'status': 'cancelled', 'completed_at': datetime.utcnow()}, synchronize_session=False)
+    db.commit()
+    
+    if not cancelled:
+        return jsonify({'error': f'Backtest is already {backtest.status}'}), 409
+    
+    # Running jobs notice the status change at their next checkpoint
+    job_queue.cancel(backtest_id)
+    
+    return jsonify({'message': 'Backtest cancelled', 'backtest': backtest.to_dict()}), 200
+
+
+@api.route('/backtests/<int:backtest_id>', methods=['DELETE'])
+def delete_backtest(backtest_id):
+    """Delete a backtest and all related data"""
+    import analytics
+    
+    db = db_session()
+    backtest = db.query(Backtest).filter_by(id=backtest_id).first()
+    
+    if not backtest:
+        return jsonify({'error': 'Backtest not found'}), 404
+    
+    analytics.remove_backtest(db, backtest.id)
+    db.delete(backtest)
+    db.commit()
+    
+    return jsonify({'message': 'Backtest deleted successfully'}), 200
+
+
+def validate_date_range(start_date, end_date):
+    """Return an error message for an invalid YYYY-MM-DD range, or None"""
+    try:
+        start = datetime.strptime(start_date, '%Y-%m-%d')
+        end = datetime.strptime(end_date, '%Y-%m-%d')
+    except (TypeError, ValueError):
+        return 'Invalid date format. Use YYYY-MM-DD'
+    
+    if start >= end:
+        return 'Start date must be before end date'
+    return None
+
+
+def clamp_limit(value, default=50, maximum=500):
+    """A row limit between 1 and maximum; default when missing or not a number"""
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        return default
+    return max(1, min(value, maximum))
+
+
+@api.route('/sweeps', methods=['POST'])
+def run_parameter_sweep():
+    """
+    Grid-search short_window x long_window and return a ranked table
     
     Request body:
     {
-        "ticker": "AAPL",
+        "tickers": ["AAPL", "MSFT"],
+        "date_ranges": [{"start_date": "2020-01-01", "end_date": "2024-01-01"}],
+        "short_windows": {"start": 5, "stop": 50, "step": 5},
+        "long_windows": [50, 100, 150, 200],
+        "initial_capital": 10000,
+        "sort_by": "sharpe_ratio",
+        "limit": 50
+    }
+    
+    "ticker" and "start_date"/"end_date" are accepted in place of the lists.
+    """
+    from sweep import parse_windows, run_sweep, rank_results, SWEEP_SORT_FIELDS
+    
+    data = request.get_json()
+    
+    tickers = data.get('tickers') or ([data['ticker']] if data.get('ticker') else [])
+    if not tickers:
+        return jsonify({'error': 'Missing required field: tickers'}), 400
+    if not isinstance(tickers, list) or not all(isinstance(ticker, str) and ticker for ticker in tickers):
+        return jsonify({'error': 'tickers must be a list of ticker symbols'}), 400
+    tickers = [ticker.upper() for ticker in tickers]
+    
+    date_ranges = data.get('date_ranges') or [
+        {'start_date': data.get('start_date'), 'end_date': data.get('end_date')}
+    ]
+    for date_range in date_ranges:
+        error = validate_date_range(date_range.get('start_date'), date_range.get('end_date'))
+        if error:
+            return jsonify({'error': error}), 400
+    
+    try:
+        short_windows = parse_windows(data.get('short_windows', [Config.DEFAULT_SHORT_WINDOW]))
+        long_windows = parse_windows(data.get('long_windows', [Config.DEFAULT_LONG_WINDOW]))
+    except (KeyError, TypeError, ValueError) as e:
+        return jsonify({'error': f'Invalid window specification: {e}'}), 400
+    
+    if short_windows[0] >= long_windows[-1]:
+        return jsonify({'error': 'No combination has short window less than long window'}), 400
+    
+    sort_by = data.get('sort_by', 'sharpe_ratio')
+    if sort_by not in SWEEP_SORT_FIELDS:
+        return jsonify({'error': f"sort_by must be one of: {', '.join(SWEEP_SORT_FIELDS)}"}), 400
+    limit = clamp_limit(data.get('limit'))
+    
+    db = db_session()
+    try:
+        sweep = ParameterSweep(
+            tickers=tickers,
+            date_ranges=[{'start_date': r['start_date'], 'end_date': r['end_date']} for r in date_ranges],
+            short_windows=short_windows,
+            long_windows=long_windows,
+            initial_capital=data.get('initial_capital', Config.DEFAULT_INITIAL_CAPITAL),
+            status='running'
+        )
+        db.add(sweep)
+        db.commit()
+        
+        results = rank_results(run_sweep(db, sweep), sort_by)
+        for row in results:
+            row['start_date'] = row['start_date'].isoformat()
+            row['end_date'] = row['end_date'].isoformat()
+        
+        return jsonify({
+            'sweep': sweep.to_dict(),
+            'results': results[:limit]
+        }), 201
+        
+    except Exception as e:
+        logger.exception("Error handling %s", request.path)
+        db.rollback()
+        return jsonify({'error': str(e)}), 500
+
+
+@api.route('/sweeps/<int:sweep_id>', methods=['GET'])
+def get_parameter_sweep(sweep_id):
+    """Get a sweep and its ranked results (?sort_by=sharpe_ratio&limit=50)"""
+    from sweep import rank_results, SWEEP_SORT_FIELDS
+    
+    sort_by = request.args.get('sort_by', 'sharpe_ratio')
+    if sort_by not in SWEEP_SORT_FIELDS:
+        return jsonify({'error': f"sort_by must be one of: {', '.join(SWEEP_SORT_FIELDS)}"}), 400
+    limit = clamp_limit(request.args.get('limit'))
+    
+    db = db_session()
+    sweep = db.query(ParameterSweep).filter_by(id=sweep_id).first()
+    
+    if not sweep:
+        return jsonify({'error': 'Sweep not found'}), 404
+    
+    results = db.query(SweepResult).filter_by(
+        sweep_id=sweep_id
+    ).order_by(desc(getattr(SweepResult, sort_by))).limit(limit).all()
+    
+    return jsonify({
+        'sweep': sweep.to_dict(),
+        'results': [result.to_dict() for result in results]
+    }), 200
+
+
+@api.route('/portfolios/run', methods=['POST'])
+def run_portfolio_backtest():
+    """
+    Queue a moving average crossover backtest across several tickers
+    
+    Request body:
+    {
+        "tickers": ["AAPL", "MSFT", "GOOG"],
         "start_date": "2023-01-01",
         "end_date": "2024-01-01",
-        "initial_capital": 10000,
+        "initial_capital": 100000,
+        "allocation": "fixed",
+        "weights": {"AAPL": 0.5, "MSFT": 0.3, "GOOG": 0.2},
         "short_window": 20,
         "long_window": 50
     }
     """
+    from portfolio import allocation_weights, run_portfolio_job
+    
     data = request.get_json()
     
-    # Validate required fields
-    required_fields = ['ticker', 'start_date', 'end_date']
-    for field in required_fields:
+    for field in ['tickers', 'start_date', 'end_date']:
         if field not in data:
             return jsonify({'error': f'Missing required field: {field}'}), 400
     
-    # Extract parameters with defaults
-    ticker = data['ticker'].upper()
-    start_date = data['start_date']
-    end_date = data['end_date']
-    initial_capital = data.get('initial_capital', 10000)
-    short_window = data.get('short_window', 20)
-    long_window = data.get('long_window', 50)
+    tickers = list(dict.fromkeys(ticker.upper() for ticker in data['tickers']))
+    if not tickers:
+        return jsonify({'error': 'At least one ticker is required'}), 400
     
-    # Validate dates
-    try:
-        start = datetime.strptime(start_date, '%Y-%m-%d')
-        end = datetime.strptime(end_date, '%Y-%m-%d')
-        
-        if start >= end:
-            return jsonify({'error': 'Start date must be before end date'}), 400
-            
-    except ValueError:
-        return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD'}), 400
+    error = validate_date_range(data['start_date'], data['end_date'])
+    if error:
+        return jsonify({'error': error}), 400
     
-    # Validate windows
+    short_window = data.get('short_window', Config.DEFAULT_SHORT_WINDOW)
+    long_window = data.get('long_window', Config.DEFAULT_LONG_WINDOW)
     if short_window >= long_window:
         return jsonify({'error': 'Short window must be less than long window'}), 400
     
-    # Run backtest
-    db = SessionLocal()
+    allocation = data.get('allocation', 'equal')
+    try:
+        weights = allocation_weights(tickers, allocation, data.get('weights'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    db = db_session()
     try:
-        strategy = MovingAverageCrossover(
-            db_session=db,
-            ticker=ticker,
-            start_date=start_date,
-            end_date=end_date,
-            initial_capital=initial_capital,
+        portfolio = PortfolioBacktest(
+            strategy_name=f"MA_Crossover_{short_window}_{long_window}",
+            allocation=allocation,
+            start_date=datetime.strptime(data['start_date'], '%Y-%m-%d').date(),
+            end_date=datetime.strptime(data['end_date'], '%Y-%m-%d').date(),
+            initial_capital=data.get('initial_capital', Config.DEFAULT_INITIAL_CAPITAL),
             short_window=short_window,
-            long_window=long_window
+            long_window=long_window,
+            status='pending',
+            progress=0
         )
+        db.add(portfolio)
+        db.commit()
         
-        backtest = strategy.run_backtest()
+        job_queue.submit_job(('portfolio', portfolio.id), run_portfolio_job, portfolio.id, tickers, weights)
         
         return jsonify({
-            'message': 'Backtest completed successfully',
-            'backtest': backtest.to_dict()
-        }), 201
+            'message': 'Portfolio backtest queued',
+            'portfolio': portfolio.to_dict(),
+            'status_url': f'/api/portfolios/{portfolio.id}'
+        }), 202
         
     except Exception as e:
-        traceback.print_exc()  # Print full error to terminal
+        logger.exception("Error handling %s", request.path)
         db.rollback()
         return jsonify({'error': str(e)}), 500
-    finally:
-        db.close()
 
 
-@api.route('/backtests/<int:backtest_id>', methods=['DELETE'])
-def delete_backtest(backtest_id):
-    """Delete a backtest and all related data"""
-    db = SessionLocal()
+@api.route('/portfolios/<int:portfolio_id>', methods=['GET'])
+def get_portfolio_backtest(portfolio_id):
+    """Get a portfolio backtest with its members and combined equity curve"""
+    db = db_session()
+    portfolio = db.query(PortfolioBacktest).filter_by(id=portfolio_id).first()
+    
+    if not portfolio:
+        return jsonify({'error': 'Portfolio backtest not found'}), 404
+    
+    history = db.query(PortfolioBacktestHistory).filter_by(
+        portfolio_id=portfolio_id
+    ).order_by(PortfolioBacktestHistory.date).all()
+    
+    return jsonify({
+        'portfolio': portfolio.to_dict(),
+        'members': [member.to_dict() for member in portfolio.members],
+        'history': [point.to_dict() for point in history]
+    }), 200
+
+
+@api.route('/walkforward', methods=['POST'])
+def run_walk_forward():
+    """
+    Walk-forward evaluation of the moving average crossover
+    
+    Each fold picks the best window pair on its train slice and is scored on
+    the following test slice. Sizes are in trading days.
+    
+    Request body:
+    {
+        "ticker": "AAPL",
+        "start_date": "2010-01-01",
+        "end_date": "2024-01-01",
+        "short_windows": {"start": 5, "stop": 50, "step": 5},
+        "long_windows": [100, 150, 200],
+        "train_size": 504,
+        "test_size": 126,
+        "step": 126,
+        "anchored": false,
+        "optimize": "sharpe_ratio",
+        "initial_capital": 10000
+    }
+    """
+    from sweep import parse_windows
+    from walkforward import walk_forward
+    from price_cache import PriceCache, get_or_create_stock
+    
+    data = request.get_json()
+    
+    for field in ['ticker', 'start_date', 'end_date', 'train_size', 'test_size']:
+        if field not in data:
+            return jsonify({'error': f'Missing required field: {field}'}), 400
+    
+    error = validate_date_range(data['start_date'], data['end_date'])
+    if error:
+        return jsonify({'error': error}), 400
+    
     try:
-        backtest = db.query(Backtest).filter_by(id=backtest_id).first()
+        short_windows = parse_windows(data.get('short_windows', [Config.DEFAULT_SHORT_WINDOW]))
+        long_windows = parse_windows(data.get('long_windows', [Config.DEFAULT_LONG_WINDOW]))
+    except (KeyError, TypeError, ValueError) as e:
+        return jsonify({'error': f'Invalid window specification: {e}'}), 400
+    
+    # Fold sizes must be positive integers (a zero step would never advance)
+    for field in ('train_size', 'test_size', 'step'):
+        value = data.get(field)
+        if field == 'step' and value is None:
+            continue
+        if isinstance(value, bool) or not isinstance(value, int) or value < 1:
+            return jsonify({'error': f'{field} must be a positive integer'}), 400
+    
+    ticker = data['ticker'].upper()
+    db = db_session()
+    try:
+        stock = get_or_create_stock(db, ticker)
+        df = PriceCache(db).get_prices(stock, data['start_date'], data['end_date'])
         
-        if not backtest:
-            return jsonify({'error': 'Backtest not found'}), 404
+        try:
+            result = walk_forward(
+                ticker, df, short_windows, long_windows,
+                train_size=data['train_size'],
+                test_size=data['test_size'],
+                step=data.get('step'),
+                anchored=bool(data.get('anchored', False)),
+                initial_capital=data.get('initial_capital', Config.DEFAULT_INITIAL_CAPITAL),
+                optimize=data.get('optimize', 'sharpe_ratio')
+            )
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
-        db.delete(backtest)
-        db.commit()
+        return jsonify(result), 200
         
-        return jsonify({'message': 'Backtest deleted successfully'}), 200
-    finally:
-        db.close()
\ No newline at end of file
+    except Exception as e:
+        logger.exception("Error handling %s", request.path)
+        db.rollback()
+        return jsonify({'error': str(e)}), 500
+
+
+def _analytics_filters():
+    """ticker/strategy/strategy_name/period query parameters"""
+    filters = {
+        'ticker': request.args.get('ticker', type=lambda t: t.upper()),
+        'strategy': request.args.get('strategy'),
+        'strategy_name': request.args.get('strategy_name'),
+        'period': request.args.get('period', type=int)
+    }
+    return {field: value for field, value in filters.items() if value is not None}
+
+
+@api.route('/analytics/leaderboard', methods=['GET'])
+def get_leaderboard():
+    """
+    Completed backtests ranked by a metric, from the analytics summary table
+    
+    Query params: sort_by (sharpe_ratio, total_return, max_drawdown,
+    final_value, num_trades), order (desc or asc), limit (default 50, max
+    500), and filters ticker, strategy, strategy_name, period (start year)
+    """
+    import analytics
+    
+    limit = clamp_limit(request.args.get('limit'))
+    db = db_session()
+    try:
+        rows = analytics.leaderboard(
+            db,
+            sort_by=request.args.get('sort_by', 'sharpe_ratio'),
+            ascending=request.args.get('order', 'desc') == 'asc',
+            filters=_analytics_filters(),
+            limit=limit
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return jsonify({'results': rows}), 200
+
+
+@api.route('/analytics/aggregates', methods=['GET'])
+def get_aggregates():
+    """
+    Backtest metrics aggregated per group, from pre-aggregated sums
+    
+    Query params: group_by (comma-separated subset of ticker, strategy,
+    strategy_name, period; default strategy_name), sort_by (num_backtests,
+    mean_return, mean_sharpe, mean_max_drawdown, best_return, worst_return),
+    order, limit, and the leaderboard filters
+    """
+    import analytics
+    
+    limit = clamp_limit(request.args.get('limit'))
+    db = db_session()
+    try:
+        rows = analytics.aggregates(
+            db,
+            group_by=request.args.get('group_by', 'strategy_name').split(','),
+            sort_by=request.args.get('sort_by', 'mean_return'),
+            ascending=request.args.get('order', 'desc') == 'asc',
+            filters=_analytics_filters(),
+            limit=limit
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return jsonify({'results': rows}), 200
+
+
+@api.route('/analytics/correlation', methods=['GET'])
+def get_correlation():
+    """
+    Correlation matrix of daily returns across backtests (?ids=1,2,3)
+    
+    Equity curves are aligned on the days they all cover.
+    """
+    import analytics
+    
+    try:
+        ids = [int(i) for i in request.args.get('ids', '').split(',') if i]
+    except ValueError:
+        return jsonify({'error': 'ids must be a comma-separated list of backtest ids'}), 400
+    ids = list(dict.fromkeys(ids))
+    if len(ids) > Config.ANALYTICS_MAX_CORRELATION:
+        return jsonify({'error': f'At most {Config.ANALYTICS_MAX_CORRELATION} backtests can be correlated'}), 400
+    
+    db = db_session()
+    found = {row.id: row.status for row in db.query(Backtest.id, Backtest.status).filter(Backtest.id.in_(ids))}
+    missing = [i for i in ids if i not in found]
+    if missing:
+        return jsonify({'error': f"Backtests not found: {', '.join(map(str, missing))}"}), 404
+    not_completed = [i for i in ids if found[i] != 'completed']
+    if not_completed:
+        return jsonify({'error': f"Backtests not completed: {', '.join(map(str, not_completed))}"}), 409
+    
+    try:
+        result = analytics.correlation_matrix(db, ids)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return jsonify(result), 200
@@ -0,0 +1,256 @@
+import numpy as np
+from execution import FRICTIONLESS
+
+SIMULATION_ENGINES = ('loop', 'vectorized', 'verify')
+
+
+def _column(df, name):
+    """Return a DataFrame column as a flat float64 array"""
+    return np.asarray(df[name], dtype=np.float64).reshape(-1)
+
+
+def _trade(trade_type, date, price, shares, capital, fees):
+    return {
+        'trade_type': trade_type,
+        'date': date,
+        'price': float(price),
+        'shares': float(shares),
+        'capital': float(capital),
+        'fees': float(fees)
+    }
+
+
+def _unfilled_order(side, shares, capital):
+    """An order left for the bar after the frame if it would trade from this state"""
+    if side > 0 and shares == 0 and capital > 0:
+        return 1
+    if side < 0 and shares > 0:
+        return -1
+    return 0
+
+
+def simulate_loop(df, initial_capital, initial_shares=0.0, execution=None, pending_order=0):
+    """
+    Reference simulation, one row at a time
+
+    Args:
+        df: Signal frame from calculate_signals (needs Close and Position,
+            and Open for next_open fills)
+        initial_capital: Starting cash in dollars
+        initial_shares: Shares already held at the start (when resuming a run)
+        execution: ExecutionModel (defaults to all in/all out at the close, no costs)
+        pending_order: +1/-1 order from the previous run still to fill at
+            this frame's first open (next_open fills only)
+
+    Returns:
+        dict with dates, close, shares, cash, portfolio_value arrays, a
+        trades list and the pending_order left unfilled at the end
+    """
+    execution = execution or FRICTIONLESS
+    next_open = execution.fill == 'next_open'
+
+    n = len(df)
+    close = np.empty(n)
+    shares_held = np.empty(n)
+    cash = np.empty(n)
+    portfolio_value = np.empty(n)
+    trades = []
+
+    capital = initial_capital
+    shares = initial_shares
+    pending = pending_order if next_open else 0
+
+    for i, (date, row) in enumerate(df.iterrows()):
+        # Extract scalar values from pandas Series
+        position_value = float(row['Position'])
+        close_price = float(row['Close'])
+        side = 1 if position_value == 2 else -1 if position_value == -2 else 0
+
+        # Orders fill at this close, or at this open if placed on the previous bar
+        if next_open:
+            order, pending = pending, side
+            base = float(row['Open']) if order else close_price
+        else:
+            order, base = side, close_price
+
+        # Buy signal: short MA crosses above long MA
+        if order > 0 and shares == 0 and capital > 0:
+            price = execution.fill_price(base, 1)
+            bought, remaining, fees = execution.buy(capital, price)
+            if bought > 0:
+                shares, capital = bought, remaining
+                trades.append(_trade('BUY', date, price, shares, capital, fees))
+
+        # Sell signal: short MA crosses below long MA
+        elif order < 0 and shares > 0:
+            price = execution.fill_price(base, -1)
+            capital, fees = execution.sell(shares, capital, price)
+            shares = 0
+            trades.append(_trade('SELL', date, price, 0.0, capital, fees))
+
+        close[i] = close_price
+        shares_held[i] = shares
+        cash[i] = capital
+        portfolio_value[i] = capital + (shares * close_price)
+
+    return {
+        'dates': df.index,
+        'close': close,
+        'shares': shares_held,
+        'cash': cash,
+        'portfolio_value': portfolio_value,
+        'trades': trades,
+        'pending_order': _unfilled_order(pending, shares, capital)
+    }
+
+
+def simulate_vectorized(df, initial_capital, initial_shares=0.0, execution=None, pending_order=0):
+    """
+    Array-based equivalent of simulate_loop
+
+    Crossover events, fill bars and fill prices (with slippage) are
+    computed for the whole frame at once. Cash and share counts only
+    change at fills, so they are resolved once per order (commission,
+    sizing and whole-share rounding need the running cash) and broadcast
+    to every bar, which keeps the arithmetic identical to the row loop.
+
+    Args:
+        df: Signal frame from calculate_signals (needs Close and Position,
+            and Open for next_open fills)
+        initial_capital: Starting cash in dollars
+        initial_shares: Shares already held at the start (when resuming a run)
+        execution: ExecutionModel (defaults to all in/all out at the close, no costs)
+        pending_order: +1/-1 order from the previous run still to fill at
+            this frame's first open (next_open fills only)
+
+    Returns:
+        dict with the same layout as simulate_loop
+    """
+    execution = execution or FRICTIONLESS
+
+    close = _column(df, 'Close')
+    position = _column(df, 'Position')
+    n = len(close)
+
+    # +1 for a buy crossover, -1 for a sell crossover, 0 otherwise
+    events = np.where(position == 2, 1, np.where(position == -2, -1, 0))
+    fill_bar, fill_price = execution.fill_prices(df, events)
+
+    order_idx = np.flatnonzero(events)
+    order_side = events[order_idx]
+    order_bar = fill_bar[order_idx]
+    order_price = fill_price[order_idx]
+
+    if pending_order and execution.fill == 'next_open' and n > 0:
+        order_side = np.concatenate(([pending_order], order_side))
+        order_bar = np.concatenate(([0], order_bar))
+        order_price = np.concatenate(([execution.fill_price(_column(df, 'Open')[0], pending_order)], order_price))
+
+    # Resolve cash/shares at each fill (one step per order, not per bar)
+    trade_bars = []
+    trade_shares = []
+    trade_cash = []
+    trades = []
+    capital = initial_capital
+    shares = initial_shares
+    unfilled = 0
+    for side, bar, price in zip(order_side.tolist(), order_bar.tolist(), order_price.tolist()):
+        if bar >= n:
+            # Placed on the last bar; fills at the next run's first open
+            unfilled = side
+            continue
+        if side > 0 and shares == 0 and capital > 0:
+            bought, remaining, fees = execution.buy(capital, price)
+            if bought <= 0:
+                continue
+            shares, capital = bought, remaining
+            trades.append(_trade('BUY', df.index[bar], price, shares, capital, fees))
+        elif side < 0 and shares > 0:
+            capital, fees = execution.sell(shares, capital, price)
+            shares = 0
+            trades.append(_trade('SELL', df.index[bar], price, 0.0, capital, fees))
+        else:
+            continue
+        trade_bars.append(bar)
+        trade_shares.append(shares)
+        trade_cash.append(capital)
+
+    # Index of the most recent trade at or before each bar (-1 before the first)
+    if trade_bars:
+        segment = np.searchsorted(np.asarray(trade_bars), np.arange(n), side='right') - 1
+        traded = segment >= 0
+        safe_segment = np.where(traded, segment, 0)
+        shares_held = np.where(traded, np.asarray(trade_shares, dtype=np.float64)[safe_segment], float(initial_shares))
+        cash = np.where(traded, np.asarray(trade_cash, dtype=np.float64)[safe_segment], float(initial_capital))
+    else:
+        shares_held = np.full(n, float(initial_shares))
+        cash = np.full(n, float(initial_capital))
+
+    return {
+        'dates': df.index,
+        'close': close,
+        'shares': shares_held,
+        'cash': cash,
+        'portfolio_value': cash + (shares_held * close),
+        'trades': trades,
+        'pending_order': _unfilled_order(unfilled, shares, capital)
+    }
+
+
+def compare_simulations(expected, actual, rtol=1e-9, atol=1e-6):
+    """
+    Check that two simulation results agree
+
+    Raises:
+        ValueError: describing the first mismatch found
+    """
+    if len(expected['trades']) != len(actual['trades']):
+        raise ValueError(
+            f"Simulation mismatch: {len(expected['trades'])} trades vs {len(actual['trades'])}"
+        )
+
+    for a, b in zip(expected['trades'], actual['trades']):
+        if a['trade_type'] != b['trade_type'] or a['date'] != b['date']:
+            raise ValueError(
+                f"Simulation mismatch: {a['trade_type']} on {a['date']} vs "
+                f"{b['trade_type']} on {b['date']}"
+            )
+        for field in ('price', 'shares', 'capital', 'fees'):
+            if not np.isclose(a[field], b[field], rtol=rtol, atol=atol):
+                raise ValueError(
+                    f"Simulation mismatch: trade {field} on {a['date']} "
+                    f"{a[field]} vs {b[field]}"
+                )
+
+    for field in ('shares', 'cash', 'portfolio_value'):
+        if not np.allclose(expected[field], actual[field], rtol=rtol, atol=atol):
+            bad = int(np.flatnonzero(~np.isclose(expected[field], actual[field], rtol=rtol, atol=atol))[0])
+            raise ValueError(
+                f"Simulation mismatch: {field} on {expected['dates'][bad]} "
+                f"{expected[field][bad]} vs {actual[field][bad]}"
+            )
+
+
+def simulate(df, initial_capital, engine='vectorized', initial_shares=0.0, execution=None, pending_order=0):
+    """
+    Run the backtest simulation with the chosen engine
+
+    Args:
+        df: Signal frame from calculate_signals
+        initial_capital: Starting cash in dollars
+        engine: 'loop', 'vectorized', or 'verify' (runs both and checks they agree)
+        initial_shares: Shares already held at the start (when resuming a run)
+        execution: ExecutionModel with costs and fill rules (None for frictionless)
+        pending_order: Order carried over from the previous run (next_open fills)
+    """
+    args = (df, initial_capital, initial_shares, execution, pending_order)
+    if engine == 'loop':
+        return simulate_loop(*args)
+    if engine == 'vectorized':
+        return simulate_vectorized(*args)
+    if engine == 'verify':
+        expected = simulate_loop(*args)
+        actual = simulate_vectorized(*args)
+        compare_simulations(expected, actual)
+        return actual
+    raise ValueError(f"Unknown simulation engine: {engine}")
@@ -1,19 +1,71 @@
-import pandas as pd
+import logging
 import numpy as np
-import yfinance as yf
+import pandas as pd
 from datetime import datetime
-from models import Stock, StockPrice, Backtest, Trade, PortfolioHistory
+from sqlalchemy import select, update
+from config import Config
+from models import Backtest, StockPrice
+from simulation import simulate
+from execution import ExecutionModel
+from price_cache import PriceCache, get_or_create_stock, to_date
+from persistence import store_results
+from curve_store import history_arrays
+from metrics import performance_metrics, curve_summary, summary_metrics
+from instrumentation import StageTimings, timed, record_timings
+from intraday import BAR_FREQUENCIES, count_bars, stream_bars, signal_chunks, simulate_chunks, DailySampler
+import indicators
+
+logger = logging.getLogger(__name__)
+
+
+class BacktestCancelled(Exception):
+    """Raised inside a running backtest once its record has been marked cancelled"""
+
+
+STRATEGIES = {}
+
+
+def register_strategy(cls):
+    """Class decorator adding a strategy to the registry under cls.name"""
+    STRATEGIES[cls.name] = cls
+    return cls
+
+
+def get_strategy_class(name):
+    """Look up a registered strategy by name"""
+    if name not in STRATEGIES:
+        raise ValueError(f"Unknown strategy: {name}. Available: {', '.join(sorted(STRATEGIES))}")
+    return STRATEGIES[name]
+
+
+def create_strategy(name, db_session, ticker, start_date, end_date, initial_capital=10000,
+                    engine=None, data_source=None, params=None, execution=None, frequency='daily'):
+    """Instantiate a registered strategy by name with its parameter and execution dicts"""
+    cls = get_strategy_class(name)
+    return cls(db_session, ticker, start_date, end_date, initial_capital=initial_capital,
+               engine=engine, data_source=data_source, execution=execution, frequency=frequency,
+               **(params or {}))
+
 
-class MovingAverageCrossover:
+class BaseStrategy:
     """
-    Moving Average Crossover Strategy
+    Base class for backtestable strategies
     
-    Buy Signal: When short-term MA crosses above long-term MA
-    Sell Signal: When short-term MA crosses below long-term MA
+    Subclasses set name, label and default_params, and implement
+    calculate_signals() to add a Signal column (1 = hold, -1 = flat) and its
+    diff as Position. Data loading, simulation, persistence and metrics are
+    shared.
     """
     
-    def __init__(self, db_session, ticker, start_date, end_date, 
-                 initial_capital=10000, short_window=20, long_window=50):
+    name = None
+    label = None
+    description = None
+    default_params = {}
+    version = 1  # Bump when signal logic changes so cached results are not reused
+    
+    def __init__(self, db_session, ticker, start_date, end_date,
+                 initial_capital=10000, engine=None, data_source=None, execution=None,
+                 frequency='daily', **params):
         """
         Initialize the strategy
         
@@ -23,227 +75,592 @@ class MovingAverageCrossover:
             start_date: Start date for backtest (YYYY-MM-DD)
             end_date: End date for backtest (YYYY-MM-DD)
             initial_capital: Starting capital in dollars
-            short_window: Short-term moving average period
-            long_window: Long-term moving average period
+            engine: Simulation engine ('loop', 'vectorized' or 'verify')
+            data_source: DataSource to fetch missing prices from (defaults to Config.DATA_SOURCE)
+            execution: ExecutionModel settings dict (commission, slippage, fills, sizing);
+                None for frictionless all-in/all-out at the close
+            frequency: 'daily' bars from stock_prices, or 'minute' bars streamed from intraday_prices
+            **params: Strategy parameters, overriding default_params
         """
+        unknown = set(params) - set(self.default_params)
+        if unknown:
+            raise ValueError(f"Unknown parameters for {self.name}: {', '.join(sorted(unknown))}")
+        
         self.db = db_session
         self.ticker = ticker.upper()
         self.start_date = start_date
         self.end_date = end_date
         self.initial_capital = initial_capital
-        self.short_window = short_window
-        self.long_window = long_window
+        self.params = {**self.default_params, **params}
+        self.engine = engine or Config.SIMULATION_ENGINE
+        self.execution = ExecutionModel.from_dict(execution)
+        self.frequency = frequency
+        self.data_source = data_source
         self.stock = None
         self.backtest = None
+        self.ingest_stats = None
+        self.timings = None
         
-    def fetch_and_store_data(self):
-        """Fetch historical data from Yahoo Finance and store in database"""
-        print(f"Fetching data for {self.ticker}...")
-        
-        # Check if stock exists in database
-        self.stock = self.db.query(Stock).filter_by(ticker=self.ticker).first()
+        self.validate_params()
         
+        if frequency not in BAR_FREQUENCIES:
+            raise ValueError(f"Frequency must be one of: {', '.join(BAR_FREQUENCIES)}")
+        if frequency == 'minute' and self.warmup_bars() is None:
+            raise ValueError(f"{self.description} backtests cannot run on minute bars")
+    
+    def validate_params(self):
+        """Raise ValueError for invalid parameter combinations"""
+    
+    @property
+    def strategy_name(self):
+        """Display name stored on the Backtest, e.g. MA_Crossover_20_50"""
+        return '_'.join([self.label] + [str(value) for value in self.params.values()])
+    
+    def describe(self):
+        """Human-readable parameter summary"""
+        return f"{self.description} ({', '.join(f'{k}={v}' for k, v in self.params.items())})"
+    
+    def indicator(self, name, series, *args):
+        """Compute an indicator through the shared cache, keyed on this ticker"""
+        return getattr(indicators, name)(series, *args, key=(self.ticker, series.name))
+    
+    def get_or_create_stock(self):
+        """Look up the Stock row for this ticker, creating it if needed"""
+        self.stock = get_or_create_stock(self.db, self.ticker)
+        return self.stock
+    
+    def create_backtest(self, commit=True):
+        """Create the pending Backtest record for this run (commit=False leaves it to the caller's transaction)"""
         if not self.stock:
-            # Create new stock entry
-            self.stock = Stock(ticker=self.ticker)
-            self.db.add(self.stock)
+            self.get_or_create_stock()
+        
+        self.backtest = Backtest(
+            stock_id=self.stock.id,
+            strategy=self.name,
+            strategy_name=self.strategy_name,
+            strategy_params=self.params,
+            execution=self.execution.to_dict(),
+            frequency=self.frequency,
+            start_date=to_date(self.start_date),
+            end_date=to_date(self.end_date),
+            initial_capital=self.initial_capital,
+            status='pending',
+            progress=0
+        )
+        self.db.add(self.backtest)
+        if commit:
             self.db.commit()
-            print(f"Created new stock entry for {self.ticker}")
         
-        # Fetch data from Yahoo Finance
-        df = yf.download(self.ticker, start=self.start_date, end=self.end_date, progress=False)
+        return self.backtest
+    
+    def update_progress(self, progress):
+        """
+        Record progress on the Backtest and stop if it was cancelled meanwhile
+        
+        Raises:
+            BacktestCancelled: if the record's status is now 'cancelled'
+        """
+        self.db.refresh(self.backtest, ['status'])
+        if self.backtest.status == 'cancelled':
+            raise BacktestCancelled(f"Backtest {self.backtest.id} was cancelled")
+        
+        self.backtest.progress = progress
+        self.db.commit()
+    
+    def set_status(self, status):
+        """
+        Move the Backtest to status in the current transaction, unless it was cancelled
+        
+        A conditional UPDATE rather than an attribute assignment, so a cancel
+        committed by /cancel in the meantime is never overwritten.
+        
+        Raises:
+            BacktestCancelled: after rolling back, if the record is now 'cancelled'
+        """
+        updated = self.db.execute(
+            update(Backtest)
+            .where(Backtest.id == self.backtest.id, Backtest.status != 'cancelled')
+            .values(status=status)
+        ).rowcount
+        if not updated:
+            self.db.rollback()
+            raise BacktestCancelled(f"Backtest {self.backtest.id} was cancelled")
+    
+    def fetch_and_store_data(self):
+        """Load historical data, fetching only ranges not already stored in the database"""
+        logger.info("Fetching data for %s", self.ticker)
+        
+        if not self.stock:
+            self.get_or_create_stock()
+        
+        # Serve from stock_prices, downloading only uncovered gaps
+        cache = PriceCache(self.db, source=self.data_source, timings=self.timings)
+        df = cache.get_prices(self.stock, self.start_date, self.end_date)
+        self.ingest_stats = cache.stats
         
         if len(df) == 0:
             raise ValueError(f"No data found for {self.ticker}")
         
-        # Store price data in database
-        for date, row in df.iterrows():
-            # Check if price data already exists
-            existing_price = self.db.query(StockPrice).filter_by(
-                stock_id=self.stock.id,
-                date=date.date()
-            ).first()
-            
-            if not existing_price:
-                price = StockPrice(
-                    stock_id=self.stock.id,
-                    date=date.date(),
-                    open=float(row['Open']),
-                    high=float(row['High']),
-                    low=float(row['Low']),
-                    close=float(row['Close']),
-                    volume=int(row['Volume'])
-                )
-                self.db.add(price)
-        
-        self.db.commit()
-        print(f"Stored {len(df)} days of price data")
+        logger.info("Loaded %d days of price data (%d new, %d ranges fetched)", len(df),
+                    self.ingest_stats['inserted'], len(self.ingest_stats['fetched_ranges']))
         
         return df
     
     def calculate_signals(self, df):
-        """Calculate moving averages and generate trading signals"""
-        # Make a copy to avoid SettingWithCopyWarning
-        df = df.copy()
+        """Add Signal and Position columns to a price frame"""
+        raise NotImplementedError
+    
+    def warmup_bars(self):
+        """
+        Trailing bars calculate_signals needs to reproduce the latest signal
         
-        # Calculate moving averages
-        df['SMA_short'] = df['Close'].rolling(window=self.short_window).mean()
-        df['SMA_long'] = df['Close'].rolling(window=self.long_window).mean()
+        None means the signal depends on the whole history, so runs of this
+        strategy cannot be extended or streamed over minute bars.
+        """
+        return None
+    
+    def run_backtest(self, backtest=None):
+        """
+        Execute the backtest strategy
         
-        # Generate position signals using numpy where instead of loc
-        df['Signal'] = np.where(df['SMA_short'] > df['SMA_long'], 1, -1)
+        Args:
+            backtest: Existing pending Backtest to run (a new one is created if omitted)
+        """
+        logger.info("Running backtest for %s, %s to %s, initial capital $%s, strategy %s",
+                    self.ticker, self.start_date, self.end_date,
+                    f"{self.initial_capital:,.2f}", self.describe())
+        self.timings = StageTimings()
         
-        # Identify crossover points (actual trading signals)
-        df['Position'] = df['Signal'].diff()
+        # Create or pick up the backtest record
+        if backtest is not None:
+            self.backtest = backtest
+            self.stock = backtest.stock
+        elif self.backtest is None:
+            self.create_backtest()
         
-        # Drop rows with NaN (insufficient data for MA calculation)
-        df = df.dropna()
+        self.backtest.progress = 0
+        self.set_status('running')
+        self.db.commit()
         
-        return df
-    
-    def run_backtest(self):
-        """Execute the backtest strategy"""
-        print(f"\n{'='*60}")
-        print(f"Running backtest for {self.ticker}")
-        print(f"Period: {self.start_date} to {self.end_date}")
-        print(f"Initial Capital: ${self.initial_capital:,.2f}")
-        print(f"Strategy: MA Crossover ({self.short_window}/{self.long_window})")
-        print(f"{'='*60}\n")
+        if self.frequency == 'minute':
+            self.run_intraday_backtest()
+            return self.backtest
         
         # Fetch and prepare data
         df = self.fetch_and_store_data()
-        df = self.calculate_signals(df)
+        self.update_progress(40)
+        with self.timings.stage('signals'):
+            df = self.calculate_signals(df)
+        self.update_progress(50)
         
-        # Create backtest record
-        self.backtest = Backtest(
-            stock_id=self.stock.id,
-            strategy_name=f"MA_Crossover_{self.short_window}_{self.long_window}",
-            start_date=self.start_date,
-            end_date=self.end_date,
-            initial_capital=self.initial_capital,
-            status='running'
-        )
-        self.db.add(self.backtest)
-        self.db.commit()
+        if len(df) == 0:
+            raise ValueError(f"Not enough data for {self.ticker} to compute {self.strategy_name} signals")
         
         # Execute backtest simulation
-        capital = self.initial_capital
-        shares = 0
-        trade_count = 0
-        
-        for date, row in df.iterrows():
-            # Extract scalar values from pandas Series
-            position_value = float(row['Position'])
-            close_price = float(row['Close'])
+        with self.timings.stage('simulation'):
+            result = simulate(df, self.initial_capital, engine=self.engine, execution=self.execution)
+        self.update_progress(80)
+        
+        # Per-trade lines are only formatted when debug logging is on
+        if logger.isEnabledFor(logging.DEBUG):
+            for trade in result['trades']:
+                if trade['trade_type'] == 'BUY':
+                    logger.debug("BUY  | %s | Price: $%.2f | Shares: %.2f | Fees: $%.2f",
+                                 trade['date'].date(), trade['price'], trade['shares'], trade['fees'])
+                else:
+                    logger.debug("SELL | %s | Price: $%.2f | Capital: $%.2f | Fees: $%.2f",
+                                 trade['date'].date(), trade['price'], trade['capital'], trade['fees'])
+        
+        # Record trades and daily portfolio values in bulk
+        with timed(self.timings, 'persistence'):
+            store_results(self.db, self.backtest.id, result)
+        
+        # Calculate performance metrics (commits results and metrics together)
+        self.calculate_metrics(df, result)
+        
+        return self.backtest
+    
+    def run_intraday_backtest(self):
+        """
+        Run the started backtest over minute bars, chunk by chunk
+        
+        Bars stream through the intraday pipeline; each chunk's trades (with
+        fill timestamps) and completed days are stored as it finishes and
+        committed with the progress update. Sharpe is computed from the daily
+        points, max drawdown from every bar.
+        """
+        total = count_bars(self.db, self.stock.id, self.start_date, self.end_date)
+        if total == 0:
+            raise ValueError(f"No intraday data found for {self.ticker}; load it with manage.py load-intraday")
+        
+        sampler = DailySampler()
+        bar_summary = None
+        daily_summary = None
+        first_price = None
+        num_trades = 0
+        processed = 0
+        
+        bars = stream_bars(self.db, self.stock.id, self.start_date, self.end_date, timings=self.timings)
+        for signals, result in simulate_chunks(self, signal_chunks(self, bars)):
+            if first_price is None:
+                first_price = float(signals['Close'].iloc[0])
+            for trade in result['trades']:
+                trade['executed_at'] = trade['date'].to_pydatetime()
             
-            # Buy signal: short MA crosses above long MA
-            if position_value == 2 and capital > 0:  # Position changed from -1/0 to 1
-                shares = capital / close_price
-                capital = 0
-                trade_count += 1
-                
-                # Record trade
-                trade = Trade(
-                    backtest_id=self.backtest.id,
-                    trade_type='BUY',
-                    date=date.date(),
-                    price=close_price,
-                    shares=float(shares),
-                    capital=0
-                )
-                self.db.add(trade)
-                print(f"BUY  | {date.date()} | Price: ${close_price:.2f} | Shares: {shares:.2f}")
+            with timed(self.timings, 'persistence'):
+                days = sampler.add(result)
+                store_results(self.db, self.backtest.id, dict(days, trades=result['trades']))
             
-            # Sell signal: short MA crosses below long MA
-            elif position_value == -2 and shares > 0:  # Position changed from 1 to -1/0
-                capital = shares * close_price
-                shares = 0
-                trade_count += 1
-                
-                # Record trade
-                trade = Trade(
-                    backtest_id=self.backtest.id,
-                    trade_type='SELL',
-                    date=date.date(),
-                    price=close_price,
-                    shares=0,
-                    capital=float(capital)
-                )
-                self.db.add(trade)
-                print(f"SELL | {date.date()} | Price: ${close_price:.2f} | Capital: ${capital:.2f}")
+            with timed(self.timings, 'metrics'):
+                bar_summary = curve_summary(result['portfolio_value'], bar_summary)
+                if len(days['dates']):
+                    daily_summary = curve_summary(days['portfolio_value'], daily_summary)
             
-            # Record daily portfolio value
-            portfolio_value = capital + (shares * close_price)
-            portfolio_hist = PortfolioHistory(
-                backtest_id=self.backtest.id,
-                date=date.date(),
-                portfolio_value=float(portfolio_value),
-                stock_price=close_price,
-                shares_held=float(shares)
-            )
-            self.db.add(portfolio_hist)
+            num_trades += len(result['trades'])
+            processed += len(signals)
+            self.update_progress(min(95, int(100 * processed / total)))
         
-        self.db.commit()
+        if bar_summary is None:
+            raise ValueError(f"Not enough data for {self.ticker} to compute {self.strategy_name} signals")
         
-        # Calculate performance metrics
-        self.calculate_metrics(df)
+        last_day = sampler.flush()
+        with timed(self.timings, 'persistence'):
+            store_results(self.db, self.backtest.id, dict(last_day, trades=[]))
+        with timed(self.timings, 'metrics'):
+            daily_summary = curve_summary(last_day['portfolio_value'], daily_summary)
+            metrics = summary_metrics(daily_summary, self.initial_capital)
         
-        return self.backtest
-    
-    def calculate_metrics(self, df):
-        """Calculate and store performance metrics"""
-        # Get portfolio history
-        portfolio_history = self.db.query(PortfolioHistory).filter_by(
-            backtest_id=self.backtest.id
-        ).order_by(PortfolioHistory.date).all()
+        last_price = float(last_day['close'][-1])
+        buy_hold_return = ((last_price - first_price) / first_price) * 100
         
-        portfolio_values = [float(p.portfolio_value) for p in portfolio_history]
-        final_value = portfolio_values[-1]
+        self.backtest.stage_timings = self.timings.as_dict()
+        self.backtest.final_value = metrics['final_value']
+        self.backtest.total_return = metrics['total_return']
+        self.backtest.max_drawdown = bar_summary['max_drawdown'] * 100
+        self.backtest.sharpe_ratio = metrics['sharpe_ratio']
+        self.backtest.num_trades = num_trades
+        self.backtest.progress = 100
+        self.backtest.completed_at = datetime.utcnow()
+        self.set_status('completed')
+        record_timings(self.db, self.name, self.backtest.stage_timings)
+        self.db.commit()
         
-        # Total return
-        total_return = ((final_value - self.initial_capital) / self.initial_capital) * 100
+        logger.info("Intraday backtest %s results: %d bars over %d days, final value $%s, total return %.2f%%, "
+                    "buy & hold %.2f%%, max drawdown %.2f%%, Sharpe %.2f, %d trades",
+                    self.backtest.id, processed, daily_summary['count'] + 1, f"{metrics['final_value']:,.2f}",
+                    metrics['total_return'], buy_hold_return, self.backtest.max_drawdown,
+                    metrics['sharpe_ratio'], num_trades)
+    
+    def calculate_metrics(self, df, result):
+        """Calculate and store performance metrics from the in-memory simulation result"""
+        with timed(self.timings, 'metrics'):
+            metrics = performance_metrics(result['portfolio_value'], self.initial_capital)
+            resume_state = self.resume_state(df, result)
+        final_value = metrics['final_value']
+        total_return = metrics['total_return']
+        max_drawdown = metrics['max_drawdown']
+        sharpe_ratio = metrics['sharpe_ratio']
         
         # Buy and hold return
         first_price = float(df['Close'].iloc[0])
         last_price = float(df['Close'].iloc[-1])
         buy_hold_return = ((last_price - first_price) / first_price) * 100
         
-        # Max drawdown
-        portfolio_array = np.array(portfolio_values)
-        running_max = np.maximum.accumulate(portfolio_array)
-        drawdown = (portfolio_array - running_max) / running_max
-        max_drawdown = float(drawdown.min() * 100)
-        
-        # Sharpe ratio
-        returns = pd.Series(portfolio_values).pct_change().dropna()
-        if len(returns) > 0 and returns.std() > 0:
-            sharpe_ratio = float((returns.mean() / returns.std()) * np.sqrt(252))
-        else:
-            sharpe_ratio = 0.0
-        
         # Number of trades
-        num_trades = self.db.query(Trade).filter_by(backtest_id=self.backtest.id).count()
+        num_trades = len(result['trades'])
         
         # Update backtest record
+        self.backtest.resume_state = resume_state
+        if self.timings is not None:
+            self.backtest.stage_timings = self.timings.as_dict()
         self.backtest.final_value = final_value
         self.backtest.total_return = total_return
         self.backtest.max_drawdown = max_drawdown
         self.backtest.sharpe_ratio = sharpe_ratio
         self.backtest.num_trades = num_trades
-        self.backtest.status = 'completed'
+        self.backtest.progress = 100
         self.backtest.completed_at = datetime.utcnow()
+        self.set_status('completed')
+        record_timings(self.db, self.name, self.backtest.stage_timings)
+        
+        self.db.commit()
+        
+        logger.info("Backtest %s results: final value $%s, total return %.2f%%, buy & hold %.2f%%, "
+                    "max drawdown %.2f%%, Sharpe %.2f, %d trades",
+                    self.backtest.id, f"{final_value:,.2f}", total_return, buy_hold_return,
+                    max_drawdown, sharpe_ratio, num_trades)
+    
+    def resume_state(self, df, result, previous=None):
+        """State needed to continue a simulation after its last bar"""
+        return {
+            'last_date': result['dates'][-1].date().isoformat(),
+            'signal': int(df['Signal'].iloc[-1]),
+            'cash': float(result['cash'][-1]),
+            'shares': float(result['shares'][-1]),
+            'pending_order': int(result['pending_order']),
+            'curve': curve_summary(result['portfolio_value'], previous)
+        }
+    
+    def rebuild_resume_state(self, backtest):
+        """
+        Resume state for runs stored before it was recorded, from their history
+        
+        Reads the whole history once; the run is all-in/all-out, so cash is
+        zero while shares are held.
+        """
+        history = history_arrays(self.db, backtest.id)
+        if len(history['date']) == 0:
+            raise ValueError(f"Backtest {backtest.id} has no history to extend")
+        
+        shares = float(history['shares_held'][-1])
+        last_value = float(history['portfolio_value'][-1])
+        return {
+            'last_date': history['date'][-1].astype(object).isoformat(),
+            'signal': 1 if shares > 0 else -1,
+            'cash': 0.0 if shares > 0 else last_value,
+            'shares': shares,
+            'pending_order': 0,
+            'curve': curve_summary(history['portfolio_value'])
+        }
+    
+    def extend_backtest(self, backtest, end_date):
+        """
+        Extend a completed backtest to a later end date
+        
+        Only bars after the last simulated day are simulated and appended.
+        The run continues from the saved cash, shares and signal, with just
+        warmup_bars() earlier closes loaded so the indicators line up, and
+        metrics are updated from running totals rather than the full history.
+        
+        Args:
+            backtest: Completed Backtest created by this strategy
+            end_date: New end date, exclusive (YYYY-MM-DD)
+        
+        Returns:
+            Number of bars appended
+        """
+        warmup = self.warmup_bars()
+        if warmup is None:
+            raise ValueError(f"{self.description} backtests cannot be extended")
+        if backtest.frequency == 'minute':
+            raise ValueError('Intraday backtests cannot be extended')
+        
+        self.backtest = backtest
+        self.stock = backtest.stock
+        state = backtest.resume_state or self.rebuild_resume_state(backtest)
+        last_date = to_date(state['last_date'])
+        end = to_date(end_date)
         
+        if end <= last_date:
+            raise ValueError(f"End date must be after the last simulated day ({last_date})")
+        
+        # Start loading at the earliest bar the indicators need
+        warmup_start = self.db.execute(
+            select(StockPrice.date).where(
+                StockPrice.stock_id == self.stock.id,
+                StockPrice.date >= backtest.start_date,
+                StockPrice.date <= last_date
+            ).order_by(StockPrice.date.desc()).offset(warmup - 1).limit(1)
+        ).scalar() or backtest.start_date
+        
+        cache = PriceCache(self.db, source=self.data_source)
+        df = cache.get_prices(self.stock, warmup_start, end)
+        self.ingest_stats = cache.stats
+        
+        df = self.calculate_signals(df)
+        df = df[df.index > pd.Timestamp(last_date)].copy()
+        
+        backtest.end_date = end
+        if len(df) == 0:
+            self.db.commit()
+            return 0
+        
+        # The first new bar trades against the saved signal, not the warm-up bars
+        df.iloc[0, df.columns.get_loc('Position')] = df['Signal'].iloc[0] - state['signal']
+        
+        # An order placed on the old last bar fills at the first new open
+        result = simulate(df, state['cash'], engine=self.engine, initial_shares=state['shares'],
+                          execution=self.execution, pending_order=state.get('pending_order', 0))
+        store_results(self.db, backtest.id, result)
+        
+        new_state = self.resume_state(df, result, previous=state['curve'])
+        metrics = summary_metrics(new_state['curve'], float(backtest.initial_capital))
+        
+        backtest.resume_state = new_state
+        backtest.final_value = metrics['final_value']
+        backtest.total_return = metrics['total_return']
+        backtest.max_drawdown = metrics['max_drawdown']
+        backtest.sharpe_ratio = metrics['sharpe_ratio']
+        backtest.num_trades = (backtest.num_trades or 0) + len(result['trades'])
+        backtest.completed_at = datetime.utcnow()
         self.db.commit()
         
-        # Print results
-        print(f"\n{'='*60}")
-        print(f"BACKTEST RESULTS")
-        print(f"{'='*60}")
-        print(f"Initial Capital:        ${self.initial_capital:,.2f}")
-        print(f"Final Value:            ${final_value:,.2f}")
-        print(f"Total Return:           {total_return:.2f}%")
-        print(f"Buy & Hold Return:      {buy_hold_return:.2f}%")
-        print(f"Max Drawdown:           {max_drawdown:.2f}%")
-        print(f"Sharpe Ratio:           {sharpe_ratio:.2f}")
-        print(f"Number of Trades:       {num_trades}")
-        print(f"{'='*60}\n")
\ No newline at end of file
+        logger.info("Extended backtest %s by %d days to %s", backtest.id, len(df), end)
+        return len(df)
+
+
+def hold_signal(enter, exit_):
+    """
+    Turn entry/exit conditions into a held (1) / flat (-1) signal
+    
+    The state switches on at an entry bar, off at an exit bar, and is carried
+    forward in between. Bars before the first condition are flat.
+    """
+    state = np.where(enter, 1.0, np.where(exit_, -1.0, np.nan))
+    return pd.Series(state, index=enter.index).ffill().fillna(-1).astype(int)
+
+
+@register_strategy
+class MovingAverageCrossover(BaseStrategy):
+    """
+    Moving Average Crossover Strategy
+    
+    Buy Signal: When short-term MA crosses above long-term MA
+    Sell Signal: When short-term MA crosses below long-term MA
+    """
+    
+    name = 'ma_crossover'
+    label = 'MA_Crossover'
+    description = 'MA Crossover'
+    default_params = {'short_window': 20, 'long_window': 50}
+    
+    def __init__(self, db_session, ticker, start_date, end_date,
+                 initial_capital=10000, short_window=20, long_window=50, engine=None,
+                 data_source=None, execution=None, frequency='daily'):
+        """
+        Initialize the strategy
+        
+        Args:
+            short_window: Short-term moving average period
+            long_window: Long-term moving average period
+            (other arguments as in BaseStrategy)
+        """
+        super().__init__(db_session, ticker, start_date, end_date,
+                         initial_capital=initial_capital, engine=engine, data_source=data_source,
+                         execution=execution, frequency=frequency,
+                         short_window=short_window, long_window=long_window)
+        self.short_window = short_window
+        self.long_window = long_window
+    
+    def validate_params(self):
+        if self.params['short_window'] >= self.params['long_window']:
+            raise ValueError('Short window must be less than long window')
+    
+    def warmup_bars(self):
+        return self.params['long_window']
+    
+    def calculate_signals(self, df):
+        """Calculate moving averages and generate trading signals"""
+        # Make a copy to avoid SettingWithCopyWarning
+        df = df.copy()
+        
+        # Calculate moving averages (memoized per ticker and window)
+        df['SMA_short'] = self.indicator('sma', df['Close'], self.short_window)
+        df['SMA_long'] = self.indicator('sma', df['Close'], self.long_window)
+        
+        # Generate position signals using numpy where instead of loc
+        df['Signal'] = np.where(df['SMA_short'] > df['SMA_long'], 1, -1)
+        
+        # Identify crossover points (actual trading signals)
+        df['Position'] = df['Signal'].diff()
+        
+        # Drop rows with NaN (insufficient data for MA calculation)
+        df = df.dropna()
+        
+        return df
+
+
+@register_strategy
+class RSIStrategy(BaseStrategy):
+    """
+    RSI Mean Reversion Strategy
+    
+    Buy Signal: RSI drops below the oversold level
+    Sell Signal: RSI rises above the overbought level
+    """
+    
+    name = 'rsi'
+    label = 'RSI'
+    description = 'RSI Mean Reversion'
+    default_params = {'period': 14, 'oversold': 30, 'overbought': 70}
+    
+    def validate_params(self):
+        if self.params['period'] < 2:
+            raise ValueError('RSI period must be at least 2')
+        if not 0 <= self.params['oversold'] < self.params['overbought'] <= 100:
+            raise ValueError('RSI levels must satisfy 0 <= oversold < overbought <= 100')
+    
+    def calculate_signals(self, df):
+        """Calculate RSI and hold from oversold until overbought"""
+        df = df.copy()
+        
+        df['RSI'] = self.indicator('rsi', df['Close'], self.params['period'])
+        df['Signal'] = hold_signal(df['RSI'] < self.params['oversold'],
+                                   df['RSI'] > self.params['overbought'])
+        df['Position'] = df['Signal'].diff()
+        
+        return df.dropna()
+
+
+@register_strategy
+class BollingerBandStrategy(BaseStrategy):
+    """
+    Bollinger Band Mean Reversion Strategy
+    
+    Buy Signal: Close falls below the lower band
+    Sell Signal: Close rises back above the middle band
+    """
+    
+    name = 'bollinger'
+    label = 'Bollinger'
+    description = 'Bollinger Bands'
+    default_params = {'window': 20, 'num_std': 2.0}
+    
+    def validate_params(self):
+        if self.params['window'] < 2:
+            raise ValueError('Bollinger window must be at least 2')
+        if self.params['num_std'] <= 0:
+            raise ValueError('num_std must be positive')
+    
+    def calculate_signals(self, df):
+        """Calculate the bands and hold from a lower-band break until the mean is regained"""
+        df = df.copy()
+        
+        window = self.params['window']
+        df['BB_mid'] = self.indicator('sma', df['Close'], window)
+        df['BB_lower'] = df['BB_mid'] - self.params['num_std'] * self.indicator('rolling_std', df['Close'], window)
+        df['Signal'] = hold_signal(df['Close'] < df['BB_lower'], df['Close'] > df['BB_mid'])
+        df['Position'] = df['Signal'].diff()
+        
+        return df.dropna()
+
+
+@register_strategy
+class MomentumStrategy(BaseStrategy):
+    """
+    Momentum Strategy
+    
+    Hold while the return over the lookback period exceeds the threshold
+    """
+    
+    name = 'momentum'
+    label = 'Momentum'
+    description = 'Momentum'
+    default_params = {'lookback': 20, 'threshold': 0.0}
+    
+    def validate_params(self):
+        if self.params['lookback'] < 1:
+            raise ValueError('Momentum lookback must be at least 1')
+    
+    def warmup_bars(self):
+        return self.params['lookback']
+    
+    def calculate_signals(self, df):
+        """Calculate the lookback return and hold while it is above the threshold"""
+        df = df.copy()
+        
+        df['Momentum'] = self.indicator('momentum', df['Close'], self.params['lookback'])
+        df['Signal'] = np.where(df['Momentum'] > self.params['threshold'], 1, -1)
+        df['Position'] = df['Signal'].diff()
+        
+        return df.dropna()
@@ -0,0 +1,241 @@
+import numpy as np
+import pandas as pd
+from datetime import datetime
+from sqlalchemy import insert
+from config import Config
+from metrics import TRADING_DAYS_PER_YEAR
+from models import SweepResult
+from price_cache import PriceCache, get_or_create_stock, to_date
+from pools import pool_map
+
+
+def parse_windows(spec):
+    """
+    Expand a window specification into a sorted list of ints
+
+    Accepts a list ([5, 10, 20]) or a range dict ({"start": 5, "stop": 50, "step": 5},
+    stop inclusive).
+    """
+    if isinstance(spec, dict):
+        start = int(spec['start'])
+        stop = int(spec['stop'])
+        step = int(spec.get('step', 1))
+        if step <= 0:
+            raise ValueError('Window step must be positive')
+        windows = range(start, stop + 1, step)
+    else:
+        windows = spec
+
+    windows = sorted({int(w) for w in windows})
+    if not windows or windows[0] < 1:
+        raise ValueError('Windows must be positive integers')
+    return windows
+
+
+def rolling_means(close, windows, prefix=None):
+    """
+    Simple moving averages for several windows from one shared prefix sum
+
+    Args:
+        close: 1-D array of closing prices
+        windows: Iterable of window lengths
+        prefix: Optional precomputed prefix sum (len(close) + 1, starting at 0)
+
+    Returns:
+        dict of window -> array (NaN until the window is full)
+    """
+    n = len(close)
+    if prefix is None:
+        prefix = np.concatenate(([0.0], np.cumsum(close, dtype=np.float64)))
+
+    means = {}
+    for window in windows:
+        sma = np.full(n, np.nan)
+        if window <= n:
+            sma[window - 1:] = (prefix[window:] - prefix[:-window]) / window
+        means[window] = sma
+    return means
+
+
+def batch_metrics(equity):
+    """
+    Vectorized performance metrics for a batch of equity curves
+
+    Args:
+        equity: 2-D array, one equity curve per row
+
+    Returns:
+        dict of 1-D arrays: final_value, max_drawdown (%), sharpe_ratio
+    """
+    running_max = np.maximum.accumulate(equity, axis=1)
+    max_drawdown = ((equity - running_max) / running_max).min(axis=1) * 100
+
+    returns = equity[:, 1:] / equity[:, :-1] - 1
+    if returns.shape[1] > 1:
+        std = returns.std(axis=1, ddof=1)
+        mean = returns.mean(axis=1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            sharpe = np.where(std > 0, mean / std * np.sqrt(TRADING_DAYS_PER_YEAR), 0.0)
+    else:
+        sharpe = np.zeros(equity.shape[0])
+
+    return {
+        'final_value': equity[:, -1],
+        'max_drawdown': max_drawdown,
+        'sharpe_ratio': sharpe
+    }
+
+
+def evaluate_long_window(close, short_windows, long_window, initial_capital, means=None):
+    """
+    Evaluate every short window against one long window in a single batch
+
+    Uses the same all-in/all-out rules as simulation.simulate: the strategy
+    holds stock after any bar where the short SMA is above the long SMA,
+    starting from the first bar with a full long window.
+
+    Args:
+        means: Optional precomputed SMAs aligned with close. They may already
+            be warm at the first bar (e.g. slices of full-history means).
+
+    Returns:
+        list of result dicts, one per valid (short_window, long_window) pair
+    """
+    short_windows = [s for s in short_windows if s < long_window]
+    if not short_windows or initial_capital <= 0:
+        return []
+
+    if means is None:
+        means = rolling_means(close, short_windows + [long_window])
+
+    warm = np.flatnonzero(~np.isnan(means[long_window]))
+    if len(warm) == 0 or len(close) - warm[0] < 2:
+        return []
+    start = int(warm[0])
+
+    window_close = close[start:]
+    ratio = window_close[1:] / window_close[:-1]
+    long_sma = means[long_window][start:]
+
+    # Bound the (pairs x bars) matrices held in memory at once
+    chunk = max(1, Config.SWEEP_CHUNK_CELLS // len(window_close))
+    results = []
+
+    for offset in range(0, len(short_windows), chunk):
+        batch = short_windows[offset:offset + chunk]
+        short_sma = np.vstack([means[s][start:] for s in batch])
+        held = short_sma > long_sma
+
+        growth = np.where(held[:, :-1], ratio, 1.0)
+        equity = np.empty(held.shape)
+        equity[:, 0] = initial_capital
+        equity[:, 1:] = initial_capital * np.cumprod(growth, axis=1)
+
+        # Every change in the held state is a trade (including an entry on the first bar)
+        changes = np.diff(held.astype(np.int8), axis=1, prepend=0)
+        num_trades = np.count_nonzero(changes, axis=1)
+
+        metrics = batch_metrics(equity)
+        for i, short_window in enumerate(batch):
+            final_value = float(metrics['final_value'][i])
+            results.append({
+                'short_window': short_window,
+                'long_window': long_window,
+                'final_value': final_value,
+                'total_return': (final_value - initial_capital) / initial_capital * 100,
+                'max_drawdown': float(metrics['max_drawdown'][i]),
+                'sharpe_ratio': float(metrics['sharpe_ratio'][i]),
+                'num_trades': int(num_trades[i])
+            })
+
+    return results
+
+
+def _evaluate_long_window_task(args):
+    close, short_windows, long_window, initial_capital = args
+    return evaluate_long_window(close, short_windows, long_window, initial_capital)
+
+
+def evaluate_grid(close, short_windows, long_windows, initial_capital, workers=None):
+    """
+    Evaluate every valid (short, long) combination on one price series
+
+    With workers > 1 the long windows are spread over the shared process pool;
+    otherwise all rolling means come from a single shared prefix sum.
+    """
+    close = np.asarray(close, dtype=np.float64).reshape(-1)
+    workers = Config.SWEEP_WORKERS if workers is None else workers
+
+    if workers and workers > 1 and len(long_windows) > 1:
+        tasks = [(close, short_windows, long_window, initial_capital) for long_window in long_windows]
+        batches = pool_map(_evaluate_long_window_task, tasks, workers)
+        return [row for batch in batches for row in batch]
+
+    means = rolling_means(close, sorted(set(short_windows) | set(long_windows)))
+    results = []
+    for long_window in long_windows:
+        results.extend(evaluate_long_window(close, short_windows, long_window, initial_capital, means))
+    return results
+
+
+SWEEP_SORT_FIELDS = ('sharpe_ratio', 'total_return', 'max_drawdown', 'final_value')
+
+
+def rank_results(results, sort_by='sharpe_ratio'):
+    """Sort sweep results best-first (drawdowns are negative, so higher is better for all fields)"""
+    if sort_by not in SWEEP_SORT_FIELDS:
+        raise ValueError(f"sort_by must be one of: {', '.join(SWEEP_SORT_FIELDS)}")
+    return sorted(results, key=lambda row: row[sort_by], reverse=True)
+
+
+def run_sweep(db, sweep, workers=None):
+    """
+    Run a ParameterSweep and store one SweepResult per combination
+
+    Prices for each ticker are loaded once for the union of all date ranges
+    and sliced per range. If anything fails the sweep is marked 'failed'
+    with the error before the exception is re-raised.
+
+    Returns:
+        list of result dicts (unranked)
+    """
+    try:
+        return _run_sweep(db, sweep, workers)
+    except Exception as e:
+        db.rollback()
+        sweep.status = 'failed'
+        sweep.error_message = str(e)
+        sweep.completed_at = datetime.utcnow()
+        db.commit()
+        raise
+
+
+def _run_sweep(db, sweep, workers):
+    cache = PriceCache(db)
+    initial_capital = float(sweep.initial_capital)
+    ranges = [(to_date(r['start_date']), to_date(r['end_date'])) for r in sweep.date_ranges]
+
+    rows = []
+    for ticker in sweep.tickers:
+        stock = get_or_create_stock(db, ticker)
+        df = cache.get_prices(stock, min(r[0] for r in ranges), max(r[1] for r in ranges))
+        close = df['Close'].to_numpy(dtype=np.float64)
+        dates = df.index
+
+        for start, end in ranges:
+            mask = (dates >= pd.Timestamp(start)) & (dates < pd.Timestamp(end))
+            results = evaluate_grid(close[mask], sweep.short_windows, sweep.long_windows,
+                                    initial_capital, workers=workers)
+            for result in results:
+                result.update({'ticker': ticker, 'start_date': start, 'end_date': end})
+            rows.extend(results)
+
+    if rows:
+        db.execute(insert(SweepResult), [dict(row, sweep_id=sweep.id) for row in rows])
+
+    sweep.num_combinations = len(rows)
+    sweep.status = 'completed'
+    sweep.completed_at = datetime.utcnow()
+    db.commit()
+
+    return rows
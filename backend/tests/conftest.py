@@ -0,0 +1,85 @@
+"""
+Shared fixtures for the backend tests
+
+Everything runs against a throwaway SQLite database and local price files,
+so no PostgreSQL server or network access is needed. The environment is set
+before any backend module is imported, because Config and the models engine
+read it at import time.
+
+Usage (from backend/):
+    python -m pytest tests
+"""
+import os
+import shutil
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+TEST_DIR = tempfile.mkdtemp(prefix='backtest-tests-')
+PRICE_DIR = os.path.join(TEST_DIR, 'prices')
+os.makedirs(PRICE_DIR)
+
+# Must be set before models creates its engine
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(TEST_DIR, 'test.db')}"
+os.environ['DATA_SOURCE'] = 'file'
+os.environ['PRICE_DATA_DIR'] = PRICE_DIR
+os.environ['COLUMN_STORE_ENABLED'] = 'False'
+os.environ['RESULT_CACHE_ENABLED'] = 'False'
+os.environ['HISTORY_STORAGE'] = 'rows'
+os.environ['BATCH_WORKERS'] = '0'
+
+import numpy as np
+import pandas as pd
+import pytest
+
+
+def _synthetic_prices(bars, seed=0, start='2015-01-01'):
+    """Random-walk OHLCV frame on business days"""
+    index = pd.date_range(start, periods=bars, freq='B')
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0.0002, 0.015, bars)))
+    open_ = np.concatenate(([close[0]], close[:-1])) * (1 + rng.normal(0, 0.003, bars))
+    spread = np.abs(rng.normal(0, 0.005, bars))
+
+    return pd.DataFrame({
+        'Open': open_,
+        'High': np.maximum(open_, close) * (1 + spread),
+        'Low': np.minimum(open_, close) * (1 - spread),
+        'Close': close,
+        'Volume': rng.integers(100_000, 10_000_000, bars).astype(float)
+    }, index=index)
+
+
+@pytest.fixture(scope='session', autouse=True)
+def database():
+    """Create the schema once for the whole run and remove the files afterwards"""
+    from models import init_db, engine
+    init_db()
+    yield engine
+    engine.dispose()
+    shutil.rmtree(TEST_DIR, ignore_errors=True)
+
+
+@pytest.fixture
+def db(database):
+    from models import SessionLocal
+    session = SessionLocal()
+    yield session
+    session.rollback()
+    session.close()
+
+
+@pytest.fixture
+def synthetic_prices():
+    return _synthetic_prices
+
+
+@pytest.fixture
+def price_file():
+    """Write a price frame where FileSource looks for the ticker"""
+    def write(ticker, df):
+        df.to_csv(os.path.join(PRICE_DIR, f"{ticker}.csv"), index_label='Date')
+        return df
+    return write
@@ -0,0 +1,85 @@
+import pytest
+from models import Trade, PortfolioHistory
+from strategy import create_strategy
+from batch import create_batch, run_batch, compute_all
+
+
+def _spec(ticker, short_window=5, long_window=20, end_date='2016-01-01'):
+    return {'name': 'ma_crossover', 'ticker': ticker, 'start_date': '2015-01-01', 'end_date': end_date,
+            'initial_capital': 10000, 'params': {'short_window': short_window, 'long_window': long_window}}
+
+
+@pytest.fixture
+def batch_run(db, price_file, synthetic_prices):
+    price_file('BTA', synthetic_prices(300, seed=9))
+    price_file('BTB', synthetic_prices(300, seed=10))
+
+    entries = [
+        _spec('BTA'),
+        'Missing required field: ticker',  # Rejected by request validation
+        _spec('BTA', short_window=50, long_window=10),  # Rejected by the strategy
+        _spec('NODATA'),  # No prices to load
+        _spec('BTB', long_window=400),  # Too few bars for the signals
+        _spec('BTB'),
+    ]
+    batch, specs = create_batch(db, entries, use_cache=False)
+    run_batch(db, batch, specs, workers=0)
+    return batch
+
+
+def test_failed_specs_do_not_roll_back_the_rest(db, batch_run):
+    statuses = [item.status for item in sorted(batch_run.items, key=lambda item: item.position)]
+    assert statuses == ['completed', 'invalid', 'invalid', 'failed', 'failed', 'completed']
+    assert batch_run.status == 'completed'
+    assert batch_run.num_specs == 6
+    assert batch_run.num_completed == 2
+    assert batch_run.num_failed == 4
+
+    for item in batch_run.items:
+        if item.status == 'completed':
+            backtest = item.backtest
+            assert backtest.status == 'completed'
+            assert backtest.num_trades == db.query(Trade).filter_by(backtest_id=backtest.id).count() > 0
+            assert db.query(PortfolioHistory).filter_by(backtest_id=backtest.id).count() > 0
+        else:
+            assert item.error_message
+            if item.backtest_id is not None:
+                assert item.backtest.status == 'failed'
+                assert item.backtest.error_message == item.error_message
+                assert db.query(PortfolioHistory).filter_by(backtest_id=item.backtest_id).count() == 0
+
+
+def test_invalid_specs_create_no_backtest(batch_run):
+    invalid = [item for item in sorted(batch_run.items, key=lambda item: item.position) if item.status == 'invalid']
+    assert all(item.backtest_id is None for item in invalid)
+    assert 'short window' in invalid[1].error_message.lower()
+
+
+def test_batch_results_match_individual_runs(db, batch_run):
+    for item in batch_run.items:
+        if item.status != 'completed':
+            continue
+        backtest = item.backtest
+        strategy = create_strategy('ma_crossover', db, backtest.stock.ticker, '2015-01-01', '2016-01-01',
+                                   params={'short_window': 5, 'long_window': 20})
+        single = strategy.run_backtest()
+        assert float(single.final_value) == pytest.approx(float(backtest.final_value), abs=0.01)
+        assert single.num_trades == backtest.num_trades
+
+
+def test_compute_errors_are_returned_per_task(synthetic_prices):
+    prices = synthetic_prices(100, seed=11)
+    outcomes = compute_all([(_spec('CMP'), prices), (_spec('CMP', long_window=400), prices)], workers=0)
+
+    assert 'error' not in outcomes[0]
+    assert outcomes[0]['metrics']['final_value'] > 0
+    assert 'Not enough data' in outcomes[1]['error']
+
+
+def test_batch_with_only_invalid_specs_completes_immediately(db):
+    batch, specs = create_batch(db, [_spec('BTA', short_window=30, long_window=10)], use_cache=False)
+
+    assert specs == {}
+    assert batch.status == 'completed'
+    assert batch.num_failed == 1
+    assert batch.items[0].backtest_id is None
@@ -0,0 +1,81 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from column_store import ColumnStore
+from ingest import store_prices
+from price_cache import PriceCache, get_or_create_stock
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ColumnStore(root=str(tmp_path))
+
+
+def _stored_frame(db, stock, df):
+    """The frame as stock_prices holds it (Numeric rounding included)"""
+    return PriceCache(db).load(stock.id, df.index[0].date(), (df.index[-1] + pd.Timedelta(days=1)).date())
+
+
+def _assert_same_prices(actual, expected):
+    pd.testing.assert_frame_equal(actual, expected[actual.columns], check_names=False, check_freq=False)
+
+
+def test_sync_and_read_round_trip(db, store, synthetic_prices):
+    stock = get_or_create_stock(db, 'COLS')
+    df = synthetic_prices(300, seed=2)
+    store_prices(db, stock.id, df)
+    db.commit()
+
+    assert store.sync(db, stock) == 300
+    frame = store.load_frame('COLS')
+    _assert_same_prices(frame, _stored_frame(db, stock, df))
+    assert frame['Volume'].dtype == np.float64
+
+    # [start, end) slicing
+    window = store.load_frame('COLS', df.index[10].date(), df.index[20].date())
+    assert list(window.index) == list(df.index[10:20])
+
+
+def test_sync_appends_new_days_only(db, store, synthetic_prices):
+    stock = get_or_create_stock(db, 'COLA')
+    df = synthetic_prices(400, seed=3)
+    store_prices(db, stock.id, df.iloc[:250])
+    db.commit()
+    store.sync(db, stock)
+
+    store_prices(db, stock.id, df.iloc[250:])
+    db.commit()
+    assert store.sync(db, stock) == 150
+    assert store.sync(db, stock) == 0
+
+    _assert_same_prices(store.load_frame('COLA'), _stored_frame(db, stock, df))
+
+
+def test_sync_rebuilds_when_earlier_days_arrive(db, store, synthetic_prices):
+    stock = get_or_create_stock(db, 'COLR')
+    df = synthetic_prices(200, seed=4)
+    store_prices(db, stock.id, df.iloc[100:])
+    db.commit()
+    store.sync(db, stock)
+
+    store_prices(db, stock.id, df.iloc[:100])
+    db.commit()
+    assert store.sync(db, stock) == 200
+    _assert_same_prices(store.load_frame('COLR'), _stored_frame(db, stock, df))
+
+
+def test_integer_volumes_are_rebuilt_as_float(db, store, synthetic_prices):
+    stock = get_or_create_stock(db, 'COLV')
+    df = synthetic_prices(50, seed=5)
+    store_prices(db, stock.id, df)
+    db.commit()
+    store.sync(db, stock)
+
+    # A store written before volumes were float
+    volume_path = os.path.join(store.path('COLV'), 'volume.npy')
+    np.save(volume_path, np.load(volume_path).astype(np.int64))
+    assert store.load_frame('COLV')['Volume'].dtype == np.float64
+
+    assert store.sync(db, stock) == 50
+    assert np.load(volume_path, mmap_mode='r').dtype == np.float64
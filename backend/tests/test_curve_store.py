@@ -0,0 +1,86 @@
+from datetime import date
+import numpy as np
+import pytest
+from sqlalchemy import insert, select, func
+from models import Backtest, PortfolioHistory, PortfolioCurve
+from price_cache import get_or_create_stock
+from curve_store import (CURVE_COLUMNS, CURVE_PRECISION, encode_curve, decode_curve, store_curve,
+                         history_arrays, compact_backtest_history)
+
+
+def _curve(n, start='2015-01-01', seed=0):
+    rng = np.random.default_rng(seed)
+    dates = np.busday_offset(np.datetime64(start, 'D'), np.arange(n), roll='forward')
+    return dates, {
+        'portfolio_value': 10000 * np.exp(np.cumsum(rng.normal(0, 0.01, n))),
+        'stock_price': 100 * np.exp(np.cumsum(rng.normal(0, 0.01, n))),
+        'shares_held': np.where(rng.random(n) > 0.5, rng.random(n) * 100, 0.0)
+    }
+
+
+@pytest.fixture
+def backtest(db):
+    stock = get_or_create_stock(db, 'CURVE')
+    backtest = Backtest(stock_id=stock.id, strategy_name='MA_Crossover_20_50', start_date=date(2015, 1, 1),
+                        end_date=date(2016, 1, 1), initial_capital=10000, status='completed')
+    db.add(backtest)
+    db.commit()
+    return backtest
+
+
+def test_encode_decode_round_trip():
+    dates, columns = _curve(1000)
+    arrays = decode_curve(encode_curve(dates, columns))
+
+    np.testing.assert_array_equal(arrays['date'], dates)
+    for name in CURVE_COLUMNS:
+        np.testing.assert_array_equal(arrays[name], np.round(columns[name], CURVE_PRECISION[name]))
+
+
+def test_empty_and_single_point_curves():
+    empty = decode_curve(encode_curve(np.empty(0, dtype='datetime64[D]'),
+                                      {name: np.empty(0) for name in CURVE_COLUMNS}))
+    assert all(len(values) == 0 for values in empty.values())
+
+    dates, columns = _curve(1)
+    single = decode_curve(encode_curve(dates, columns))
+    np.testing.assert_array_equal(single['date'], dates)
+
+
+def test_blob_is_smaller_than_raw_columns():
+    dates, columns = _curve(5000)
+    raw_size = len(dates) * (4 + 8 * len(CURVE_COLUMNS))
+    assert len(encode_curve(dates, columns)) < raw_size
+
+
+def test_unknown_encoding():
+    with pytest.raises(ValueError):
+        decode_curve(b'XXXX' + encode_curve(*_curve(10))[4:])
+
+
+def test_history_merges_rows_and_segments_in_date_order(db, backtest):
+    dates, columns = _curve(300)
+    # Days 100-199 as a blob, then 200-299 as rows and 0-99 as a later blob segment
+    store_curve(db, backtest.id, dates[100:200], {name: values[100:200] for name, values in columns.items()})
+    db.execute(insert(PortfolioHistory), [
+        {'backtest_id': backtest.id, 'date': dates[i].astype(object),
+         'portfolio_value': round(float(columns['portfolio_value'][i]), 2),
+         'stock_price': round(float(columns['stock_price'][i]), 2),
+         'shares_held': round(float(columns['shares_held'][i]), 6)}
+        for i in range(200, 300)
+    ])
+    store_curve(db, backtest.id, dates[:100], {name: values[:100] for name, values in columns.items()})
+    db.commit()
+
+    arrays = history_arrays(db, backtest.id)
+    np.testing.assert_array_equal(arrays['date'], dates)
+    for name in CURVE_COLUMNS:
+        np.testing.assert_allclose(arrays[name], np.round(columns[name], CURVE_PRECISION[name]), atol=1e-6)
+
+    assert compact_backtest_history(db, backtest.id) == 300
+    db.commit()
+    assert db.execute(select(func.count()).select_from(PortfolioHistory)
+                      .where(PortfolioHistory.backtest_id == backtest.id)).scalar() == 0
+    assert db.execute(select(func.count()).select_from(PortfolioCurve)
+                      .where(PortfolioCurve.backtest_id == backtest.id)).scalar() == 1
+    np.testing.assert_array_equal(history_arrays(db, backtest.id)['date'], dates)
@@ -0,0 +1,69 @@
+import pytest
+from execution import ExecutionModel
+from simulation import simulate, simulate_loop, simulate_vectorized, compare_simulations
+from strategy import MovingAverageCrossover
+
+EXECUTIONS = [
+    {'commission': 1.0, 'commission_pct': 0.001, 'slippage_bps': 5},
+    {'fill': 'next_open'},
+    {'commission': 2.0, 'slippage_bps': 10, 'whole_shares': True, 'fill': 'next_open', 'position_size': 0.5},
+]
+
+
+@pytest.fixture
+def signals(synthetic_prices):
+    strategy = MovingAverageCrossover(None, 'EXEC', '2015-01-01', '2017-01-01', short_window=5, long_window=20)
+    return strategy.calculate_signals(synthetic_prices(500, seed=1))
+
+
+@pytest.mark.parametrize('execution', EXECUTIONS)
+def test_vectorized_matches_loop(signals, execution):
+    model = ExecutionModel.from_dict(execution)
+    expected = simulate_loop(signals, 10000, execution=model)
+    actual = simulate_vectorized(signals, 10000, execution=model)
+
+    assert len(expected['trades']) > 2
+    compare_simulations(expected, actual)
+    assert actual['pending_order'] == expected['pending_order']
+
+
+@pytest.mark.parametrize('execution', EXECUTIONS)
+def test_vectorized_matches_loop_when_resuming(signals, execution):
+    model = ExecutionModel.from_dict(execution)
+    first = simulate_loop(signals.iloc[:250], 10000, execution=model)
+    args = (signals.iloc[250:], float(first['cash'][-1]), float(first['shares'][-1]), model,
+            first['pending_order'])
+
+    compare_simulations(simulate_loop(*args), simulate_vectorized(*args))
+
+
+def test_next_open_fills_on_the_following_bar(signals):
+    result = simulate_vectorized(signals, 10000, execution=ExecutionModel(fill='next_open'))
+
+    for trade in result['trades']:
+        bar = signals.index.get_loc(trade['date'])
+        assert signals['Position'].iloc[bar - 1] in (2, -2)
+        assert trade['price'] == pytest.approx(float(signals['Open'].iloc[bar]))
+
+
+def test_costs_reduce_final_value(signals):
+    frictionless = simulate(signals, 10000)
+    costly = simulate(signals, 10000, execution=ExecutionModel(commission=5.0, slippage_bps=20))
+
+    assert costly['portfolio_value'][-1] < frictionless['portfolio_value'][-1]
+    assert all(trade['fees'] == pytest.approx(5.0) for trade in costly['trades'])
+
+
+def test_whole_shares_leave_cash_uninvested(signals):
+    result = simulate(signals, 10000, execution=ExecutionModel(whole_shares=True))
+
+    buys = [trade for trade in result['trades'] if trade['trade_type'] == 'BUY']
+    assert buys and all(trade['shares'] == int(trade['shares']) for trade in buys)
+    assert all(0 <= trade['capital'] < trade['price'] for trade in buys)
+
+
+@pytest.mark.parametrize('settings', [{'fill': 'midday'}, {'commission': -1}, {'position_size': 0},
+                                      {'position_size': 1.5}, {'spread': 1}])
+def test_invalid_settings(settings):
+    with pytest.raises(ValueError):
+        ExecutionModel.from_dict(settings)
@@ -0,0 +1,51 @@
+import pandas as pd
+from sqlalchemy import select, func
+from models import StockPrice, IntradayPrice
+from ingest import store_prices, store_intraday_prices
+from price_cache import get_or_create_stock
+
+
+def _count(db, model, stock_id):
+    return db.execute(select(func.count()).select_from(model).where(model.stock_id == stock_id)).scalar()
+
+
+def test_ingesting_twice_skips_stored_days(db, synthetic_prices):
+    stock = get_or_create_stock(db, 'INGD')
+    df = synthetic_prices(120, seed=12)
+
+    assert store_prices(db, stock.id, df, batch_size=50) == {'inserted': 120, 'skipped': 0}
+    db.commit()
+    assert store_prices(db, stock.id, df, batch_size=50) == {'inserted': 0, 'skipped': 120}
+    db.commit()
+    assert _count(db, StockPrice, stock.id) == 120
+
+
+def test_overlapping_download_inserts_only_new_days(db, synthetic_prices):
+    stock = get_or_create_stock(db, 'INGO')
+    df = synthetic_prices(100, seed=13)
+    store_prices(db, stock.id, df.iloc[:60])
+    db.commit()
+
+    assert store_prices(db, stock.id, df.iloc[40:], batch_size=7) == {'inserted': 40, 'skipped': 20}
+    db.commit()
+    assert _count(db, StockPrice, stock.id) == 100
+
+
+def test_duplicate_days_in_one_frame_are_stored_once(db, synthetic_prices):
+    stock = get_or_create_stock(db, 'INGU')
+    df = synthetic_prices(10, seed=14)
+
+    assert store_prices(db, stock.id, pd.concat([df, df.iloc[:3]])) == {'inserted': 10, 'skipped': 3}
+    db.commit()
+
+
+def test_ingesting_intraday_bars_twice(db, synthetic_prices):
+    stock = get_or_create_stock(db, 'INGM')
+    df = synthetic_prices(90, seed=15)
+    df.index = pd.date_range('2024-03-04 09:30', periods=90, freq='min')
+
+    assert store_intraday_prices(db, stock.id, df, batch_size=40) == {'inserted': 90, 'skipped': 0}
+    db.commit()
+    assert store_intraday_prices(db, stock.id, df, batch_size=40) == {'inserted': 0, 'skipped': 90}
+    db.commit()
+    assert _count(db, IntradayPrice, stock.id) == 90
@@ -0,0 +1,72 @@
+import json
+import pytest
+from sqlalchemy import create_engine, text
+from models import DurationHistogramBucket
+from instrumentation import record_timings, render_metrics, bucket_bound
+from migrations import _add_duration_histograms
+
+
+def _buckets(db, label):
+    return {(row.histogram, row.le): (row.count, row.sum) for row in
+            db.query(DurationHistogramBucket).filter_by(label=label)}
+
+
+def test_bucket_bound():
+    assert bucket_bound(0.0) == '0.001'
+    assert bucket_bound(0.3) == '0.5'
+    assert bucket_bound(1.0) == '1.0'
+    assert bucket_bound(600) == '+Inf'
+
+
+def test_record_timings_increments_buckets(db):
+    record_timings(db, 'metrics_a', {'signals': 0.3, 'total': 2.0})
+    record_timings(db, 'metrics_a', {'signals': 0.4, 'total': 90.0})
+    db.commit()
+
+    assert _buckets(db, 'metrics_a') == {
+        ('backtest', '2.5'): (1, pytest.approx(2.0)),
+        ('backtest', '+Inf'): (1, pytest.approx(90.0)),
+    }
+    assert _buckets(db, 'signals')[('stage', '0.5')][0] >= 2
+
+
+def test_rolled_back_run_is_not_counted(db):
+    record_timings(db, 'metrics_b', {'total': 1.0})
+    db.rollback()
+    assert _buckets(db, 'metrics_b') == {}
+
+
+def test_render_metrics_is_cumulative():
+    output = render_metrics([
+        ('backtest', 'rsi', '0.5', 2, 0.6),
+        ('backtest', 'rsi', '5.0', 1, 4.0),
+        ('backtest', 'rsi', '+Inf', 1, 100.0),
+    ])
+    lines = output.splitlines()
+
+    assert '# TYPE backtest_stage_duration_seconds histogram' in lines
+    assert 'backtest_duration_seconds_bucket{strategy="rsi",le="0.25"} 0' in lines
+    assert 'backtest_duration_seconds_bucket{strategy="rsi",le="0.5"} 2' in lines
+    assert 'backtest_duration_seconds_bucket{strategy="rsi",le="10.0"} 3' in lines
+    assert 'backtest_duration_seconds_bucket{strategy="rsi",le="+Inf"} 4' in lines
+    assert 'backtest_duration_seconds_count{strategy="rsi"} 4' in lines
+    assert 'backtest_duration_seconds_sum{strategy="rsi"} 104.6' in lines
+
+
+def test_migration_backfills_existing_runs():
+    engine = create_engine('sqlite://')
+    with engine.begin() as connection:
+        connection.execute(text('CREATE TABLE backtests (id INTEGER PRIMARY KEY, strategy VARCHAR(50), '
+                                'stage_timings JSON)'))
+        connection.execute(text('INSERT INTO backtests (strategy, stage_timings) VALUES (:strategy, :timings)'), [
+            {'strategy': 'rsi', 'timings': json.dumps({'signals': 0.02, 'total': 0.4})},
+            {'strategy': 'rsi', 'timings': json.dumps({'signals': 0.03, 'total': 0.45})},
+            {'strategy': 'rsi', 'timings': None},
+        ])
+        _add_duration_histograms(connection)
+        rows = connection.execute(text('SELECT histogram, label, le, count, sum FROM duration_histogram_buckets '
+                                       'ORDER BY histogram, le')).all()
+
+    assert [tuple(row[:4]) for row in rows] == [('backtest', 'rsi', '0.5', 2), ('stage', 'signals', '0.025', 1),
+                                                ('stage', 'signals', '0.05', 1)]
+    assert rows[0][4] == pytest.approx(0.85)
@@ -0,0 +1,59 @@
+from datetime import date, datetime
+import pytest
+from sqlalchemy import create_engine, inspect, text
+from models import Base
+from migrations import MIGRATIONS, upgrade, pending
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'migrations.db'}")
+    yield engine
+    engine.dispose()
+
+
+def _migrate(engine, until):
+    """Run the migrations before version `until`"""
+    for version, migration in MIGRATIONS:
+        if version == until:
+            return
+        with engine.begin() as connection:
+            migration(connection)
+
+
+def test_fresh_database_matches_the_models(engine):
+    assert upgrade(engine) == [version for version, _ in MIGRATIONS]
+    assert pending(engine) == []
+
+    inspector = inspect(engine)
+    assert set(inspector.get_table_names()) == set(Base.metadata.tables) | {'schema_migrations'}
+    for name, table in Base.metadata.tables.items():
+        assert {column['name'] for column in inspector.get_columns(name)} == set(table.columns.keys()), name
+
+
+def test_analytics_backfill_uses_completed_backtests(engine):
+    _migrate(engine, '0006_analytics')
+    with engine.begin() as connection:
+        connection.execute(text("INSERT INTO stocks (id, ticker) VALUES (1, 'MIGR')"))
+        for id, status, total_return in ((1, 'completed', 0.1), (2, 'completed', 0.3), (3, 'failed', None)):
+            connection.execute(text(
+                "INSERT INTO backtests (id, stock_id, strategy, strategy_name, start_date, end_date, "
+                "initial_capital, total_return, sharpe_ratio, max_drawdown, num_trades, status, completed_at) "
+                "VALUES (:id, 1, 'ma_crossover', 'MA_Crossover_5_20', :start, :end, 10000, :total_return, "
+                "1.0, -0.1, 4, :status, :completed_at)"
+            ), {'id': id, 'start': date(2015, 3, 2), 'end': date(2016, 1, 4), 'total_return': total_return,
+                'status': status, 'completed_at': datetime(2020, 1, 1)})
+
+    with engine.begin() as connection:
+        dict(MIGRATIONS)['0006_analytics'](connection)
+    with engine.connect() as connection:
+        summaries = connection.execute(text(
+            'SELECT backtest_id, ticker, period FROM backtest_summaries ORDER BY backtest_id'
+        )).all()
+        aggregate = connection.execute(text(
+            'SELECT ticker, period, num_backtests, return_sum, best_return, num_trades_sum FROM backtest_aggregates'
+        )).one()
+
+    assert summaries == [(1, 'MIGR', 2015), (2, 'MIGR', 2015)]
+    assert aggregate[:3] == ('MIGR', 2015, 2)
+    assert aggregate[3:] == (pytest.approx(0.4), pytest.approx(0.3), 8)
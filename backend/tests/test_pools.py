@@ -0,0 +1,39 @@
+import numpy as np
+from config import Config
+from pools import pool_map, get_pool, drop_pool
+from sweep import evaluate_grid
+from batch import compute_all
+
+
+def test_pool_map_matches_in_process():
+    tasks = list(range(-10, 10))
+    assert pool_map(abs, tasks, 2) == pool_map(abs, tasks, 0) == [abs(task) for task in tasks]
+
+
+def test_pool_is_shared_and_replaced_after_drop():
+    pool = get_pool(2)
+    assert get_pool(2) is pool
+    drop_pool(2)
+    assert get_pool(2) is not pool
+
+
+def test_pool_uses_configured_start_method():
+    assert get_pool(2)._mp_context.get_start_method() == Config.PROCESS_START_METHOD
+
+
+def test_sweep_results_do_not_depend_on_workers(synthetic_prices):
+    close = synthetic_prices(400, seed=19)['Close'].to_numpy()
+    args = (close, [5, 10, 15], [20, 40, 60], 10000)
+    assert evaluate_grid(*args, workers=2) == evaluate_grid(*args, workers=0)
+
+
+def test_batch_compute_does_not_depend_on_workers(synthetic_prices):
+    prices = synthetic_prices(200, seed=20)
+    spec = {'name': 'ma_crossover', 'ticker': 'POOL', 'start_date': '2015-01-01', 'end_date': '2016-01-01',
+            'params': {'short_window': 5, 'long_window': 20}}
+    tasks = [(spec, prices), (dict(spec, params={'short_window': 10, 'long_window': 30}), prices)]
+
+    pooled, local = compute_all(tasks, workers=2), compute_all(tasks, workers=0)
+    for a, b in zip(pooled, local):
+        np.testing.assert_allclose(a['result']['portfolio_value'], b['result']['portfolio_value'])
+        assert a['metrics'] == b['metrics']
@@ -0,0 +1,105 @@
+from datetime import date
+import pandas as pd
+import pytest
+from data_sources import DataSource, FileSource
+from price_cache import PriceCache, get_or_create_stock, missing_ranges
+
+
+class StubSource(DataSource):
+    """Serves a fixed frame, or an empty one for every request while failing"""
+
+    name = 'stub'
+
+    def __init__(self, df):
+        self.df = df
+        self.failing = False
+        self.requests = []
+
+    def fetch(self, ticker, start_date, end_date):
+        self.requests.append((start_date, end_date))
+        if self.failing:
+            return self.df.iloc[:0]
+        mask = (self.df.index >= pd.Timestamp(start_date)) & (self.df.index < pd.Timestamp(end_date))
+        return self.df.loc[mask]
+
+
+@pytest.fixture
+def source(synthetic_prices):
+    return StubSource(synthetic_prices(300, seed=16))
+
+
+def test_missing_ranges():
+    covered = [(date(2020, 1, 10), date(2020, 1, 20)), (date(2020, 2, 1), date(2020, 2, 10))]
+    assert missing_ranges(covered, date(2020, 1, 1), date(2020, 3, 1)) == [
+        (date(2020, 1, 1), date(2020, 1, 10)),
+        (date(2020, 1, 20), date(2020, 2, 1)),
+        (date(2020, 2, 10), date(2020, 3, 1)),
+    ]
+    assert missing_ranges(covered, date(2020, 1, 12), date(2020, 1, 18)) == []
+
+
+def test_covered_ranges_are_not_fetched_again(db, source):
+    stock = get_or_create_stock(db, 'PCOV')
+    first = PriceCache(db, source=source).get_prices(stock, '2015-02-01', '2015-06-01')
+
+    cache = PriceCache(db, source=source)
+    second = cache.get_prices(stock, '2015-03-01', '2015-05-01')
+    assert cache.stats['fetched_ranges'] == []
+    pd.testing.assert_frame_equal(second, first.loc['2015-03-01':'2015-04-30'])
+
+
+def test_failed_fetch_is_not_recorded_as_covered(db, source):
+    stock = get_or_create_stock(db, 'PFAIL')
+    source.failing = True
+    cache = PriceCache(db, source=source)
+
+    assert len(cache.get_prices(stock, '2015-02-02', '2015-03-02')) == 0
+    assert cache.covered_ranges(stock.id) == []
+
+    # Back online: the same range is downloaded again
+    source.failing = False
+    df = PriceCache(db, source=source).get_prices(stock, '2015-02-02', '2015-03-02')
+    assert len(df) == 20
+    assert source.requests == [(date(2015, 2, 2), date(2015, 3, 2))] * 2
+
+
+def test_weekend_only_gap_is_covered(db, source):
+    stock = get_or_create_stock(db, 'PWKND')
+    cache = PriceCache(db, source=source)
+    cache.get_prices(stock, '2015-02-07', '2015-02-09')  # Saturday and Sunday
+
+    assert cache.covered_ranges(stock.id) == [(date(2015, 2, 7), date(2015, 2, 9))]
+
+
+def test_holiday_between_covered_ranges_is_covered(db, synthetic_prices):
+    df = synthetic_prices(300, seed=17)
+    source = StubSource(df.drop(pd.Timestamp('2015-02-16')))  # A Monday holiday
+    stock = get_or_create_stock(db, 'PHOL')
+    cache = PriceCache(db, source=source)
+    cache.get_prices(stock, '2015-02-02', '2015-02-16')
+    cache.get_prices(stock, '2015-02-17', '2015-03-02')
+
+    cache.get_prices(stock, '2015-02-02', '2015-03-02')
+    assert cache.covered_ranges(stock.id) == [(date(2015, 2, 2), date(2015, 3, 2))]
+
+
+def test_empty_gap_at_the_edge_stays_uncovered(db, source):
+    stock = get_or_create_stock(db, 'PEDGE')
+    cache = PriceCache(db, source=source)
+    cache.get_prices(stock, '2015-02-02', '2015-03-02')
+
+    source.failing = True
+    cache.get_prices(stock, '2015-03-02', '2015-03-04')
+    assert cache.covered_ranges(stock.id) == [(date(2015, 2, 2), date(2015, 3, 2))]
+
+
+def test_file_source_confirms_dates_before_listing(db, price_file, synthetic_prices):
+    price_file('PLIST', synthetic_prices(100, seed=18, start='2015-06-01'))
+    stock = get_or_create_stock(db, 'PLIST')
+    cache = PriceCache(db, source=FileSource())
+
+    assert len(cache.get_prices(stock, '2015-01-01', '2015-05-01')) == 0
+    assert cache.covered_ranges(stock.id) == [(date(2015, 1, 1), date(2015, 5, 1))]
+
+    missing = FileSource()
+    assert not missing.confirms_empty('NOFILE')
@@ -0,0 +1,69 @@
+import base64
+from datetime import date, datetime, timedelta
+import pytest
+from models import Backtest
+from price_cache import get_or_create_stock
+from queries import list_backtests, encode_cursor, decode_cursor
+
+
+@pytest.fixture
+def backtests(db):
+    """Seven backtests for one ticker; three share a created_at so the id breaks ties"""
+    stock = get_or_create_stock(db, 'PAGE')
+    base = datetime(2024, 1, 1, 12, 0, 0)
+    created = [base, base + timedelta(minutes=1), base + timedelta(minutes=1), base + timedelta(minutes=1),
+               base + timedelta(minutes=2), base + timedelta(minutes=3), base + timedelta(minutes=4)]
+
+    rows = []
+    for i, created_at in enumerate(created):
+        rows.append(Backtest(stock_id=stock.id, strategy='ma_crossover', strategy_name=f"MA_Crossover_{i}_50",
+                             start_date=date(2020, 1, 1), end_date=date(2021, 1, 1), initial_capital=10000,
+                             status='completed' if i % 2 else 'failed', created_at=created_at))
+    db.add_all(rows)
+    db.commit()
+    yield sorted(rows, key=lambda b: (b.created_at, b.id), reverse=True)
+
+    db.query(Backtest).filter(Backtest.stock_id == stock.id).delete()
+    db.commit()
+
+
+def _all_pages(db, limit, **filters):
+    pages = []
+    cursor = None
+    while True:
+        page, cursor = list_backtests(db, limit=limit, cursor=cursor, **filters)
+        pages.append([backtest.id for backtest in page])
+        if cursor is None:
+            return pages
+
+
+@pytest.mark.parametrize('limit', [1, 2, 3, 7, 50])
+def test_pages_cover_every_backtest_once_in_order(db, backtests, limit):
+    pages = _all_pages(db, limit, ticker='PAGE')
+
+    assert [backtest_id for page in pages for backtest_id in page] == [b.id for b in backtests]
+    assert all(len(page) == limit for page in pages[:-1])
+    assert 0 < len(pages[-1]) <= limit
+
+
+def test_last_page_has_no_cursor(db, backtests):
+    page, cursor = list_backtests(db, limit=len(backtests), ticker='PAGE')
+    assert len(page) == len(backtests)
+    assert cursor is None
+
+
+def test_filters_apply_across_pages(db, backtests):
+    pages = _all_pages(db, 2, ticker='page', status='completed')
+    expected = [b.id for b in backtests if b.status == 'completed']
+    assert [backtest_id for page in pages for backtest_id in page] == expected
+
+
+def test_cursor_round_trip(backtests):
+    backtest = backtests[2]
+    assert decode_cursor(encode_cursor(backtest)) == (backtest.created_at, backtest.id)
+
+
+@pytest.mark.parametrize('cursor', ['not-a-cursor', base64.urlsafe_b64encode(b'2024-01-01T00:00:00|x').decode(), ''])
+def test_malformed_cursor(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
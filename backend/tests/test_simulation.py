@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+from simulation import simulate, simulate_loop, simulate_vectorized, compare_simulations
+from strategy import MovingAverageCrossover
+
+
+@pytest.fixture
+def signals(synthetic_prices):
+    strategy = MovingAverageCrossover(None, 'SIM', '2015-01-01', '2017-01-01', short_window=5, long_window=20)
+    return strategy.calculate_signals(synthetic_prices(500, seed=1))
+
+
+def test_vectorized_matches_loop(signals):
+    expected = simulate_loop(signals, 10000)
+    actual = simulate_vectorized(signals, 10000)
+
+    assert len(expected['trades']) > 2
+    compare_simulations(expected, actual)
+
+
+def test_vectorized_matches_loop_when_resuming(signals):
+    first = simulate_loop(signals.iloc[:250], 10000)
+    args = (signals.iloc[250:], float(first['cash'][-1]), float(first['shares'][-1]))
+
+    compare_simulations(simulate_loop(*args), simulate_vectorized(*args))
+
+
+def test_no_crossovers_keeps_the_cash(signals):
+    flat = signals.assign(Position=0.0)
+    result = simulate_vectorized(flat, 10000)
+
+    assert result['trades'] == []
+    np.testing.assert_array_equal(result['portfolio_value'], np.full(len(flat), 10000.0))
+    compare_simulations(simulate_loop(flat, 10000), result)
+
+
+def test_verify_engine_returns_vectorized_result(signals):
+    result = simulate(signals, 10000, engine='verify')
+    np.testing.assert_allclose(result['portfolio_value'], simulate_vectorized(signals, 10000)['portfolio_value'])
+
+
+def test_compare_simulations_reports_mismatch(signals):
+    expected = simulate_loop(signals, 10000)
+    actual = simulate_vectorized(signals, 10000)
+    actual['cash'] = actual['cash'] + 1
+
+    with pytest.raises(ValueError, match='cash'):
+        compare_simulations(expected, actual)
+
+
+def test_unknown_engine(signals):
+    with pytest.raises(ValueError):
+        simulate(signals, 10000, engine='gpu')
@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+from config import Config
+from models import Trade
+from strategy import create_strategy
+from curve_store import history_arrays
+
+EXECUTIONS = [None, {'commission': 1.0, 'slippage_bps': 5, 'fill': 'next_open'}]
+
+
+def _run(db, ticker, end_date, execution, engine='vectorized'):
+    strategy = create_strategy('ma_crossover', db, ticker, '2015-01-01', end_date, engine=engine,
+                               params={'short_window': 5, 'long_window': 20}, execution=execution)
+    return strategy, strategy.run_backtest()
+
+
+def _trades(db, backtest_id):
+    return db.query(Trade).filter_by(backtest_id=backtest_id).order_by(Trade.date).all()
+
+
+def _assert_same_trades(expected, actual):
+    assert [(t.trade_type, t.date) for t in actual] == [(t.trade_type, t.date) for t in expected]
+    np.testing.assert_allclose([[float(t.price), float(t.shares)] for t in actual],
+                               [[float(t.price), float(t.shares)] for t in expected], atol=1e-6)
+
+
+@pytest.mark.parametrize('storage', ['rows', 'compact'])
+@pytest.mark.parametrize('execution', EXECUTIONS)
+def test_extend_matches_full_rerun(db, price_file, synthetic_prices, monkeypatch, storage, execution):
+    monkeypatch.setattr(Config, 'HISTORY_STORAGE', storage)
+    price_file('EXTD', synthetic_prices(500, seed=6))
+
+    strategy, extended = _run(db, 'EXTD', '2016-01-01', execution)
+    for end_date in ('2016-06-01', '2016-09-01'):
+        assert strategy.extend_backtest(extended, end_date) > 0
+    _, full = _run(db, 'EXTD', '2016-09-01', execution)
+
+    assert extended.status == full.status == 'completed'
+    assert extended.num_trades == full.num_trades
+    assert float(extended.final_value) == pytest.approx(float(full.final_value), abs=0.01)
+    assert float(extended.total_return) == pytest.approx(float(full.total_return), abs=1e-4)
+    assert float(extended.max_drawdown) == pytest.approx(float(full.max_drawdown), abs=1e-4)
+    assert float(extended.sharpe_ratio) == pytest.approx(float(full.sharpe_ratio), abs=1e-3)
+    assert extended.resume_state['pending_order'] == full.resume_state['pending_order']
+
+    _assert_same_trades(_trades(db, full.id), _trades(db, extended.id))
+    extended_history = history_arrays(db, extended.id)
+    full_history = history_arrays(db, full.id)
+    np.testing.assert_array_equal(extended_history['date'], full_history['date'])
+    for name in ('portfolio_value', 'stock_price', 'shares_held'):
+        np.testing.assert_allclose(extended_history[name], full_history[name], atol=0.01)
+
+
+def test_extend_rejects_earlier_end_date(db, price_file, synthetic_prices):
+    price_file('EXTE', synthetic_prices(300, seed=7))
+    strategy, backtest = _run(db, 'EXTE', '2016-01-01', None)
+
+    with pytest.raises(ValueError):
+        strategy.extend_backtest(backtest, '2015-12-01')
+
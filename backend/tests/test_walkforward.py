@@ -0,0 +1,46 @@
+import pytest
+from walkforward import make_folds
+
+
+def test_rolling_folds():
+    assert make_folds(10, 4, 2) == [
+        ((0, 4), (4, 6)),
+        ((2, 6), (6, 8)),
+        ((4, 8), (8, 10)),
+    ]
+
+
+def test_anchored_folds_keep_the_start():
+    folds = make_folds(10, 4, 2, anchored=True)
+    assert [train for train, _ in folds] == [(0, 4), (0, 6), (0, 8)]
+
+
+def test_step_smaller_than_test_window():
+    folds = make_folds(10, 4, 3, step=1)
+    assert len(folds) == 4
+    assert folds[-1] == ((3, 7), (7, 10))
+
+
+def test_step_larger_than_test_window_skips_bars():
+    assert make_folds(20, 5, 2, step=6) == [
+        ((0, 5), (5, 7)),
+        ((6, 11), (11, 13)),
+        ((12, 17), (17, 19)),
+    ]
+
+
+def test_exact_fit_and_too_few_bars():
+    assert make_folds(6, 4, 2) == [((0, 4), (4, 6))]
+    assert make_folds(5, 4, 2) == []
+    assert make_folds(0, 4, 2) == []
+
+
+def test_folds_stay_in_range():
+    for train_end, test_end in [(train[1], test[1]) for train, test in make_folds(253, 60, 20, step=7)]:
+        assert train_end < test_end <= 253
+
+
+@pytest.mark.parametrize('test_size, step', [(0, None), (-1, None), (2, 0), (2, -3)])
+def test_non_positive_sizes_are_rejected(test_size, step):
+    with pytest.raises(ValueError):
+        make_folds(100, 10, test_size, step=step)
@@ -0,0 +1,147 @@
+import numpy as np
+import pandas as pd
+from config import Config
+from strategy import MovingAverageCrossover
+from simulation import simulate
+from metrics import performance_metrics
+from sweep import rolling_means, evaluate_long_window, SWEEP_SORT_FIELDS
+from pools import pool_map
+
+
+def make_folds(n, train_size, test_size, step=None, anchored=False):
+    """
+    Split n bars into consecutive (train, test) index ranges
+
+    Args:
+        n: Number of bars
+        train_size: Bars in each training window
+        test_size: Bars in each test window
+        step: Bars to advance between folds (defaults to test_size)
+        anchored: Grow the training window from bar 0 instead of rolling it
+
+    Returns:
+        list of ((train_start, train_end), (test_start, test_end)), ends exclusive
+
+    Raises:
+        ValueError: if test_size or step is less than 1
+    """
+    step = test_size if step is None else step
+    if test_size < 1 or step < 1:
+        raise ValueError('test_size and step must be at least 1')
+    folds = []
+    train_start, train_end = 0, train_size
+    while train_end + test_size <= n:
+        folds.append(((train_start, train_end), (train_end, train_end + test_size)))
+        train_end += step
+        if not anchored:
+            train_start += step
+    return folds
+
+
+def run_fold(ticker, fold, close, dates, means, short_windows, long_windows,
+             initial_capital, optimize='sharpe_ratio'):
+    """
+    Pick the best window pair on the train slice and evaluate it on the test slice
+
+    Train candidates are scored with the batched sweep evaluator on slices of
+    the full-history SMAs, so nothing is recomputed per fold. The chosen pair
+    is then run out of sample through calculate_signals and simulate, using
+    only the long_window - 1 bars before the test slice as warm-up.
+    """
+    (train_start, train_end), (test_start, test_end) = fold
+
+    train_means = {w: m[train_start:train_end] for w, m in means.items()}
+    candidates = []
+    for long_window in long_windows:
+        candidates.extend(evaluate_long_window(
+            close[train_start:train_end], short_windows, long_window, initial_capital, train_means
+        ))
+    if not candidates:
+        raise ValueError(f"No valid window pair for fold starting {dates[train_start].date()}")
+    best = max(candidates, key=lambda row: row[optimize])
+
+    warmup_start = max(0, test_start - (best['long_window'] - 1))
+    frame = pd.DataFrame({'Close': close[warmup_start:test_end]}, index=dates[warmup_start:test_end])
+
+    strategy = MovingAverageCrossover(
+        None, ticker, str(dates[test_start].date()), str(dates[test_end - 1].date()),
+        initial_capital=initial_capital,
+        short_window=best['short_window'],
+        long_window=best['long_window'],
+        engine='vectorized'
+    )
+    signals = strategy.calculate_signals(frame)
+    signals = signals[signals.index >= dates[test_start]]
+    result = simulate(signals, initial_capital, engine='vectorized')
+    test_metrics = performance_metrics(result['portfolio_value'], initial_capital)
+
+    return {
+        'train_start': dates[train_start].date().isoformat(),
+        'train_end': dates[train_end - 1].date().isoformat(),
+        'test_start': dates[test_start].date().isoformat(),
+        'test_end': dates[test_end - 1].date().isoformat(),
+        'short_window': best['short_window'],
+        'long_window': best['long_window'],
+        'train_metrics': {field: best[field] for field in SWEEP_SORT_FIELDS},
+        'test_metrics': dict(test_metrics, num_trades=len(result['trades'])),
+        'test_dates': [d.date().isoformat() for d in result['dates']],
+        'test_values': result['portfolio_value'].tolist()
+    }
+
+
+def _run_fold_task(args):
+    return run_fold(*args)
+
+
+def walk_forward(ticker, df, short_windows, long_windows, train_size, test_size,
+                 step=None, anchored=False, initial_capital=10000, optimize='sharpe_ratio',
+                 workers=None):
+    """
+    Walk-forward evaluation of the moving average crossover
+
+    Rolling means for every window are built once from a single prefix sum
+    over the whole history; folds then only slice them. Folds run on the
+    shared process pool when workers > 1.
+
+    Returns:
+        dict with per-fold results and the stitched out-of-sample equity curve
+    """
+    if optimize not in SWEEP_SORT_FIELDS:
+        raise ValueError(f"optimize must be one of: {', '.join(SWEEP_SORT_FIELDS)}")
+    if step is not None and step < test_size:
+        raise ValueError('step must be at least test_size so test windows do not overlap')
+    if train_size < max(long_windows):
+        raise ValueError('train_size must be at least the largest long window')
+
+    close = df['Close'].to_numpy(dtype=np.float64)
+    dates = df.index
+    folds = make_folds(len(close), train_size, test_size, step, anchored)
+    if not folds:
+        raise ValueError(f"Not enough data for one fold: {len(close)} bars, "
+                         f"need {train_size + test_size}")
+
+    means = rolling_means(close, sorted(set(short_windows) | set(long_windows)))
+    tasks = [(ticker, fold, close, dates, means, short_windows, long_windows, initial_capital, optimize)
+             for fold in folds]
+
+    workers = Config.WALKFORWARD_WORKERS if workers is None else workers
+    results = pool_map(_run_fold_task, tasks, workers)
+
+    # Chain test segments, carrying each fold's ending value into the next
+    stitched_dates = []
+    stitched_values = []
+    capital = float(initial_capital)
+    for result in results:
+        scale = capital / initial_capital
+        values = [value * scale for value in result.pop('test_values')]
+        stitched_dates.extend(result.pop('test_dates'))
+        stitched_values.extend(values)
+        capital = values[-1]
+
+    return {
+        'ticker': ticker,
+        'num_folds': len(results),
+        'folds': results,
+        'out_of_sample': performance_metrics(stitched_values, initial_capital),
+        'equity_curve': [{'date': d, 'portfolio_value': v} for d, v in zip(stitched_dates, stitched_values)]
+    }
@@ -0,0 +1,23 @@
+"""
+Production WSGI entry point
+
+gunicorn (Linux/macOS):
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+waitress (any platform):
+    python wsgi.py
+
+Tables are not created here; run `python manage.py init-db` once per database.
+"""
+from config import Config
+from app import create_app
+
+app = create_app()
+
+
+if __name__ == '__main__':
+    from waitress import serve
+
+    host, port = Config.WEB_BIND.rsplit(':', 1)
+    # waitress runs a single process, so it gets the combined thread count
+    serve(app, host=host, port=int(port), threads=Config.WEB_WORKERS * Config.WEB_THREADS)
@@ -12,6 +12,7 @@ function BacktestForm({ onBacktestComplete }) {
   });
   
   const [loading, setLoading] = useState(false);
+  const [progress, setProgress] = useState(0);
   const [error, setError] = useState(null);
 
   const handleChange = (e) => {
@@ -21,9 +22,27 @@ function BacktestForm({ onBacktestComplete }) {
     });
   };
 
+  const waitForBacktest = async (backtestId) => {
+    // Poll until the queued backtest finishes
+    while (true) {
+      const response = await axios.get(`http://localhost:5000/api/backtests/${backtestId}/status`);
+      const { status, progress, error_message, backtest } = response.data;
+      setProgress(progress || 0);
+
+      if (status === 'completed') {
+        return backtest;
+      }
+      if (status === 'failed' || status === 'cancelled') {
+        throw new Error(error_message || `Backtest ${status}`);
+      }
+      await new Promise((resolve) => setTimeout(resolve, 1000));
+    }
+  };
+
   const handleSubmit = async (e) => {
     e.preventDefault();
     setLoading(true);
+    setProgress(0);
     setError(null);
 
     try {
@@ -36,11 +55,12 @@ function BacktestForm({ onBacktestComplete }) {
         long_window: parseInt(formData.long_window)
       });
 
-      console.log('Backtest completed:', response.data);
-      onBacktestComplete(response.data);
+      const backtest = await waitForBacktest(response.data.backtest.id);
+      console.log('Backtest completed:', backtest);
+      onBacktestComplete({ backtest });
     } catch (err) {
       console.error('Error running backtest:', err);
-      setError(err.response?.data?.error || 'Failed to run backtest');
+      setError(err.response?.data?.error || err.message || 'Failed to run backtest');
     } finally {
       setLoading(false);
     }
@@ -149,7 +169,7 @@ function BacktestForm({ onBacktestComplete }) {
             fontWeight: 'bold'
           }}
         >
-          {loading ? 'Running Backtest...' : 'Run Backtest'}
+          {loading ? `Running Backtest... ${progress}%` : 'Run Backtest'}
         </button>
       </form>
     </div>